@@ -0,0 +1,223 @@
+"""Load generator for the Crypt4GH key network protocol.
+
+Runs `HTTPPathKeyServer` under a local threading WSGI server (from the
+standard library `wsgiref` module) and drives it through `HTTPKey`
+clients with configurable concurrency. Reports throughput, latency
+percentiles and error rate.
+
+The backends are software keys - either used directly or wrapped in a
+key simulating a slow external device (smart card, HSM) with fixed
+latency. No external services are needed.
+
+Example:
+
+    python benchmarks/key_server_load.py --concurrency 16 --requests 2000
+    python benchmarks/key_server_load.py --latency 0.02 --limit 1
+
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from socketserver import ThreadingMixIn
+from threading import Thread
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from oarepo_c4gh.key import HTTPKey, SoftwareKey
+from oarepo_c4gh.key.external_software import ExternalSoftwareKey
+from oarepo_c4gh.key.http_path_key_server import HTTPPathKeyServer
+from oarepo_c4gh.key.key_limiter import KeyLimiter
+
+
+class SimulatedLatencyKey(ExternalSoftwareKey):
+    """Software-backed external key which sleeps for given time before
+    each operation to simulate slow external device.
+
+    """
+
+    def __init__(self, softkey: SoftwareKey, latency: float) -> None:
+        """Wraps the software key.
+
+        Parameters:
+            softkey: the backing key which must include private key
+            latency: the time in seconds each operation takes
+
+        """
+        super().__init__(softkey)
+        self._latency = latency
+
+    def compute_ecdh(self, public_point: bytes) -> bytes:
+        """Waits and computes the ECDH result."""
+        time.sleep(self._latency)
+        return super().compute_ecdh(public_point)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """WSGI server handling each request in a separate thread."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    """Request handler which does not log every request."""
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def generate_keys(count: int, rng: random.Random) -> list[SoftwareKey]:
+    """Generates reproducible software keys.
+
+    Parameters:
+        count: the number of keys
+        rng: seeded random number generator
+
+    Returns:
+        List of the keys.
+
+    """
+    return [SoftwareKey(rng.randbytes(32)) for idx in range(count)]
+
+
+def start_server(args: argparse.Namespace, rng: random.Random) -> tuple:
+    """Starts the key server in a background thread.
+
+    Returns:
+        The server instance and the list of key names served.
+
+    """
+    mapping = {}
+    for idx, key in enumerate(generate_keys(args.keys, rng)):
+        if args.latency > 0:
+            key = SimulatedLatencyKey(key, args.latency)
+        mapping[f"key{idx}"] = key
+    limiter = None
+    if args.limit > 0:
+        limiter = KeyLimiter(args.limit, args.queue, args.timeout)
+    hpks = HTTPPathKeyServer(mapping, limiter=limiter)
+    httpd = make_server(
+        "127.0.0.1",
+        args.port,
+        hpks.handle_uwsgi_request,
+        server_class=ThreadingWSGIServer,
+        handler_class=QuietWSGIRequestHandler,
+    )
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, list(mapping.keys())
+
+
+def run_client(
+    url: str, points: list[bytes], latencies: list[float], errors: list
+) -> None:
+    """Performs the requests for given points sequentially and
+    records the latency of each.
+
+    """
+    key = HTTPKey(url)
+    for point in points:
+        started = time.perf_counter()
+        try:
+            key.compute_ecdh(point)
+            latencies.append(time.perf_counter() - started)
+        except Exception as ex:
+            errors.append(ex)
+
+
+def run_load(args: argparse.Namespace) -> dict:
+    """Runs the whole load test.
+
+    Returns:
+        Dictionary with the results.
+
+    """
+    rng = random.Random(args.seed)
+    httpd, names = start_server(args, rng)
+    port = httpd.server_address[1]
+    # points are public keys of random key pairs
+    points = [key.public_key for key in generate_keys(args.requests, rng)]
+    if args.repeat_points > 0:
+        points = [
+            points[idx % args.repeat_points] for idx in range(len(points))
+        ]
+    latencies: list[float] = []
+    errors: list = []
+    threads = []
+    for idx in range(args.concurrency):
+        url = f"http://127.0.0.1:{port}/{names[idx % len(names)]}/x25519"
+        chunk = points[idx :: args.concurrency]
+        threads.append(
+            Thread(target=run_client, args=(url, chunk, latencies, errors))
+        )
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    httpd.shutdown()
+    result = {
+        "requests": len(points),
+        "concurrency": args.concurrency,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "errors": len(errors),
+        "error_rate": len(errors) / len(points),
+    }
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        result["p50"] = cuts[49]
+        result["p90"] = cuts[89]
+        result["p99"] = cuts[98]
+        result["max"] = max(latencies)
+    return result
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    """Parses the command-line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--keys", type=int, default=1)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="simulated key operation latency in seconds",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=0,
+        help="maximum concurrent operations per key (0 = no limiter)",
+    )
+    parser.add_argument("--queue", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument(
+        "--repeat-points",
+        type=int,
+        default=0,
+        help="use only this many distinct public points (0 = all distinct)",
+    )
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] = None) -> None:
+    """Runs the load test and prints the report."""
+    result = run_load(parse_args(sys.argv[1:] if argv is None else argv))
+    print(f"requests:    {result['requests']}")
+    print(f"concurrency: {result['concurrency']}")
+    print(f"elapsed:     {result['elapsed']:.3f} s")
+    print(f"throughput:  {result['throughput']:.1f} req/s")
+    print(f"errors:      {result['errors']} ({result['error_rate']:.2%})")
+    for name in ("p50", "p90", "p99", "max"):
+        if name in result:
+            print(f"{name + ':':12} {result[name] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
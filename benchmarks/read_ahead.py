@@ -0,0 +1,114 @@
+"""Benchmark of the data blocks read-ahead thread on a throttled file.
+
+Writes a container to a temporary file and reads it back through a
+stream wrapper which sleeps in each read to simulate a network
+filesystem with limited bandwidth and per-request latency. Compares
+the plain read/decrypt loop with read-ahead of various depths.
+
+Example:
+
+    python benchmarks/read_ahead.py --size 64 --bandwidth 150 --latency 0.5
+
+"""
+
+import argparse
+import io
+import os
+import secrets
+import sys
+import tempfile
+import time
+
+from nacl.bindings import crypto_aead_chacha20poly1305_ietf_encrypt
+
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.key import SoftwareKey
+
+
+class ThrottledStream(io.RawIOBase):
+    """Raw input stream sleeping for the request latency plus the
+    transfer time of the data read.
+
+    """
+
+    def __init__(self, raw: io.RawIOBase, bandwidth: float, latency: float):
+        self._raw = raw
+        self._bandwidth = bandwidth
+        self._latency = latency
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._raw.readinto(b)
+        time.sleep(self._latency + n / self._bandwidth)
+        return n
+
+    def close(self) -> None:
+        self._raw.close()
+        super().close()
+
+
+def write_container(f, reader_key: SoftwareKey, size: int) -> None:
+    """Writes a container with random cleartext of given size."""
+    dek = secrets.token_bytes(32)
+    ekey = SoftwareKey.generate()
+    content = bytes(8) + dek
+    nonce = secrets.token_bytes(12)
+    encrypted = crypto_aead_chacha20poly1305_ietf_encrypt(
+        content, None, nonce, ekey.compute_write_key(reader_key.public_key)
+    )
+    body = bytes(4) + ekey.public_key + nonce + encrypted
+    f.write(b"crypt4gh" + (1).to_bytes(4, "little") * 2)
+    f.write((len(body) + 4).to_bytes(4, "little") + body)
+    block = os.urandom(65536)
+    for offset in range(0, size, 65536):
+        nonce = secrets.token_bytes(12)
+        f.write(nonce)
+        f.write(
+            crypto_aead_chacha20poly1305_ietf_encrypt(
+                block[: size - offset], None, nonce, dek
+            )
+        )
+
+
+def measure(path: str, key: SoftwareKey, args, depth: int) -> float:
+    """Reads and decrypts the whole container.
+
+    Returns:
+        The throughput in MiB/s.
+
+    """
+    istream = ThrottledStream(
+        open(path, "rb", buffering=0),
+        args.bandwidth * 1024 * 1024,
+        args.latency / 1000,
+    )
+    started = time.perf_counter()
+    with istream:
+        size = sum(
+            len(block.cleartext)
+            for block in Crypt4GH(istream, key, read_ahead=depth).data_blocks
+        )
+    return size / (time.perf_counter() - started) / 1024 / 1024
+
+
+def main(argv: list[str] = None) -> None:
+    """Runs the benchmark and prints the report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", type=int, default=64, help="MiB")
+    parser.add_argument("--bandwidth", type=float, default=150, help="MiB/s")
+    parser.add_argument("--latency", type=float, default=0.0, help="ms")
+    parser.add_argument("--depths", type=str, default="0,1,2,4")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    key = SoftwareKey.generate()
+    with tempfile.NamedTemporaryFile() as f:
+        write_container(f, key, args.size * 1024 * 1024)
+        f.flush()
+        for depth in (int(depth) for depth in args.depths.split(",")):
+            throughput = measure(f.name, key, args, depth)
+            print(f"read_ahead={depth}: {throughput:.1f} MiB/s")
+
+
+if __name__ == "__main__":
+    main()
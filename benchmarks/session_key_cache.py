@@ -0,0 +1,52 @@
+"""Microbenchmark of the SoftwareKey session keys memoization.
+
+Measures the time of computing the write key for a small set of
+recipients repeatedly - as when adding the same recipients to many
+containers - with and without the session keys cache enabled.
+
+Example:
+
+    python benchmarks/session_key_cache.py --iterations 20000 --peers 4
+
+"""
+
+import argparse
+import sys
+import time
+
+from oarepo_c4gh.key import SoftwareKey
+
+
+def measure(key: SoftwareKey, peers: list[bytes], iterations: int) -> float:
+    """Computes the write keys for the peers in round-robin fashion.
+
+    Returns:
+        The time per operation in microseconds.
+
+    """
+    started = time.perf_counter()
+    for idx in range(iterations):
+        key.compute_write_key(peers[idx % len(peers)])
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(argv: list[str] = None) -> None:
+    """Runs the benchmark and prints the report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--peers", type=int, default=4)
+    parser.add_argument("--cache-size", type=int, default=256)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    key = SoftwareKey.generate()
+    peers = [SoftwareKey.generate().public_key for idx in range(args.peers)]
+    uncached = measure(key, peers, args.iterations)
+    key.enable_cache(args.cache_size)
+    cached = measure(key, peers, args.iterations)
+    key.disable_cache()
+    print(f"uncached: {uncached:.2f} us/op")
+    print(f"cached:   {cached:.2f} us/op")
+    print(f"speedup:  {uncached / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
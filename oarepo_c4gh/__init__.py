@@ -12,6 +12,7 @@ from .exceptions import (
     Crypt4GHHeaderPacketException,
     Crypt4GHDEKException,
     Crypt4GHProcessedException,
+    Crypt4GHKeyBusyException,
 )
 
 __all__ = [
@@ -31,4 +32,5 @@ __all__ = [
     "Crypt4GHHeaderPacketException",
     "Crypt4GHDEKException",
     "Crypt4GHProcessedException",
+    "Crypt4GHKeyBusyException",
 ]
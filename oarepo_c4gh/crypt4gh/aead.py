@@ -0,0 +1,320 @@
+"""This module provides the ChaCha20-Poly1305 (IETF) authenticated
+encryption used for both the header packets and the data blocks with
+pluggable implementations. Both PyNaCl (libsodium) and cryptography
+(OpenSSL) are supported and the backend used is selected on first
+use:
+
+- explicitly using `set_aead_backend`, or
+- by the `C4GH_AEAD_BACKEND` environment variable ("nacl",
+  "cryptography" or "auto"), or
+- automatically by a quick benchmark of all available backends.
+
+All the backends work with cipher contexts created for given key
+which can be reused for any number of operations with that key.
+
+"""
+
+import os
+import secrets
+from threading import Lock
+from time import perf_counter
+from typing import Optional, Protocol, abstractmethod
+
+from nacl.bindings import (
+    crypto_aead_chacha20poly1305_ietf_decrypt,
+    crypto_aead_chacha20poly1305_ietf_encrypt,
+)
+from nacl.exceptions import CryptoError
+from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+from cryptography.exceptions import InvalidTag
+
+# Environment variable selecting the backend
+AEAD_BACKEND_ENV = "C4GH_AEAD_BACKEND"
+
+
+class AEADBackend(Protocol):
+    """Protocol of the ChaCha20-Poly1305 implementations. The
+    context returned by `context` is opaque to the callers and it is
+    passed back to the other methods.
+
+    """
+
+    name = None
+
+    @abstractmethod
+    def context(self, key: bytes) -> object:
+        """Prepares the cipher context for given key.
+
+        Parameters:
+            key: the 32 bytes of the symmetric key
+
+        Returns:
+            The context usable with all the other methods.
+
+        """
+        ...
+
+    @abstractmethod
+    def encrypt(self, context: object, nonce: bytes, data: bytes) -> bytes:
+        """Encrypts the data and appends the MAC.
+
+        Parameters:
+            context: the cipher context
+            nonce: the 12 bytes of the nonce
+            data: the cleartext
+
+        Returns:
+            The ciphertext followed by the MAC.
+
+        """
+        ...
+
+    @abstractmethod
+    def decrypt(
+        self, context: object, nonce: bytes, data: bytes
+    ) -> Optional[bytes]:
+        """Verifies the MAC and decrypts the data.
+
+        Parameters:
+            context: the cipher context
+            nonce: the 12 bytes of the nonce
+            data: the ciphertext followed by the MAC
+
+        Returns:
+            The cleartext or None if the authentication fails.
+
+        """
+        ...
+
+    def decrypt_into(
+        self, context: object, nonce: bytes, data: bytes, buf: memoryview
+    ) -> bool:
+        """Verifies the MAC and decrypts the data into given
+        buffer. The default implementation copies the decrypted
+        cleartext.
+
+        Parameters:
+            context: the cipher context
+            nonce: the 12 bytes of the nonce
+            data: the ciphertext followed by the MAC
+            buf: writable buffer of exactly the cleartext size
+
+        Returns:
+            True if the data was decrypted, False if the authentication
+                fails (the buffer contents are undefined then).
+
+        """
+        cleartext = self.decrypt(context, nonce, data)
+        if cleartext is None:
+            return False
+        buf[:] = cleartext
+        return True
+
+
+class NaClAEADBackend(AEADBackend):
+    """Implementation using the libsodium bindings of PyNaCl. The
+    context is the key itself as libsodium has no key setup.
+
+    """
+
+    name = "nacl"
+
+    def context(self, key: bytes) -> bytes:
+        """The key is used as the context directly."""
+        return bytes(key)
+
+    def encrypt(self, context: bytes, nonce: bytes, data: bytes) -> bytes:
+        """Encrypts the data (the bindings accept only bytes)."""
+        return crypto_aead_chacha20poly1305_ietf_encrypt(
+            bytes(data), None, bytes(nonce), context
+        )
+
+    def decrypt(
+        self, context: bytes, nonce: bytes, data: bytes
+    ) -> Optional[bytes]:
+        """Decrypts the data (the bindings accept only bytes)."""
+        try:
+            return crypto_aead_chacha20poly1305_ietf_decrypt(
+                bytes(data), None, bytes(nonce), context
+            )
+        except CryptoError:
+            return None
+
+
+class CryptographyAEADBackend(AEADBackend):
+    """Implementation using the OpenSSL bindings of cryptography. The
+    context is the key object which performs the key setup only
+    once. Any bytes-like objects are accepted without copying.
+
+    """
+
+    name = "cryptography"
+
+    def context(self, key: bytes) -> ChaCha20Poly1305:
+        """Creates the key object."""
+        return ChaCha20Poly1305(bytes(key))
+
+    def encrypt(
+        self, context: ChaCha20Poly1305, nonce: bytes, data: bytes
+    ) -> bytes:
+        """Encrypts the data."""
+        return context.encrypt(nonce, data, None)
+
+    def decrypt(
+        self, context: ChaCha20Poly1305, nonce: bytes, data: bytes
+    ) -> Optional[bytes]:
+        """Decrypts the data."""
+        try:
+            return context.decrypt(nonce, data, None)
+        except InvalidTag:
+            return None
+
+    def decrypt_into(
+        self,
+        context: ChaCha20Poly1305,
+        nonce: bytes,
+        data: bytes,
+        buf: memoryview,
+    ) -> bool:
+        """Decrypts the data directly into the buffer if supported by
+        the installed version of cryptography.
+
+        """
+        if not hasattr(context, "decrypt_into"):
+            return super().decrypt_into(context, nonce, data, buf)
+        try:
+            context.decrypt_into(nonce, data, None, buf)
+            return True
+        except InvalidTag:
+            return False
+
+
+# All the available backends by name
+AEAD_BACKENDS = {
+    NaClAEADBackend.name: NaClAEADBackend,
+    CryptographyAEADBackend.name: CryptographyAEADBackend,
+}
+
+_backend_lock = Lock()
+_backend = None
+
+
+def benchmark_aead_backend(
+    backend: AEADBackend, size: int = 65536, rounds: int = 8
+) -> float:
+    """Measures the time the backend needs to decrypt data blocks of
+    given size with a reused context.
+
+    Parameters:
+        backend: the backend to measure
+        size: the size of the cleartext
+        rounds: the number of decryptions
+
+    Returns:
+        The time of the fastest decryption in seconds.
+
+    """
+    context = backend.context(secrets.token_bytes(32))
+    nonce = secrets.token_bytes(12)
+    data = backend.encrypt(context, nonce, bytes(size))
+    best = None
+    for idx in range(rounds):
+        started = perf_counter()
+        backend.decrypt(context, nonce, data)
+        elapsed = perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def select_aead_backend(name: str = "auto") -> AEADBackend:
+    """Creates the backend of given name or the fastest one.
+
+    Parameters:
+        name: the backend name or "auto"
+
+    Returns:
+        The backend instance.
+
+    Raises:
+        ValueError: if the name is unknown
+
+    """
+    if name == "auto":
+        backends = [
+            backend_class() for backend_class in AEAD_BACKENDS.values()
+        ]
+        return min(backends, key=benchmark_aead_backend)
+    if name not in AEAD_BACKENDS:
+        raise ValueError(f"Unknown AEAD backend {name}")
+    return AEAD_BACKENDS[name]()
+
+
+def get_aead_backend() -> AEADBackend:
+    """Returns the backend in use, selecting it on first call.
+
+    Returns:
+        The backend instance.
+
+    """
+    global _backend
+    backend = _backend
+    if backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = select_aead_backend(
+                    os.environ.get(AEAD_BACKEND_ENV, "auto")
+                )
+            backend = _backend
+    return backend
+
+
+def set_aead_backend(backend: str | AEADBackend) -> AEADBackend:
+    """Sets the backend to use from now on. Cipher contexts created
+    by the previous backend must not be used afterwards.
+
+    Parameters:
+        backend: the backend name, "auto" or a backend instance
+
+    Returns:
+        The backend instance.
+
+    """
+    global _backend
+    if isinstance(backend, str):
+        backend = select_aead_backend(backend)
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+
+def aead_encrypt(key: bytes, nonce: bytes, data: bytes) -> bytes:
+    """Encrypts the data with given key using the current backend.
+
+    Parameters:
+        key: the 32 bytes of the symmetric key
+        nonce: the 12 bytes of the nonce
+        data: the cleartext
+
+    Returns:
+        The ciphertext followed by the MAC.
+
+    """
+    backend = get_aead_backend()
+    return backend.encrypt(backend.context(key), nonce, data)
+
+
+def aead_decrypt(key: bytes, nonce: bytes, data: bytes) -> Optional[bytes]:
+    """Decrypts the data with given key using the current backend.
+
+    Parameters:
+        key: the 32 bytes of the symmetric key
+        nonce: the 12 bytes of the nonce
+        data: the ciphertext followed by the MAC
+
+    Returns:
+        The cleartext or None if the authentication fails.
+
+    """
+    backend = get_aead_backend()
+    return backend.decrypt(backend.context(key), nonce, data)
@@ -0,0 +1,10 @@
+"""A convenience module providing all buffer classes in one bundle.
+
+"""
+
+from .header_packet import BufferHeaderPacket
+from .header import BufferHeader
+from .buffer4gh import Buffer4GH
+from .mmap4gh import Mmap4GH
+
+__all__ = ["BufferHeaderPacket", "BufferHeader", "Buffer4GH", "Mmap4GH"]
@@ -0,0 +1,197 @@
+"""A module containing the Crypt4GH container class working on an
+in-memory buffer.
+
+"""
+
+from ...key import Key, KeyCollection
+from .header import BufferHeader
+from ...exceptions import Crypt4GHProcessedException
+from ..common.data_block import DataBlock
+from ..analyzer import Analyzer
+from typing import Generator, Union
+from ..common.proto4gh import Proto4GH
+from ..util import CRYPT4GH_BLOCK_SIZE
+from ..verify import VerificationReport, verify_crypt4gh_blocks
+
+
+class Buffer4GH(Proto4GH):
+    """An instance of this class represents a Crypt4GH container
+    stored as a whole in a bytes-like object (including a memory
+    map). The data blocks are memoryview slices of the buffer which
+    are not copied before decryption.
+
+    """
+
+    def __init__(
+        self,
+        buffer,
+        reader_key: Union[Key, KeyCollection],
+        decrypt: bool = True,
+        analyze: bool = False,
+    ) -> None:
+        """Parses the header fields of the container in given buffer.
+
+        Parameters:
+            buffer: bytes-like object with the whole container
+            reader_key: the key (or collection) used for reading the container
+            decrypt: if True, attempt to decrypt the data blocks
+            analyze: if True, collect the container structure information
+
+        """
+        self._analyzer = Analyzer() if analyze else None
+        self._header = BufferHeader(reader_key, buffer, self._analyzer)
+        self._buffer = self._header._buffer
+        self._consumed = False
+        self._decrypt = decrypt
+
+    @property
+    def header(self) -> BufferHeader:
+        """Accessor for the container header object.
+
+        Returns:
+            The contents of the parsed header.
+
+        """
+        return self._header
+
+    @property
+    def data_length(self) -> int:
+        """Returns the length of the data section in bytes."""
+        return len(self._buffer) - self._header.header_length
+
+    @property
+    def block_count(self) -> int:
+        """Returns the number of data blocks in the container."""
+        return -(-self.data_length // CRYPT4GH_BLOCK_SIZE)
+
+    def iter_blocks(
+        self, first: int = 0, count: int = None
+    ) -> Generator[DataBlock, None, None]:
+        """Iterates over given range of data blocks.
+
+        Parameters:
+            first: the index of the first block
+            count: the number of blocks (None means all remaining)
+
+        """
+        start = self._header.header_length
+        end = len(self._buffer)
+        position = start + first * CRYPT4GH_BLOCK_SIZE
+        if count is not None:
+            end = min(end, position + count * CRYPT4GH_BLOCK_SIZE)
+        offset = first * (CRYPT4GH_BLOCK_SIZE - 16)
+        deks = self._header.deks
+        while position < end:
+            data = self._buffer[position : position + CRYPT4GH_BLOCK_SIZE]
+            position += len(data)
+            if self._decrypt:
+                enc, clear, idx = deks.decrypt_block(data)
+            else:
+                enc = data
+                clear = None
+                idx = None
+            if enc is None:
+                break
+            block = DataBlock(enc, clear, idx, offset)
+            offset = offset + block.size
+            yield block
+
+    def read_blocks(
+        self, first: int = 0, count: int = None
+    ) -> Generator[DataBlock, None, None]:
+        """Random access to given range of data blocks. Unlike
+        `data_blocks` it can be used repeatedly and the blocks are not
+        analyzed.
+
+        Parameters:
+            first: the index of the first block
+            count: the number of blocks (None means all remaining)
+
+        """
+        return self.iter_blocks(first, count)
+
+    def decrypt_into(self, buf, first: int = 0, count: int = None) -> int:
+        """Decrypts given range of data blocks directly into a
+        writable buffer without creating intermediate cleartext
+        objects.
+
+        Parameters:
+            buf: writable buffer (bytearray, mmap, array, ...)
+            first: the index of the first block
+            count: the number of blocks (None means all remaining)
+
+        Returns:
+            The number of bytes written to the buffer.
+
+        Raises:
+            ValueError: if the buffer is too small
+            Crypt4GHDEKException: if some block cannot be decrypted
+
+        """
+        return self._header.deks.decrypt_blocks_into(
+            self.raw_blocks(first, count), buf
+        )
+
+    def verify(self, stop_on_failure: bool = False) -> VerificationReport:
+        """Checks the authentication tags of all the data blocks
+        without keeping their cleartext.
+
+        Parameters:
+            stop_on_failure: if True, stop at the first bad block
+
+        Returns:
+            The verification report.
+
+        """
+        return verify_crypt4gh_blocks(
+            self._header.deks, self.raw_blocks(), stop_on_failure
+        )
+
+    def raw_blocks(
+        self, first: int = 0, count: int = None
+    ) -> Generator[memoryview, None, None]:
+        """Iterates over the raw data blocks (including the nonces and
+        MACs) as slices of the buffer.
+
+        Parameters:
+            first: the index of the first block
+            count: the number of blocks (None means all remaining)
+
+        """
+        start = self._header.header_length + first * CRYPT4GH_BLOCK_SIZE
+        end = len(self._buffer)
+        if count is not None:
+            end = min(end, start + count * CRYPT4GH_BLOCK_SIZE)
+        for position in range(start, end, CRYPT4GH_BLOCK_SIZE):
+            yield self._buffer[
+                position : min(position + CRYPT4GH_BLOCK_SIZE, end)
+            ]
+
+    @property
+    def data_blocks(self) -> Generator[DataBlock, None, None]:
+        """Single-use iterator for data blocks.
+
+        Raises:
+            Crypt4GHProcessedException: if called second time
+
+        """
+        assert self.header.packets is not None
+        if self._consumed:
+            raise Crypt4GHProcessedException("Already processed once")
+        for block in self.iter_blocks():
+            if self._analyzer is not None:
+                self._analyzer.analyze_block(block)
+            yield block
+        self._consumed = True
+
+    @property
+    def analyzer(self):
+        """For direct access to analyzer and its results."""
+        return self._analyzer
+
+    @property
+    def clear_blocks(self) -> Generator[DataBlock, None, None]:
+        """Single-use iterator for deciphered blocks only."""
+        for block in self.data_blocks:
+            if block.is_deciphered:
+                yield block
@@ -0,0 +1,99 @@
+"""This module implements the class responsible for loading Crypt4GH
+header from a bytes-like object or memory-mapped file.
+
+"""
+
+from .header_packet import BufferHeaderPacket
+from ..stream.header import StreamHeader, check_crypt4gh_magic
+from ...key import Key, KeyCollection
+from ..util import read_crypt4gh_bytes_le_uint32
+from ...exceptions import Crypt4GHHeaderException
+from ..dek_collection import DEKCollection
+from ..analyzer import Analyzer
+from typing import Union
+
+
+class BufferHeader(StreamHeader):
+    """The Crypt4GH header parsed directly from a buffer. The packet
+    data of all header packets are memoryview slices of the buffer
+    and therefore the buffer must not be modified (or the memory map
+    closed) while the header is in use.
+
+    """
+
+    def __init__(
+        self,
+        reader_key_or_collection: Union[Key, KeyCollection],
+        buffer,
+        analyzer: Analyzer = None,
+    ) -> None:
+        """Checks the Crypt4GH container signature, version and header
+        packet count. The header packets are parsed lazily when
+        needed.
+
+        Parameters:
+            reader_key_or_collection: the key used for trying to decrypt header
+                packets (must include the private part) or collection of keys
+            buffer: bytes-like object (bytes, bytearray, mmap, ...) starting
+                with the container header
+            analyzer: analyzer for storing packet readability information
+
+        """
+        self._buffer = memoryview(buffer).cast("B")
+        self._magic_bytes = bytes(self._buffer[0:8])
+        check_crypt4gh_magic(self._magic_bytes)
+        self._version = read_crypt4gh_bytes_le_uint32(
+            self._buffer, 8, "version"
+        )
+        if self._version != 1:
+            raise Crypt4GHHeaderException(
+                f"Invalid Crypt4GH version {self._version}"
+            )
+        self._packet_count = read_crypt4gh_bytes_le_uint32(
+            self._buffer, 12, "packet count"
+        )
+        if isinstance(reader_key_or_collection, KeyCollection):
+            self._reader_keys = reader_key_or_collection
+        else:
+            self._reader_keys = KeyCollection(reader_key_or_collection)
+        self._istream = None
+        self._offset = 16
+        self._packets = None
+        self._serialized = None
+        self._deks = DEKCollection()
+        self._analyzer = analyzer
+
+    def load_packet(self) -> BufferHeaderPacket:
+        """Parses the next header packet from the buffer.
+
+        Returns:
+            The header packet (decrypted if possible).
+
+        """
+        packet = BufferHeaderPacket(
+            self._reader_keys, self._buffer, self._offset
+        )
+        self._offset += packet.length
+        return packet
+
+    @property
+    def header_length(self) -> int:
+        """Returns the length of the header in the buffer - that is
+        the offset of the first data block.
+
+        """
+        if self._packets is None:
+            self.load_packets()
+        return self._offset
+
+    @property
+    def serialized(self) -> memoryview:
+        """Returns the serialized header as a slice of the buffer.
+
+        Returns:
+            The header bytes exactly as stored in the buffer.
+
+        """
+        if self._serialized is None:
+            self._serialized = self._buffer[: self.header_length]
+        return self._serialized
@@ -0,0 +1,46 @@
+"""Implementation of single Crypt4GH header packet parser working
+directly on an in-memory buffer.
+
+"""
+
+from ..common.header_packet import HeaderPacket
+from ..stream.header_packet import parse_crypt4gh_header_packet
+from ...key import KeyCollection
+from ..util import read_crypt4gh_bytes_le_uint32
+from ...exceptions import Crypt4GHHeaderPacketException
+
+
+class BufferHeaderPacket(HeaderPacket):
+    """Loads the header packet from a memory buffer. The packet data
+    is a memoryview slice of the buffer and is not copied.
+
+    """
+
+    def __init__(
+        self, reader_keys: KeyCollection, buffer: memoryview, offset: int
+    ) -> None:
+        """Parses a single packet starting at given offset of the
+        buffer. If it is possible to decrypt the packet with given
+        reader key, the contents are parsed and interpreted as well.
+
+        Parameters:
+            reader_keys: the key collection used for decryption attempts
+            buffer: the view of the whole container (or header) buffer
+            offset: the position of the packet in the buffer
+
+        Raises:
+            Crypt4GHHeaderPacketException: if any problem in parsing the packet occurs.
+
+        """
+        _packet_length = read_crypt4gh_bytes_le_uint32(
+            buffer, offset, "packet length"
+        )
+        _packet_data = buffer[offset : offset + _packet_length]
+        if len(_packet_data) != _packet_length:
+            raise Crypt4GHHeaderPacketException(
+                f"Header packet: read only {len(_packet_data)} "
+                f"instead of {_packet_length}"
+            )
+        super().__init__(
+            *parse_crypt4gh_header_packet(reader_keys, _packet_data)
+        )
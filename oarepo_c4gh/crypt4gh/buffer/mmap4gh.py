@@ -0,0 +1,121 @@
+"""A module containing the Crypt4GH container class working on a
+memory-mapped local file.
+
+"""
+
+import io
+import mmap
+import weakref
+from ...key import Key, KeyCollection
+from .buffer4gh import Buffer4GH
+from .header import BufferHeader
+from ..common.data_block import DataBlock
+from typing import Generator, Union
+
+
+def advise_mmap(mm: mmap.mmap, option_name: str) -> None:
+    """Passes the access pattern hint to the kernel if the platform
+    supports it.
+
+    Parameters:
+        mm: the memory map
+        option_name: the name of the MADV_* constant in the mmap module
+
+    """
+    option = getattr(mmap, option_name, None)
+    if option is not None and hasattr(mm, "madvise"):
+        mm.madvise(option)
+
+
+class Mmap4GH(Buffer4GH):
+    """Crypt4GH container backed by a read-only memory map of a local
+    file. Sequential processing of the data blocks advises the kernel
+    to read ahead aggressively, reading block ranges advises random
+    access.
+
+    All the header packets and data blocks obtained from the container
+    must be released before it is closed.
+
+    """
+
+    def __init__(
+        self,
+        file: Union[str, io.IOBase],
+        reader_key: Union[Key, KeyCollection],
+        decrypt: bool = True,
+        analyze: bool = False,
+    ) -> None:
+        """Maps the file and parses the header fields.
+
+        Parameters:
+            file: path to the container file or an open file object
+            reader_key: the key (or collection) used for reading the container
+            decrypt: if True, attempt to decrypt the data blocks
+            analyze: if True, collect the container structure information
+
+        """
+        if isinstance(file, str):
+            with open(file, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._reader_key = reader_key
+        super().__init__(self._mmap, reader_key, decrypt, analyze)
+
+    def read_blocks(
+        self, first: int = 0, count: int = None
+    ) -> Generator[DataBlock, None, None]:
+        """Random access to given range of data blocks advising random
+        access to the memory map.
+
+        Parameters:
+            first: the index of the first block
+            count: the number of blocks (None means all remaining)
+
+        """
+        advise_mmap(self._mmap, "MADV_RANDOM")
+        return super().read_blocks(first, count)
+
+    @property
+    def data_blocks(self) -> Generator[DataBlock, None, None]:
+        """Single-use iterator for data blocks advising sequential
+        access to the memory map.
+
+        """
+        advise_mmap(self._mmap, "MADV_SEQUENTIAL")
+        return super().data_blocks
+
+    def close(self) -> None:
+        """Releases the buffer and unmaps the file. If the file cannot
+        be unmapped yet, the container stays usable and closing can be
+        retried once the offending references are dropped.
+
+        Raises:
+            BufferError: if some header packets or data blocks are still referenced
+
+        """
+        if self._mmap.closed:
+            return
+        header = weakref.ref(self._header)
+        self._header = None
+        self._buffer.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            self._buffer = memoryview(self._mmap)
+            self._header = header()
+            if self._header is None:
+                self._header = BufferHeader(
+                    self._reader_key, self._buffer, self._analyzer
+                )
+            else:
+                self._header._buffer = self._buffer
+            raise
+
+    def __enter__(self) -> "Mmap4GH":
+        """Returns the container itself."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Closes the container."""
+        self.close()
@@ -5,6 +5,28 @@
 from typing import Protocol, abstractmethod
 
 
+def serialize_header(header: "Header") -> bytes:
+    """Serializes the header - magic bytes, version, packet count and
+    all the packets.
+
+    Parameters:
+        header: the header to serialize
+
+    Returns:
+        The serialized header bytes.
+
+    """
+    packets = header.packets
+    return b"".join(
+        [
+            header.magic_bytes,
+            header.version.to_bytes(4, "little"),
+            len(packets).to_bytes(4, "little"),
+        ]
+        + [packet.packet_data for packet in packets]
+    )
+
+
 class Header(Protocol):
     """This is a protocol class which guarantees that a header packets
     collection is available by its descendants. The properties
@@ -33,3 +55,17 @@ class Header(Protocol):
 
         """
         ...
+
+    @property
+    def serialized(self) -> bytes:
+        """Returns the fully serialized header. The default
+        implementation serializes the header on each access, the
+        implementations should cache the result.
+
+        """
+        return serialize_header(self)
+
+    @property
+    def serialized_length(self) -> int:
+        """Returns the length of the serialized header in bytes."""
+        return len(self.serialized)
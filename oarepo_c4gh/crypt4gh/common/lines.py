@@ -0,0 +1,107 @@
+"""This module implements splitting the cleartext of the container
+data blocks into lines (or other delimited records). The lines
+contained within single block are sliced from the block cleartext and
+only the lines spanning block boundaries are assembled from the
+pieces.
+
+"""
+
+from .data_block import DataBlock
+from ...exceptions import Crypt4GHDEKException
+from typing import Generator, Iterable, Union
+
+
+def iter_crypt4gh_lines(
+    blocks: Iterable[DataBlock],
+    delimiter: bytes = b"\n",
+    keepends: bool = False,
+    views: bool = False,
+) -> Generator[Union[bytes, memoryview], None, None]:
+    """Splits the cleartext of given data blocks into lines. The last
+    line is returned even if it does not end with the delimiter.
+
+    Parameters:
+        blocks: the data blocks (must all be deciphered)
+        delimiter: the line delimiter (may be longer than one byte)
+        keepends: if True, the delimiter is kept at the end of the lines
+        views: if True, memoryviews are returned instead of bytes which
+            avoids copying the lines contained within single block
+
+    Returns:
+        Iterator over the lines.
+
+    Raises:
+        Crypt4GHDEKException: if some data block cannot be decrypted
+
+    """
+    assert len(delimiter) > 0, "The delimiter must not be empty"
+    dlen = len(delimiter)
+    keep = dlen if keepends else 0
+    pending = bytearray()
+    for block in blocks:
+        if not block.is_deciphered:
+            raise Crypt4GHDEKException(
+                f"Cannot decrypt data block at offset {block.offset}"
+            )
+        data = block.cleartext
+        if not isinstance(data, (bytes, bytearray)):
+            data = bytes(data)
+        view = memoryview(data)
+        start = 0
+        if len(pending) > 0:
+            end = -1
+            if dlen > 1:
+                # The delimiter may span the block boundary
+                tail = len(pending) - min(len(pending), dlen - 1)
+                idx = (pending[tail:] + data[: dlen - 1]).find(delimiter)
+                if idx >= 0:
+                    end = tail + idx
+                    start = tail + idx + dlen - len(pending)
+                    line = pending[: end + keep]
+                    if end + keep > len(pending):
+                        line += data[:start]
+            if end < 0:
+                end = data.find(delimiter)
+                if end < 0:
+                    pending += data
+                    continue
+                start = end + dlen
+                line = pending + data[: end + keep]
+            pending = bytearray()
+            yield memoryview(line) if views else bytes(line)
+        while True:
+            end = data.find(delimiter, start)
+            if end < 0:
+                break
+            line = view[start : end + keep]
+            yield line if views else bytes(line)
+            start = end + dlen
+        if start < len(data):
+            pending += view[start:]
+    if len(pending) > 0:
+        yield memoryview(pending) if views else bytes(pending)
+
+
+def batch_crypt4gh_lines(
+    lines: Iterable, batch_size: int
+) -> Generator[list, None, None]:
+    """Groups the lines into lists of given size (the last one may be
+    shorter).
+
+    Parameters:
+        lines: the lines to group
+        batch_size: the number of lines in each batch
+
+    Returns:
+        Iterator over the batches.
+
+    """
+    assert batch_size > 0, "The batch size must be positive"
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
@@ -6,6 +6,7 @@ from typing import Protocol, abstractmethod
 from .header import Header
 from typing import Generator
 from .data_block import DataBlock
+from .lines import iter_crypt4gh_lines, batch_crypt4gh_lines
 
 
 class Proto4GH(Protocol):
@@ -22,3 +23,38 @@ class Proto4GH(Protocol):
     def data_blocks(self) -> Generator[DataBlock, None, None]:
         """Must be a single-use iterator for data blocks."""
         ...
+
+    @property
+    def data_length(self) -> int:
+        """Returns the length of the data section in bytes if it can
+        be determined without reading it, None otherwise.
+
+        """
+        return None
+
+    def lines(
+        self,
+        delimiter: bytes = b"\n",
+        keepends: bool = False,
+        views: bool = False,
+        batch_size: int = 0,
+    ) -> Generator:
+        """Single-use iterator over the lines of the cleartext. It
+        consumes the data blocks.
+
+        Parameters:
+            delimiter: the line delimiter (may be longer than one byte)
+            keepends: if True, the delimiter is kept at the end of the lines
+            views: if True, memoryviews are returned instead of bytes
+            batch_size: if positive, lists of this many lines are returned
+
+        Raises:
+            Crypt4GHDEKException: if some data block cannot be decrypted
+
+        """
+        lines = iter_crypt4gh_lines(
+            self.data_blocks, delimiter, keepends, views
+        )
+        if batch_size > 0:
+            return batch_crypt4gh_lines(lines, batch_size)
+        return lines
@@ -4,6 +4,7 @@ Module with Data Encryption Key wrapper.
 
 from ..key import Key
 from ..exceptions import Crypt4GHDEKException
+from .aead import AEADBackend, get_aead_backend
 
 
 class DEK:
@@ -23,6 +24,8 @@ class DEK:
             raise Crypt4GHDEKException("DEK must be 32 bytes")
         self._dek = dek
         self._key = key
+        self._backend = None
+        self._context = None
 
     @property
     def dek(self) -> bytes:
@@ -32,6 +35,32 @@ class DEK:
         """
         return self._dek
 
+    def __getstate__(self) -> dict:
+        """Returns the picklable state without the cipher context."""
+        state = self.__dict__.copy()
+        state["_backend"] = None
+        state["_context"] = None
+        return state
+
+    def context(self, backend: AEADBackend = None) -> object:
+        """Returns the cipher context of this key for given AEAD
+        backend. The context is created on first use and reused
+        afterwards (unless the backend changes).
+
+        Parameters:
+            backend: the AEAD backend (defaults to the one in use)
+
+        Returns:
+            The cipher context.
+
+        """
+        if backend is None:
+            backend = get_aead_backend()
+        if self._backend is not backend:
+            self._context = backend.context(self._dek)
+            self._backend = backend
+        return self._context
+
     @property
     def key(self) -> Key:
         """Bytes representation of the public key that unlocked this
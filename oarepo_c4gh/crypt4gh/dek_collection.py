@@ -7,13 +7,35 @@ to decrypt the data.
 """
 
 from functools import reduce
+from typing import Iterable
 from ..exceptions import Crypt4GHDEKException
 import io
-from nacl.bindings import crypto_aead_chacha20poly1305_ietf_decrypt
-from nacl.exceptions import CryptoError
+from .aead import get_aead_backend
 from .dek import DEK
 
 
+def decrypt_crypt4gh_block_into(
+    dek: DEK, nonce, datamac, buf: memoryview
+) -> bool:
+    """Decrypts single data block directly into given buffer if
+    supported by the AEAD backend in use. Otherwise the cleartext is
+    decrypted and copied into the buffer.
+
+    Parameters:
+        dek: the Data Encryption Key (its cipher context is reused)
+        nonce: the 12 bytes of the block nonce
+        datamac: the encrypted block data followed by the MAC
+        buf: writable buffer of exactly the cleartext size
+
+    Returns:
+        True if the block was decrypted, False if the MAC does not
+            match (the buffer contents are undefined then).
+
+    """
+    backend = get_aead_backend()
+    return backend.decrypt_into(dek.context(backend), nonce, datamac, buf)
+
+
 class DEKCollection:
     """This class contains a list of Data Encryption Keys and provides
     functionality for the Header4GH reader to add new DEKs. When
@@ -90,20 +112,122 @@ class DEKCollection:
         datamac = istream.read(65536 + 16)
         if len(datamac) < 16:
             return (None, None, None)
+        cleartext, idx = self.decrypt_nonce_datamac(nonce, datamac)
+        return (nonce + datamac, cleartext, idx)
+
+    def decrypt_block(self, data: bytes) -> (bytes, bytes, int):
+        """Decrypts single data block given as a bytes-like object
+        (typically a memoryview slice of a memory-mapped
+        container). The behavior is the same as with `decrypt_packet`
+        and the encrypted version returned is the object given.
+
+        Parameters:
+            data: the data block including the nonce and MAC
+
+        Returns:
+            The encrypted version of the data block, decrypted
+                contents (if possible) and the index of the DEK
+                used. All are None if the block is too short.
+
+        """
+        if len(data) < 12 + 16:
+            return (None, None, None)
+        view = memoryview(data)
+        cleartext, idx = self.decrypt_nonce_datamac(view[:12], view[12:])
+        return (data, cleartext, idx)
+
+    def decrypt_block_into(self, data: bytes, buf: memoryview) -> int:
+        """Decrypts single data block given as a bytes-like object
+        directly into given buffer. The DEKs are tried in the same
+        order as with `decrypt_block`.
+
+        Parameters:
+            data: the data block including the nonce and MAC
+            buf: writable buffer of exactly the cleartext size (the
+                data block size minus 28 bytes)
+
+        Returns:
+            The index of the DEK used or None if no DEK can decrypt
+                the block.
+
+        """
+        if self.empty:
+            return None
+        view = memoryview(data)
+        nonce = view[:12]
+        datamac = view[12:]
         current = self._current
         while True:
             dek = self._deks[current]
-            try:
-                cleartext = crypto_aead_chacha20poly1305_ietf_decrypt(
-                    datamac, None, nonce, dek.dek
+            if decrypt_crypt4gh_block_into(dek, nonce, datamac, buf):
+                self._current = current
+                return current
+            current = (current + 1) % self.count
+            if current == self._current:
+                return None
+
+    def decrypt_blocks_into(self, blocks: Iterable[bytes], buf) -> int:
+        """Decrypts consecutive data blocks into given buffer so that
+        the cleartext of each block is placed right after the previous
+        one.
+
+        Parameters:
+            blocks: the data blocks including the nonces and MACs
+            buf: writable buffer (bytearray, mmap, array, ...)
+
+        Returns:
+            The number of bytes written to the buffer.
+
+        Raises:
+            ValueError: if the buffer is too small
+            Crypt4GHDEKException: if some block cannot be decrypted
+
+        """
+        view = memoryview(buf).cast("B")
+        position = 0
+        for idx, data in enumerate(blocks):
+            size = len(data) - 12 - 16
+            if size < 0:
+                break
+            if position + size > len(view):
+                raise ValueError(
+                    f"Buffer of {len(view)} bytes too small for block {idx}"
                 )
+            target = view[position : position + size]
+            if self.decrypt_block_into(data, target) is None:
+                raise Crypt4GHDEKException(f"Cannot decrypt data block {idx}")
+            position += size
+        return position
+
+    def decrypt_nonce_datamac(
+        self, nonce: bytes, datamac: bytes
+    ) -> (bytes, int):
+        """Tries all DEKs in the collection in circular order starting
+        with the last successful one until all have been tried or one
+        succeeded.
+
+        Parameters:
+            nonce: the 12 bytes of the block nonce
+            datamac: the encrypted block data followed by the MAC
+
+        Returns:
+            The cleartext and the index of the DEK used or two None
+                values if no DEK can decrypt the block.
+
+        """
+        if self.empty:
+            return (None, None)
+        backend = get_aead_backend()
+        current = self._current
+        while True:
+            dek = self._deks[current]
+            cleartext = backend.decrypt(dek.context(backend), nonce, datamac)
+            if cleartext is not None:
                 self._current = current
-                return (nonce + datamac, cleartext, current)
-            except CryptoError as cerr:
-                pass
+                return (cleartext, current)
             current = (current + 1) % self.count
             if current == self._current:
-                return (nonce + datamac, None, None)
+                return (None, None)
 
     def __getitem__(self, idx: int) -> DEK:
         """Returns DEK at given index.
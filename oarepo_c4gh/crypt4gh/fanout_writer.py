@@ -0,0 +1,84 @@
+"""Writer serializing single container into multiple output streams
+with different headers. The data blocks are read from the source
+container only once and written to all the outputs.
+
+"""
+
+from .common.proto4gh import Proto4GH
+from .common.header import Header
+from .filter.add_recipient_header import AddRecipientHeader
+from ..key.writer_key_policy import WriterKeyPolicy
+from typing import List, Self
+import io
+
+
+class Crypt4GHFanOutWriter:
+    """Writes the same data section with different header variants to
+    multiple output streams.
+
+    """
+
+    def __init__(
+        self,
+        container: Proto4GH,
+        outputs: List[tuple[Header, io.RawIOBase]],
+    ) -> None:
+        """Stores the source container and the outputs. The header
+        variants are usually filters applied to the container header.
+
+        Parameters:
+            container: the source container
+            outputs: list of header variant and output stream pairs
+
+        """
+        self._container = container
+        self._outputs = outputs
+
+    @classmethod
+    def for_recipients(
+        self,
+        container: Proto4GH,
+        outputs: List[tuple[bytes, io.RawIOBase]],
+        writer_key_policy: WriterKeyPolicy = None,
+    ) -> Self:
+        """Creates a writer producing a separate output for each
+        recipient with only the packets for that recipient in its
+        header.
+
+        Parameters:
+            container: the source container (must be readable)
+            outputs: list of recipient public key and output stream pairs
+            writer_key_policy: optional shared policy for reusing writer keys
+
+        Returns:
+            The fan-out writer instance.
+
+        """
+        return Crypt4GHFanOutWriter(
+            container,
+            [
+                (
+                    AddRecipientHeader(
+                        container.header,
+                        [public_key],
+                        writer_key_policy,
+                        keep_original=False,
+                    ),
+                    ostream,
+                )
+                for public_key, ostream in outputs
+            ],
+        )
+
+    def write(self) -> None:
+        """Serializes all the headers first and then streams the data
+        blocks once to all the outputs.
+
+        """
+        headers = [header.serialized for header, _ in self._outputs]
+        for serialized, (_, ostream) in zip(headers, self._outputs):
+            ostream.write(serialized)
+        for block in self._container.data_blocks:
+            ciphertext = block.ciphertext
+            for _, ostream in self._outputs:
+                ostream.write(ciphertext)
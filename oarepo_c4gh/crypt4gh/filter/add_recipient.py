@@ -12,6 +12,7 @@ from .header import FilterHeader
 from .filter import Filter
 from ...key import Key
 from .add_recipient_header import AddRecipientHeader
+from ...key.writer_key_policy import WriterKeyPolicy
 
 
 class AddRecipientFilter(Filter):
@@ -20,16 +21,25 @@ class AddRecipientFilter(Filter):
 
     """
 
-    def __init__(self, original: Proto4GH, *recipients: List[Key]) -> None:
+    def __init__(
+        self,
+        original: Proto4GH,
+        *recipients: List[Key],
+        writer_key_policy: WriterKeyPolicy = None,
+    ) -> None:
         """Only prepares the filtered header and original container
         with original blocks.
 
         Parameters:
             original: the original container to be filtered.
+            recipients: the public keys of the recipients to add
+            writer_key_policy: optional shared policy for reusing writer keys
 
         """
         super().__init__(original)
-        self._header = AddRecipientHeader(original.header, recipients)
+        self._header = AddRecipientHeader(
+            original.header, recipients, writer_key_policy
+        )
 
     @property
     def header(self) -> FilterHeader:
@@ -3,14 +3,15 @@
 """
 
 from .header import FilterHeader
-from nacl.bindings import crypto_aead_chacha20poly1305_ietf_encrypt
+from ..aead import aead_encrypt
 from ...key.software import SoftwareKey
 import io
 import secrets
 from ..common.header_packet import HeaderPacket
 from ..common.header import Header
-from typing import List
+from typing import Generator, Iterable, List
 from ...key import Key
+from ...key.writer_key_policy import WriterKeyPolicy
 
 
 class AddRecipientHeader(FilterHeader):
@@ -19,53 +20,85 @@ class AddRecipientHeader(FilterHeader):
 
     """
 
-    def __init__(self, original: Header, recipients: List[Key]):
+    def __init__(
+        self,
+        original: Header,
+        recipients: List[Key],
+        writer_key_policy: WriterKeyPolicy = None,
+        keep_original: bool = True,
+    ):
         """Just initializes the baseline header filter and stores the
         list of recipients for actual processing later.
 
         Parameters:
             original: the original container header
             recipients: a list of recipients' public keys to add
+            writer_key_policy: optional shared policy for reusing writer keys
+            keep_original: if False, only the packets for the new recipients are kept
 
         """
         super().__init__(original)
         self._recipients_to_add = recipients
+        self._writer_key_policy = writer_key_policy
+        self._keep_original = keep_original
 
-    @property
-    def packets(self) -> list:
-        """Returns the filtered packets with added recipients. Both
-        edit lists and DEKs are added.
+    def write_key(self, ekey: SoftwareKey, public_key: bytes) -> tuple:
+        """Returns the writer key for encrypting a packet for given
+        recipient - either from the writer key policy or derived from
+        the ephemeral key given.
+
+        Parameters:
+            ekey: the ephemeral key (None if not generated yet)
+            public_key: the recipient public key
+
+        Returns:
+            The ephemeral key, writer public key and the symmetric key.
+
+        """
+        if self._writer_key_policy is not None:
+            return (ekey,) + self._writer_key_policy.write_key(public_key)
+        if ekey is None:
+            ekey = SoftwareKey.generate()
+        return ekey, ekey.public_key, ekey.compute_write_key(public_key)
+
+    def filter_packets(
+        self, packets: Iterable[HeaderPacket]
+    ) -> Generator[HeaderPacket, None, None]:
+        """Passes all the original packets (unless configured
+        otherwise) and then adds the readable ones encrypted for all
+        the recipients. Both edit lists and
+        DEKs are added. Only the readable packets are kept until all
+        the original packets pass.
 
         """
         ekey = None
-        temp_packets = self._original.packets.copy()
+        readable = []
+        for packet in packets:
+            if packet.is_readable and packet.packet_type in (0, 1):
+                readable.append(packet)
+            if self._keep_original:
+                yield packet
         for public_key in self._recipients_to_add:
-            for packet in self._original.packets:
-                if packet.is_readable and packet.packet_type in (0, 1):
-                    if ekey is None:
-                        ekey = SoftwareKey.generate()
-                    data = io.BytesIO()
-                    data.write(packet.length.to_bytes(4, "little"))
-                    enc_method = 0
-                    data.write(enc_method.to_bytes(4, "little"))
-                    data.write(ekey.public_key)
-                    symmetric_key = ekey.compute_write_key(public_key)
-                    nonce = secrets.token_bytes(12)
-                    data.write(nonce)
-                    content = crypto_aead_chacha20poly1305_ietf_encrypt(
-                        packet.content, None, nonce, symmetric_key
-                    )
-                    data.write(content)
-                    # This packet is useful only for serialization
-                    temp_packets.append(
-                        HeaderPacket(
-                            packet.length,
-                            data.getvalue(),
-                            None,
-                            None,
-                            None,
-                            None,
-                            None,
-                        )
-                    )
-        return temp_packets
+            for packet in readable:
+                ekey, writer_public_key, symmetric_key = self.write_key(
+                    ekey, public_key
+                )
+                data = io.BytesIO()
+                data.write(packet.length.to_bytes(4, "little"))
+                enc_method = 0
+                data.write(enc_method.to_bytes(4, "little"))
+                data.write(writer_public_key)
+                nonce = secrets.token_bytes(12)
+                data.write(nonce)
+                content = aead_encrypt(symmetric_key, nonce, packet.content)
+                data.write(content)
+                # This packet is useful only for serialization
+                yield HeaderPacket(
+                    packet.length,
+                    data.getvalue(),
+                    None,
+                    None,
+                    None,
+                    None,
+                    None,
+                )
@@ -32,6 +32,11 @@ class Filter(Proto4GH):
         """Returns the filtered header instance."""
         return self._original._header
 
+    @property
+    def data_length(self) -> int:
+        """Returns the length of the original data section."""
+        return self._original.data_length
+
     @property
     def data_blocks(self) -> Generator[DataBlock, None, None]:
         """Returns the iterator for the original data blocks."""
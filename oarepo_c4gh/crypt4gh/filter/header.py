@@ -2,13 +2,37 @@
 implementation. All filters should be derived from this class.
 """
 
-from ..common.header import Header
+from ..common.header import Header, serialize_header
+from ..common.header_packet import HeaderPacket
+from typing import Generator, Iterable
+
+
+def is_streaming_filter_header(header: Header) -> bool:
+    """Returns True if given header is a filter header whose packets
+    can be streamed through `filter_packets`. Filter headers which
+    override the `packets` property (the original extension point)
+    must be used through that property.
+
+    Parameters:
+        header: the header to check
+
+    """
+    return (
+        isinstance(header, FilterHeader)
+        and type(header).packets is FilterHeader.packets
+    )
 
 
 class FilterHeader(Header):
     """As the header has its own interface, this class implements such
     interface for filtered header.
 
+    The derived classes implement the actual transformation in the
+    `filter_packets` method. The filtered packets are computed only
+    once - when first needed - and the list is cached. When filter
+    headers are stacked, the packets flow through all the filters in
+    a single pass over the original packets.
+
     """
 
     def __init__(self, original: Header) -> None:
@@ -19,6 +43,8 @@ class FilterHeader(Header):
 
         """
         self._original = original
+        self._packets = None
+        self._serialized = None
 
     @property
     def magic_bytes(self) -> bytes:
@@ -29,3 +55,59 @@ class FilterHeader(Header):
     def version(self) -> int:
         """Returns the original version."""
         return self._original.version
+
+    def filter_packets(
+        self, packets: Iterable[HeaderPacket]
+    ) -> Generator[HeaderPacket, None, None]:
+        """Transforms the packets of the original header. The default
+        implementation passes all the packets unchanged.
+
+        Parameters:
+            packets: the original header packets
+
+        Returns:
+            Iterator over the filtered packets.
+
+        """
+        return iter(packets)
+
+    def source_packets(self) -> Iterable[HeaderPacket]:
+        """Returns the packets of the original header. If the original
+        header is also a filter which does not override `packets`, its
+        packets are streamed (and cached by it as they pass through).
+
+        """
+        if is_streaming_filter_header(self._original):
+            return self._original.iter_packets()
+        return self._original.packets
+
+    def iter_packets(self) -> Generator[HeaderPacket, None, None]:
+        """Iterates over the filtered packets. The first complete
+        iteration caches the result.
+
+        """
+        if self._packets is not None:
+            yield from self._packets
+            return
+        packets = []
+        for packet in self.filter_packets(self.source_packets()):
+            packets.append(packet)
+            yield packet
+        self._packets = packets
+
+    @property
+    def packets(self) -> list:
+        """Returns the filtered packets. They are computed only once."""
+        if self._packets is None:
+            self._packets = list(self.iter_packets())
+        return self._packets
+
+    @property
+    def serialized(self) -> bytes:
+        """Returns the serialized filtered header - computed only
+        once from the cached packets.
+
+        """
+        if self._serialized is None:
+            self._serialized = serialize_header(self)
+        return self._serialized
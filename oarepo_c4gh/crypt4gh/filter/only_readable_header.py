@@ -4,6 +4,8 @@ through only readable header packets.
 """
 
 from .header import FilterHeader
+from ..common.header_packet import HeaderPacket
+from typing import Generator, Iterable
 
 
 class OnlyReadableHeader(FilterHeader):
@@ -11,7 +13,8 @@ class OnlyReadableHeader(FilterHeader):
     readable packets.
     """
 
-    @property
-    def packets(self) -> list:
-        """Returns only readable packets."""
-        return [x for x in self._original.packets if x.is_readable]
+    def filter_packets(
+        self, packets: Iterable[HeaderPacket]
+    ) -> Generator[HeaderPacket, None, None]:
+        """Passes only readable packets."""
+        return (x for x in packets if x.is_readable)
@@ -0,0 +1,81 @@
+"""This module implements fusing a chain of stacked filter headers
+into a single streaming pass. Instead of letting each filter layer
+build (and cache) its own list of packets, the transformations of all
+the layers are chained directly and the resulting packets are
+serialized as they come.
+
+"""
+
+from ..common.header import Header
+from ..common.header_packet import HeaderPacket
+from .header import is_streaming_filter_header
+from typing import Generator
+
+
+class HeaderPipeline:
+    """Compiled chain of header filters. The chain is collected from
+    the outermost filter header down to the first header which is
+    either not a filter, overrides the `packets` property or already
+    has its packets computed. The packets of that header are the
+    source of the pipeline.
+
+    The intermediate filter headers do not cache the packets passing
+    through the pipeline and each iteration performs all the
+    transformations again. Therefore the pipeline output should be
+    consumed once (typically by a writer).
+
+    """
+
+    def __init__(self, header: Header) -> None:
+        """Collects the filter stages of given header.
+
+        Parameters:
+            header: the (possibly stacked) filter header
+
+        """
+        stages = []
+        source = header
+        while is_streaming_filter_header(source) and source._packets is None:
+            stages.append(source)
+            source = source._original
+        stages.reverse()
+        self._header = header
+        self._source = source
+        self._stages = stages
+
+    @property
+    def stages(self) -> list:
+        """The filter headers applied, the innermost first."""
+        return self._stages
+
+    def iter_packets(self) -> Generator[HeaderPacket, None, None]:
+        """Streams the source packets through all the stages.
+
+        Returns:
+            Iterator over the packets of the outermost header.
+
+        """
+        packets = iter(self._source.packets)
+        for stage in self._stages:
+            packets = stage.filter_packets(packets)
+        return packets
+
+    def serialize(self) -> bytes:
+        """Serializes the whole header - magic bytes, version, packet
+        count and all the packets - in a single pass. The packet count
+        is filled in when all the packets are written.
+
+        Returns:
+            The serialized header.
+
+        """
+        out = bytearray(self._header.magic_bytes)
+        out += self._header.version.to_bytes(4, "little")
+        count_offset = len(out)
+        out += bytes(4)
+        count = 0
+        for packet in self.iter_packets():
+            out += packet.packet_data
+            count += 1
+        out[count_offset : count_offset + 4] = count.to_bytes(4, "little")
+        return bytes(out)
@@ -0,0 +1,129 @@
+"""This module implements passing the access pattern hints to the
+kernel when a container is read sequentially from a regular file. The
+kernel is told the file is read sequentially, the window ahead of the
+current position is requested to be read in advance and the pages
+already consumed are dropped from the page cache so that scanning
+large containers does not evict other data.
+
+"""
+
+import io
+import os
+import stat
+
+
+def get_crypt4gh_stream_fd(istream: io.RawIOBase) -> int:
+    """Returns the file descriptor of given stream if it is backed by
+    a regular file.
+
+    Parameters:
+        istream: the container input stream
+
+    Returns:
+        The file descriptor or None.
+
+    """
+    fileno = getattr(istream, "fileno", None)
+    if fileno is None:
+        return None
+    try:
+        fd = fileno()
+        if not stat.S_ISREG(os.fstat(fd).st_mode):
+            return None
+    except (OSError, ValueError):
+        return None
+    return fd
+
+
+class FileAdvisor:
+    """Issues the posix_fadvise hints for a file descriptor based on
+    its current position. All the operations do nothing if the stream
+    is not backed by a regular file or the platform does not support
+    the hints.
+
+    """
+
+    def __init__(self, istream: io.RawIOBase, window: int) -> None:
+        """Determines the file descriptor of given stream.
+
+        Parameters:
+            istream: the container input stream
+            window: the number of bytes to request ahead of the position
+
+        """
+        self._fd = None
+        if hasattr(os, "posix_fadvise"):
+            self._fd = get_crypt4gh_stream_fd(istream)
+        self._window = window
+        self._advised = 0
+        self._dropped = 0
+
+    @property
+    def active(self) -> bool:
+        """True if the hints are being passed to the kernel."""
+        return self._fd is not None
+
+    def advise(self, offset: int, length: int, advice: int) -> None:
+        """Passes single hint to the kernel. Any failure disables
+        further hints.
+
+        Parameters:
+            offset: the start of the range
+            length: the length of the range (0 means to the end of file)
+            advice: one of the os.POSIX_FADV_* constants
+
+        """
+        try:
+            os.posix_fadvise(self._fd, offset, length, advice)
+        except OSError:
+            self._fd = None
+
+    def position(self) -> int:
+        """Returns the current position of the file descriptor. All
+        the data before this position have already been read from the
+        kernel.
+
+        """
+        return os.lseek(self._fd, 0, os.SEEK_CUR)
+
+    def start(self) -> None:
+        """Advises sequential access to the whole file and requests
+        the first window.
+
+        """
+        if self._fd is None:
+            return
+        self.advise(0, 0, os.POSIX_FADV_SEQUENTIAL)
+        self._dropped = self.position()
+        self._advised = self._dropped
+        self.advance()
+
+    def advance(self) -> None:
+        """Requests the next window if at least half of the previous
+        one has been read and drops the pages already read once there
+        is a window worth of them.
+
+        """
+        if self._fd is None:
+            return
+        position = self.position()
+        if position + self._window // 2 >= self._advised:
+            start = max(position, self._advised)
+            self._advised = position + self._window
+            self.advise(start, self._advised - start, os.POSIX_FADV_WILLNEED)
+        if self._fd is not None and position - self._dropped >= self._window:
+            self.advise(
+                self._dropped, position - self._dropped, os.POSIX_FADV_DONTNEED
+            )
+            self._dropped = position
+
+    def finish(self) -> None:
+        """Drops the remaining pages already read."""
+        if self._fd is None:
+            return
+        position = self.position()
+        if position > self._dropped:
+            self.advise(
+                self._dropped, position - self._dropped, os.POSIX_FADV_DONTNEED
+            )
+            self._dropped = position
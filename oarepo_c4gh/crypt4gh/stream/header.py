@@ -12,7 +12,8 @@ from ..dek_collection import DEKCollection
 from ..dek import DEK
 from ..analyzer import Analyzer
 from typing import Union
-from ..common.header import Header
+from ..common.header import Header, serialize_header
+from .prefetch import PrefetchStream
 
 
 CRYPT4GH_MAGIC = b"crypt4gh"
@@ -78,6 +79,7 @@ class StreamHeader(Header):
             self._reader_keys = KeyCollection(reader_key_or_collection)
         self._istream = istream
         self._packets = None
+        self._serialized = None
         self._deks = DEKCollection()
         self._analyzer = analyzer
 
@@ -93,7 +95,7 @@ class StreamHeader(Header):
         """
         self._packets = []
         for idx in range(self._packet_count):
-            packet = StreamHeaderPacket(self._reader_keys, self._istream)
+            packet = self.load_packet()
             if packet.is_data_encryption_parameters:
                 self._deks.add_dek(
                     DEK(packet.data_encryption_key, packet.reader_key)
@@ -102,6 +104,17 @@ class StreamHeader(Header):
             if self._analyzer is not None:
                 self._analyzer.analyze_packet(packet)
         self._reader_keys = None
+        if isinstance(self._istream, PrefetchStream):
+            self._istream.end_prefetch()
+
+    def load_packet(self) -> StreamHeaderPacket:
+        """Loads the next header packet from the input stream.
+
+        Returns:
+            The header packet (decrypted if possible).
+
+        """
+        return StreamHeaderPacket(self._reader_keys, self._istream)
 
     @property
     def packets(self) -> list:
@@ -119,6 +132,18 @@ class StreamHeader(Header):
             self.load_packets()
         return self._packets
 
+    @property
+    def serialized(self) -> bytes:
+        """Returns the serialized header - computed only once.
+
+        Returns:
+            The header bytes exactly as read from the input stream.
+
+        """
+        if self._serialized is None:
+            self._serialized = serialize_header(self)
+        return self._serialized
+
     @property
     def deks(self) -> DEKCollection:
         """Returns the collection of Data Encryption Keys obtained by
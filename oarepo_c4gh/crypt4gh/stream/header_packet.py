@@ -9,9 +9,122 @@ from ..util import (
     read_crypt4gh_stream_le_uint32,
     read_crypt4gh_bytes_le_uint32,
 )
-from nacl.bindings import crypto_aead_chacha20poly1305_ietf_decrypt
-from nacl.exceptions import CryptoError
+from ..aead import aead_decrypt
 from ...exceptions import Crypt4GHHeaderPacketException
+from .prefetch import PrefetchStream
+
+
+def read_crypt4gh_header_packet_data(istream: io.RawIOBase) -> bytes:
+    """Reads the whole header packet including its length. With
+    prefetching stream the packet is copied out of the read-ahead
+    buffer at once instead of reading the length and the payload
+    separately.
+
+    Parameters:
+        istream: the container input stream
+
+    Returns:
+        The packet data including the length field.
+
+    Raises:
+        Crypt4GHHeaderPacketException: if not enough data can be read
+        ValueError: if the packet length cannot be read
+
+    """
+    if isinstance(istream, PrefetchStream):
+        _packet_length = read_crypt4gh_bytes_le_uint32(
+            istream.peek_view(4), 0, "packet length"
+        )
+        # copied so that the packet (kept as long as the header) does
+        # not pin the whole read-ahead buffer
+        _packet_data = bytes(istream.read_view(_packet_length))
+    else:
+        _packet_length = read_crypt4gh_stream_le_uint32(
+            istream, "packet length"
+        )
+        _packet_data = _packet_length.to_bytes(4, "little") + istream.read(
+            _packet_length - 4
+        )
+    if len(_packet_data) != _packet_length:
+        raise Crypt4GHHeaderPacketException(
+            f"Header packet: read only {len(_packet_data)} "
+            f"instead of {_packet_length}"
+        )
+    return _packet_data
+
+
+def parse_crypt4gh_header_packet(
+    reader_keys: KeyCollection, packet_data: bytes
+) -> tuple:
+    """Parses the header packet data and tries decrypting the packet
+    with given reader keys. The packet data may be a memoryview slice
+    of a larger buffer - only the values passed to the cryptographic
+    primitives are copied (if required by the AEAD backend).
+
+    Parameters:
+        reader_keys: the key collection used for decryption attempts
+        packet_data: the whole packet including the length field
+
+    Returns:
+        The arguments for the `HeaderPacket` constructor.
+
+    Raises:
+        Crypt4GHHeaderPacketException: if any problem in parsing the packet occurs.
+
+    """
+    _packet_data = packet_data
+    _packet_length = len(_packet_data)
+    encryption_method = read_crypt4gh_bytes_le_uint32(
+        _packet_data, 4, "encryption method"
+    )
+    if encryption_method != 0:
+        raise Crypt4GHHeaderPacketException(
+            f"Unsupported encryption method {encryption_method}"
+        )
+    writer_public_key = bytes(_packet_data[8:40])
+    nonce = _packet_data[40:52]
+    payload_length = _packet_length - 4 - 4 - 32 - 12 - 16
+    payload = _packet_data[52:]
+    _content = None
+    _reader_key = None
+    for maybe_reader_key in reader_keys.keys:
+        symmetric_key = maybe_reader_key.compute_read_key(writer_public_key)
+        _content = aead_decrypt(symmetric_key, nonce, payload)
+        if _content is not None:
+            _reader_key = maybe_reader_key.public_key
+            break
+    _data_encryption_method = None
+    _packet_type = None
+    _data_encryption_key = None
+    if _content is not None:
+        _packet_type = read_crypt4gh_bytes_le_uint32(
+            _content, 0, "packet type"
+        )
+        if _packet_type == 0:
+            _data_encryption_method = read_crypt4gh_bytes_le_uint32(
+                _content, 4, "encryption method"
+            )
+            if _data_encryption_method != 0:
+                raise Crypt4GHHeaderPacketException(
+                    f"Unknown data encryption method "
+                    f"{_data_encryption_method}."
+                )
+            _data_encryption_key = _content[8:40]
+        elif _packet_type == 1:
+            # Edit List
+            pass
+        else:
+            # Report error? Warning?
+            pass
+    return (
+        _packet_length,
+        _packet_data,
+        _content,
+        _reader_key,
+        _packet_type,
+        _data_encryption_method,
+        _data_encryption_key,
+    )
 
 
 class StreamHeaderPacket(HeaderPacket):
@@ -33,71 +146,8 @@ class StreamHeaderPacket(HeaderPacket):
             Crypt4GHHeaderPacketException: if any problem in parsing the packet occurs.
 
         """
-        _packet_length = read_crypt4gh_stream_le_uint32(
-            istream, "packet length"
-        )
-        _packet_data = _packet_length.to_bytes(4, "little") + istream.read(
-            _packet_length - 4
-        )
-        if len(_packet_data) != _packet_length:
-            raise Crypt4GHHeaderPacketException(
-                f"Header packet: read only {len(_packet_data)} "
-                f"instead of {_packet_length}"
-            )
-        encryption_method = read_crypt4gh_bytes_le_uint32(
-            _packet_data, 4, "encryption method"
-        )
-        if encryption_method != 0:
-            raise Crypt4GHHeaderPacketException(
-                f"Unsupported encryption method {encryption_method}"
-            )
-        writer_public_key = _packet_data[8:40]
-        nonce = _packet_data[40:52]
-        payload_length = _packet_length - 4 - 4 - 32 - 12 - 16
-        payload = _packet_data[52:]
-        for maybe_reader_key in reader_keys.keys:
-            symmetric_key = maybe_reader_key.compute_read_key(
-                writer_public_key
-            )
-            _content = None
-            _reader_key = None
-            try:
-                _content = crypto_aead_chacha20poly1305_ietf_decrypt(
-                    payload, None, nonce, symmetric_key
-                )
-                _reader_key = maybe_reader_key.public_key
-                break
-            except CryptoError as cerr:
-                pass
-        _data_encryption_method = None
-        _packet_type = None
-        _data_encryption_key = None
-        if _content is not None:
-            _packet_type = read_crypt4gh_bytes_le_uint32(
-                _content, 0, "packet type"
-            )
-            if _packet_type == 0:
-                _data_encryption_method = read_crypt4gh_bytes_le_uint32(
-                    _content, 4, "encryption method"
-                )
-                if _data_encryption_method != 0:
-                    raise Crypt4GHHeaderPacketException(
-                        f"Unknown data encryption method "
-                        f"{_data_encryption_method}."
-                    )
-                _data_encryption_key = _content[8:40]
-            elif _packet_type == 1:
-                # Edit List
-                pass
-            else:
-                # Report error? Warning?
-                pass
         super().__init__(
-            _packet_length,
-            _packet_data,
-            _content,
-            _reader_key,
-            _packet_type,
-            _data_encryption_method,
-            _data_encryption_key,
+            *parse_crypt4gh_header_packet(
+                reader_keys, read_crypt4gh_header_packet_data(istream)
+            )
         )
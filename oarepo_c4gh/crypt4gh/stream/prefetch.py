@@ -0,0 +1,185 @@
+"""This module implements an input stream wrapper which coalesces the
+small reads performed while parsing the container header into a few
+large speculative reads. Any bytes read ahead beyond the header are
+handed over to the data blocks reader before the underlying stream is
+used directly again.
+
+"""
+
+import io
+
+# Default size of the speculative read
+DEFAULT_PREFETCH_SIZE = 65536
+
+
+class PrefetchStream:
+    """Input stream wrapper with a read-ahead buffer used while the
+    prefetching is active (during header parsing). After
+    `end_prefetch` is called, the remaining buffered bytes are
+    consumed first and then all reads go directly to the underlying
+    stream.
+
+    """
+
+    def __init__(
+        self, istream: io.RawIOBase, size: int = DEFAULT_PREFETCH_SIZE
+    ) -> None:
+        """Wraps the stream without reading anything yet.
+
+        Parameters:
+            istream: the underlying input stream
+            size: the size of each speculative read
+
+        """
+        self._istream = istream
+        self._size = size
+        self._buffer = b""
+        self._view = memoryview(self._buffer)
+        self._position = 0
+        self._prefetching = True
+        self._eof = False
+        self._read1 = getattr(istream, "read1", None)
+
+    @property
+    def raw(self) -> io.RawIOBase:
+        """The underlying input stream."""
+        return self._istream
+
+    @property
+    def buffered(self) -> int:
+        """The number of bytes read ahead and not consumed yet."""
+        return len(self._buffer) - self._position
+
+    def end_prefetch(self) -> None:
+        """Stops speculative reading. The bytes already buffered are
+        still returned by subsequent reads.
+
+        """
+        self._prefetching = False
+
+    def fill(self, size: int) -> None:
+        """Reads ahead until at least given number of bytes is
+        buffered or the end of stream is reached. Each underlying read
+        requests at least the configured speculative read size.
+
+        Parameters:
+            size: the number of bytes needed
+
+        """
+        while self.buffered < size and not self._eof:
+            wanted = max(size - self.buffered, self._size)
+            if self._read1 is not None:
+                data = self._read1(wanted)
+            else:
+                data = self._istream.read(wanted)
+            if data is None or len(data) == 0:
+                self._eof = True
+                break
+            if self._position < len(self._buffer):
+                self._buffer = self._buffer[self._position :] + data
+            else:
+                self._buffer = bytes(data)
+            self._view = memoryview(self._buffer)
+            self._position = 0
+
+    def peek_view(self, size: int) -> memoryview:
+        """Returns up to given number of buffered bytes without
+        consuming them.
+
+        Parameters:
+            size: the number of bytes needed
+
+        Returns:
+            Slice of the buffer (shorter if not enough data is available).
+
+        """
+        if self._prefetching:
+            self.fill(size)
+        end = min(self._position + size, len(self._buffer))
+        return self._view[self._position : end]
+
+    def read_view(self, size: int) -> memoryview:
+        """Reads up to given number of bytes. If they are buffered, a
+        slice of the buffer is returned without copying.
+
+        Parameters:
+            size: the number of bytes to read
+
+        Returns:
+            The data read (shorter only at the end of stream).
+
+        """
+        if self._prefetching:
+            self.fill(size)
+        if self.buffered >= size:
+            view = self._view[self._position : self._position + size]
+            self._position += size
+            return view
+        return memoryview(self.read(size))
+
+    def read(self, size: int = -1) -> bytes:
+        """Reads up to given number of bytes - from the buffer first
+        and then from the underlying stream.
+
+        Parameters:
+            size: the number of bytes to read (-1 means all)
+
+        Returns:
+            The data read.
+
+        """
+        if self._prefetching and size >= 0:
+            self.fill(size)
+        if self.buffered == 0:
+            return self._istream.read(size)
+        if size >= 0 and self.buffered >= size:
+            data = self._buffer[self._position : self._position + size]
+            self._position += size
+            return data
+        data = self._buffer[self._position :]
+        self._buffer = b""
+        self._view = memoryview(self._buffer)
+        self._position = 0
+        rest = self._istream.read(-1 if size < 0 else size - len(data))
+        if rest:
+            data += rest
+        return data
+
+    def seekable(self) -> bool:
+        """Returns True if the underlying stream is seekable."""
+        seekable = getattr(self._istream, "seekable", None)
+        return seekable is not None and seekable()
+
+    def tell(self) -> int:
+        """Returns the logical position (not counting the buffered
+        bytes).
+
+        """
+        return self._istream.tell() - self.buffered
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Seeks the underlying stream and discards the buffer.
+
+        Parameters:
+            offset: the offset
+            whence: the reference point (as in `io.IOBase.seek`)
+
+        Returns:
+            The new logical position.
+
+        """
+        if whence == io.SEEK_CUR:
+            offset -= self.buffered
+        self._buffer = b""
+        self._view = memoryview(self._buffer)
+        self._position = 0
+        self._eof = False
+        return self._istream.seek(offset, whence)
+
+    def fileno(self) -> int:
+        """Returns the file descriptor of the underlying stream."""
+        return self._istream.fileno()
+
+    def close(self) -> None:
+        """Closes the underlying stream."""
+        self._istream.close()
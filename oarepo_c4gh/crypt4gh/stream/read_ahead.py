@@ -0,0 +1,132 @@
+"""This module implements a background reader thread which reads the
+raw data blocks of a container ahead while the previous blocks are
+being decrypted. The blocks are passed to the consumer through a
+bounded queue so that at most the configured number of blocks is held
+in memory.
+
+"""
+
+import io
+from queue import Full, Queue
+from threading import Event, Thread
+from typing import Generator
+from ..util import CRYPT4GH_BLOCK_SIZE
+
+
+def read_crypt4gh_block(
+    istream: io.RawIOBase, size: int = CRYPT4GH_BLOCK_SIZE
+) -> bytes:
+    """Reads single raw data block from given stream. Short reads are
+    repeated until the whole block or the end of stream is read.
+
+    Parameters:
+        istream: the container input stream
+        size: the size of a full data block
+
+    Returns:
+        The block data (shorter only at the end of stream).
+
+    """
+    data = istream.read(size)
+    if data is None or len(data) == size or len(data) == 0:
+        return b"" if data is None else data
+    chunks = [data]
+    remaining = size - len(data)
+    while remaining > 0:
+        chunk = istream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+class ReadAheadReader:
+    """Reads the raw data blocks from given stream in a background
+    thread. The thread is started on first iteration and stops at the
+    end of the stream, on error (which is re-raised in the consumer)
+    or when the reader is closed.
+
+    """
+
+    def __init__(
+        self,
+        istream: io.RawIOBase,
+        depth: int = 2,
+        size: int = CRYPT4GH_BLOCK_SIZE,
+    ) -> None:
+        """Prepares the reader without starting the thread.
+
+        Parameters:
+            istream: the container input stream positioned at the first block
+            depth: the maximum number of blocks read ahead
+            size: the size of a full data block
+
+        """
+        assert depth > 0, "At least one block must be read ahead"
+        self._istream = istream
+        self._size = size
+        self._queue = Queue(maxsize=depth)
+        self._stop = Event()
+        self._thread = None
+
+    def run(self) -> None:
+        """The body of the reader thread. Puts the blocks read into
+        the queue followed by None at the end of stream or by the
+        exception raised.
+
+        """
+        try:
+            while not self._stop.is_set():
+                data = read_crypt4gh_block(self._istream, self._size)
+                if len(data) == 0:
+                    break
+                self.put(data)
+            self.put(None)
+        except Exception as ex:
+            self.put(ex)
+
+    def put(self, item) -> None:
+        """Puts the item into the queue waiting for free space unless
+        the reader is being closed.
+
+        Parameters:
+            item: raw block, None or exception
+
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def __iter__(self) -> Generator[bytes, None, None]:
+        """Starts the reader thread and yields the raw blocks in
+        order.
+
+        Raises:
+            Exception: any exception raised while reading the stream
+
+        """
+        self._thread = Thread(
+            target=self.run, name="c4gh-read-ahead", daemon=True
+        )
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stops the reader thread and waits for it to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
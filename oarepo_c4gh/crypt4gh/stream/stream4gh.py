@@ -10,6 +10,10 @@ from ..common.data_block import DataBlock
 from ..analyzer import Analyzer
 from typing import Generator, Union
 from ..common.proto4gh import Proto4GH
+from .prefetch import PrefetchStream, DEFAULT_PREFETCH_SIZE
+from .read_ahead import ReadAheadReader, read_crypt4gh_block
+from .fadvise import FileAdvisor
+from ..verify import VerificationReport, verify_crypt4gh_blocks
 
 
 class Stream4GH(Proto4GH):
@@ -27,6 +31,9 @@ class Stream4GH(Proto4GH):
         reader_key: Union[Key, KeyCollection],
         decrypt: bool = True,
         analyze: bool = False,
+        prefetch: int = DEFAULT_PREFETCH_SIZE,
+        read_ahead: int = 0,
+        fadvise: int = 0,
     ) -> None:
         """Initializes the instance by storing the reader_key and the
         input stream. Verifies whether the reader key can perform
@@ -36,13 +43,23 @@ class Stream4GH(Proto4GH):
             istream: the container input stream
             reader_key: the key (or collection) used for reading the container
             decrypt: if True, attempt to decrypt the data blocks
+            analyze: if True, collect the container structure information
+            prefetch: size of speculative reads while parsing the header (0 disables)
+            read_ahead: number of data blocks read ahead in a background thread (0 disables)
+            fadvise: number of bytes the kernel is asked to read ahead of the current
+                position of a regular file (0 disables the kernel hints)
 
         """
+        if prefetch > 0:
+            istream = PrefetchStream(istream, prefetch)
         self._istream = istream
         self._analyzer = Analyzer() if analyze else None
         self._header = StreamHeader(reader_key, istream, self._analyzer)
         self._consumed = False
         self._decrypt = decrypt
+        self._data_length = None
+        self._read_ahead = read_ahead
+        self._fadvise = fadvise
 
     @property
     def header(self) -> StreamHeader:
@@ -54,6 +71,32 @@ class Stream4GH(Proto4GH):
         """
         return self._header
 
+    @property
+    def data_length(self) -> int:
+        """Returns the length of the data section in bytes if the
+        input stream is seekable. It must be called before the data
+        blocks are processed.
+
+        Returns:
+            The data section length or None if it cannot be determined.
+
+        Raises:
+            Crypt4GHProcessedException: if the data blocks were already processed
+
+        """
+        if self._data_length is None:
+            if self._consumed:
+                raise Crypt4GHProcessedException("Already processed once")
+            seekable = getattr(self._istream, "seekable", None)
+            if seekable is None or not seekable():
+                return None
+            self.header.packets
+            position = self._istream.tell()
+            end = self._istream.seek(0, io.SEEK_END)
+            self._istream.seek(position)
+            self._data_length = end - position
+        return self._data_length
+
     @property
     def data_blocks(self) -> Generator[DataBlock, None, None]:
         """Single-use iterator for data blocks.
@@ -65,7 +108,35 @@ class Stream4GH(Proto4GH):
         assert self.header.packets is not None
         if self._consumed:
             raise Crypt4GHProcessedException("Already processed once")
+        if self._read_ahead > 0:
+            blocks = self.read_ahead_blocks()
+        else:
+            blocks = self.read_blocks()
+        advisor = None
+        if self._fadvise > 0:
+            advisor = FileAdvisor(self._istream, self._fadvise)
+            advisor.start()
         offset = 0
+        for enc, clear, idx in blocks:
+            block = DataBlock(enc, clear, idx, offset)
+            offset = offset + block.size
+            if self._analyzer is not None:
+                self._analyzer.analyze_block(block)
+            if advisor is not None:
+                advisor.advance()
+            yield (block)
+        if advisor is not None:
+            advisor.finish()
+        self._consumed = True
+
+    def read_blocks(self) -> Generator[tuple, None, None]:
+        """Reads and (if requested) decrypts the data blocks one by
+        one.
+
+        Returns:
+            Iterator over the encrypted block data, cleartext and DEK index.
+
+        """
         while True:
             if self._decrypt:
                 enc, clear, idx = self._header.deks.decrypt_packet(
@@ -79,12 +150,115 @@ class Stream4GH(Proto4GH):
                 idx = None
             if enc is None:
                 break
-            block = DataBlock(enc, clear, idx, offset)
-            offset = offset + block.size
-            if self._analyzer is not None:
-                self._analyzer.analyze_block(block)
-            yield (block)
+            yield (enc, clear, idx)
+
+    def read_ahead_blocks(self) -> Generator[tuple, None, None]:
+        """Reads the raw data blocks in a background thread and
+        decrypts them (if requested) as they arrive, overlapping the
+        reading and the decryption.
+
+        Returns:
+            Iterator over the encrypted block data, cleartext and DEK index.
+
+        """
+        reader = ReadAheadReader(self._istream, self._read_ahead)
+        try:
+            for data in reader:
+                if self._decrypt:
+                    enc, clear, idx = self._header.deks.decrypt_block(data)
+                else:
+                    enc = data
+                    clear = None
+                    idx = None
+                if enc is None:
+                    break
+                yield (enc, clear, idx)
+        finally:
+            reader.close()
+
+    def decrypt_into(self, buf, first: int = 0, count: int = None) -> int:
+        """Decrypts given range of data blocks directly into a
+        writable buffer without creating intermediate cleartext
+        objects. The stream is read up to the end of the range and
+        the data blocks cannot be processed afterwards.
+
+        Parameters:
+            buf: writable buffer (bytearray, mmap, array, ...)
+            first: the index of the first block
+            count: the number of blocks (None means all remaining)
+
+        Returns:
+            The number of bytes written to the buffer.
+
+        Raises:
+            Crypt4GHProcessedException: if the data blocks were already processed
+            ValueError: if the buffer is too small
+            Crypt4GHDEKException: if some block cannot be decrypted
+
+        """
+        deks = self.header.deks
+        blocks = self.raw_blocks()
+        try:
+            for idx in range(first):
+                next(blocks, None)
+            if count is None:
+                return deks.decrypt_blocks_into(blocks, buf)
+            return deks.decrypt_blocks_into(
+                (data for _, data in zip(range(count), blocks)), buf
+            )
+        finally:
+            blocks.close()
+
+    def verify(self, stop_on_failure: bool = False) -> VerificationReport:
+        """Checks the authentication tags of all the data blocks
+        without keeping their cleartext. The data blocks cannot be
+        processed afterwards.
+
+        Parameters:
+            stop_on_failure: if True, stop at the first bad block
+
+        Returns:
+            The verification report.
+
+        Raises:
+            Crypt4GHProcessedException: if the data blocks were already processed
+
+        """
+        deks = self.header.deks
+        blocks = self.raw_blocks()
+        try:
+            return verify_crypt4gh_blocks(deks, blocks, stop_on_failure)
+        finally:
+            blocks.close()
+
+    def raw_blocks(self) -> Generator[bytes, None, None]:
+        """Single-use iterator over the raw data blocks (including the
+        nonces and MACs) read from the stream directly or by the
+        read-ahead thread.
+
+        Raises:
+            Crypt4GHProcessedException: if the data blocks were already processed
+
+        """
+        if self._consumed:
+            raise Crypt4GHProcessedException("Already processed once")
         self._consumed = True
+        return self.read_raw_blocks()
+
+    def read_raw_blocks(self) -> Generator[bytes, None, None]:
+        """Generator of the raw data blocks used by `raw_blocks`."""
+        if self._read_ahead > 0:
+            reader = ReadAheadReader(self._istream, self._read_ahead)
+            try:
+                yield from reader
+            finally:
+                reader.close()
+        else:
+            while True:
+                data = read_crypt4gh_block(self._istream)
+                if len(data) == 0:
+                    break
+                yield data
 
     @property
     def analyzer(self):
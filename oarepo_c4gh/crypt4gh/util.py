@@ -3,6 +3,19 @@
 """
 
 import io
+import os
+import socket
+
+# Size of a full data block including the nonce and the MAC
+CRYPT4GH_BLOCK_SIZE = 12 + 65536 + 16
+
+# Maximum number of buffers passed to single vectored write
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+if IOV_MAX <= 0:
+    IOV_MAX = 1024
 
 
 def read_crypt4gh_stream_le_uint32(
@@ -63,3 +76,69 @@ def parse_crypt4gh_bytes_le_uint(
             f"Only {number_bytes_len} bytes for reading le_uint({size}) {name}"
         )
     return int.from_bytes(number_bytes, byteorder="little")
+
+
+def write_crypt4gh_stream_all(ostream: io.RawIOBase, data: bytes) -> None:
+    """Writes all the data to given stream handling short writes of
+    raw streams.
+
+    Parameters:
+        ostream: the output stream
+        data: the bytes to write
+
+    Raises:
+        BlockingIOError: if non-blocking stream cannot accept any data
+
+    """
+    view = memoryview(data)
+    while len(view) > 0:
+        written = ostream.write(view)
+        if written is None:
+            raise BlockingIOError("Output stream would block")
+        view = view[written:]
+
+
+def write_crypt4gh_vectored(send: callable, buffers: list) -> None:
+    """Writes all the buffers using given vectored write function
+    handling short writes. At most `IOV_MAX` buffers are passed to
+    single call.
+
+    Parameters:
+        send: function accepting list of buffers and returning the number of bytes written
+        buffers: the buffers to write
+
+    """
+    views = [memoryview(buf) for buf in buffers if len(buf) > 0]
+    idx = 0
+    while idx < len(views):
+        written = send(views[idx : idx + IOV_MAX])
+        while written > 0:
+            view_length = len(views[idx])
+            if written >= view_length:
+                written -= view_length
+                idx += 1
+            else:
+                views[idx] = views[idx][written:]
+                written = 0
+
+
+def write_crypt4gh_buffers(ostream: io.RawIOBase, buffers: list) -> None:
+    """Writes all the buffers to given output with as few system calls
+    as possible. Sockets use `sendmsg`, unbuffered files use
+    `os.writev` and any other stream gets the buffers joined into
+    single write.
+
+    Parameters:
+        ostream: the output stream (or socket)
+        buffers: the buffers to write
+
+    """
+    if isinstance(ostream, socket.socket):
+        write_crypt4gh_vectored(ostream.sendmsg, buffers)
+    elif isinstance(ostream, io.FileIO) and hasattr(os, "writev"):
+        fd = ostream.fileno()
+        write_crypt4gh_vectored(lambda views: os.writev(fd, views), buffers)
+    elif len(buffers) == 1:
+        write_crypt4gh_stream_all(ostream, buffers[0])
+    else:
+        write_crypt4gh_stream_all(ostream, b"".join(buffers))
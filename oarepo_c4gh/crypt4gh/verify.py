@@ -0,0 +1,96 @@
+"""This module implements checking the integrity of the container
+data blocks without keeping their cleartext. Each block is decrypted
+into the same reusable buffer just to verify its authentication tag.
+
+"""
+
+from .dek_collection import DEKCollection
+from typing import Iterable
+
+
+class VerificationReport:
+    """The result of the data blocks verification."""
+
+    def __init__(
+        self, blocks_checked: int, bad_blocks: list[int], stopped: bool
+    ) -> None:
+        """Initializes the report.
+
+        Parameters:
+            blocks_checked: the number of blocks checked
+            bad_blocks: the indexes of the blocks which failed
+            stopped: True if the verification stopped at the first failure
+
+        """
+        self._blocks_checked = blocks_checked
+        self._bad_blocks = bad_blocks
+        self._stopped = stopped
+
+    @property
+    def ok(self) -> bool:
+        """True if all the blocks checked are authentic."""
+        return len(self._bad_blocks) == 0
+
+    @property
+    def blocks_checked(self) -> int:
+        """The number of blocks checked."""
+        return self._blocks_checked
+
+    @property
+    def bad_blocks(self) -> list[int]:
+        """The indexes of the blocks which cannot be authenticated
+        with any DEK (including a truncated last block).
+
+        """
+        return self._bad_blocks
+
+    @property
+    def stopped(self) -> bool:
+        """True if the verification stopped before the end of the
+        data.
+
+        """
+        return self._stopped
+
+    def to_dict(self) -> dict:
+        """Returns dictionary representation of the report."""
+        return {
+            "ok": self.ok,
+            "blocks_checked": self._blocks_checked,
+            "bad_blocks": self._bad_blocks,
+            "stopped": self._stopped,
+        }
+
+
+def verify_crypt4gh_blocks(
+    deks: DEKCollection,
+    blocks: Iterable[bytes],
+    stop_on_failure: bool = False,
+) -> VerificationReport:
+    """Verifies the authentication tags of given data blocks.
+
+    Parameters:
+        deks: the DEKs to try
+        blocks: the data blocks including the nonces and MACs
+        stop_on_failure: if True, stop at the first bad block
+
+    Returns:
+        The verification report.
+
+    """
+    buf = memoryview(bytearray(65536))
+    checked = 0
+    bad_blocks = []
+    for idx, data in enumerate(blocks):
+        checked += 1
+        size = len(data) - 12 - 16
+        if (
+            size < 0
+            or size > len(buf)
+            or deks.empty
+            or deks.decrypt_block_into(data, buf[:size]) is None
+        ):
+            bad_blocks.append(idx)
+            if stop_on_failure:
+                return VerificationReport(checked, bad_blocks, True)
+    return VerificationReport(checked, bad_blocks, False)
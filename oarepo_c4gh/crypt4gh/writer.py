@@ -3,30 +3,119 @@
 """
 
 from .common.proto4gh import Proto4GH
+from .filter.pipeline import HeaderPipeline
+from .util import write_crypt4gh_buffers
 import io
+import os
+
+
+def preallocate_stream(ostream: io.RawIOBase, length: int) -> bool:
+    """Tries to preallocate given number of bytes in the output file
+    starting at its current position. Does nothing for streams which
+    are not backed by a regular file or on platforms and file systems
+    without `posix_fallocate` support.
+
+    Parameters:
+        ostream: the output stream
+        length: the number of bytes to be written
+
+    Returns:
+        True if the space was preallocated.
+
+    """
+    if length <= 0 or not hasattr(os, "posix_fallocate"):
+        return False
+    try:
+        fd = ostream.fileno()
+        os.posix_fallocate(fd, ostream.tell(), length)
+    except (OSError, ValueError, AttributeError):
+        # io.UnsupportedOperation is both OSError and ValueError
+        return False
+    return True
 
 
 class Crypt4GHWriter:
     """Simple writer which performs just one operation."""
 
-    def __init__(self, container: Proto4GH, ostream: io.RawIOBase) -> None:
+    def __init__(
+        self,
+        container: Proto4GH,
+        ostream: io.RawIOBase,
+        fuse_filters: bool = False,
+        preallocate: bool = False,
+        batch_size: int = 0,
+    ) -> None:
         """Can be wrapped around originally loaded Crypt4GH container
         or something compatible (like filtered container).
 
+        Parameters:
+            container: the container to serialize
+            ostream: the output stream
+            fuse_filters: serialize stacked filter headers in single pass without caching their packets
+            preallocate: preallocate the output file if the output length is known
+            batch_size: if positive, gather at least this many bytes before writing
+
         """
         self._container = container
         self._stream = ostream
+        self._fuse_filters = fuse_filters
+        self._preallocate = preallocate
+        self._batch_size = batch_size
+        self._header_bytes = None
+
+    @property
+    def header_bytes(self) -> bytes:
+        """The serialized header of the output container."""
+        if self._header_bytes is None:
+            if self._fuse_filters:
+                self._header_bytes = HeaderPipeline(
+                    self._container.header
+                ).serialize()
+            else:
+                self._header_bytes = self._container.header.serialized
+        return self._header_bytes
+
+    @property
+    def output_length(self) -> int:
+        """The exact number of bytes the write operation will produce
+        or None if the length of the data section is not known (see
+        `Stream4GH.data_length`). Must be used before `write`.
+
+        """
+        data_length = self._container.data_length
+        if data_length is None:
+            return None
+        return len(self.header_bytes) + data_length
 
     def write(self) -> None:
         """Performs the write operation."""
-        self._stream.write(self._container.header.magic_bytes)
-        self._stream.write(
-            self._container.header.version.to_bytes(4, "little")
-        )
-        self._stream.write(
-            len(self._container.header.packets).to_bytes(4, "little")
-        )
-        for packet in self._container.header.packets:
-            self._stream.write(packet.packet_data)
+        if self._preallocate:
+            output_length = self.output_length
+            if output_length is not None:
+                preallocate_stream(self._stream, output_length)
+        if self._batch_size > 0:
+            self.write_batched()
+            return
+        self._stream.write(self.header_bytes)
         for block in self._container.data_blocks:
             self._stream.write(block.ciphertext)
+
+    def write_batched(self) -> None:
+        """Gathers the header and data blocks into batches of at least
+        `batch_size` bytes and writes each batch with single vectored
+        write (or single write of joined buffers) handling short
+        writes.
+
+        """
+        batch = [self.header_bytes]
+        batch_length = len(batch[0])
+        for block in self._container.data_blocks:
+            ciphertext = block.ciphertext
+            batch.append(ciphertext)
+            batch_length += len(ciphertext)
+            if batch_length >= self._batch_size:
+                write_crypt4gh_buffers(self._stream, batch)
+                batch = []
+                batch_length = 0
+        if len(batch) > 0:
+            write_crypt4gh_buffers(self._stream, batch)
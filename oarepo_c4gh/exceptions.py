@@ -104,3 +104,20 @@ class Crypt4GHProcessedException(Crypt4GHException):
 
         """
         super().__init__("PROCESSED", message)
+
+
+class Crypt4GHKeyBusyException(Crypt4GHException):
+    """An exception signalling that a key cannot accept any more
+    operations at the moment because all its operation slots and
+    queue positions are taken.
+
+    """
+
+    def __init__(self, message: str) -> None:
+        """Initializes the Key Busy exception.
+
+        Parameters:
+            message: a descriptive message about the problem
+
+        """
+        super().__init__("KEYBUSY", message)
@@ -0,0 +1,234 @@
+"""This module contains an ASGI implementation of the server part of
+the Crypt4GH key network protocol. It shares the path parsing and key
+mapping logic with the uwsgi request handler but does not tie up a
+worker for each in-flight key operation.
+
+"""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+from .external import ExternalKey
+from .external_software import ExternalSoftwareKey
+from .http_path_key_server import HTTPPathKeyServer
+from .key import Key
+from .key_limiter import KeyLimiter
+from .key_resolver import KeyResolver
+from .key_server_metrics import KeyServerMetrics, PROMETHEUS_CONTENT_TYPE
+from ..exceptions import Crypt4GHKeyBusyException
+
+ASGIScope = dict
+ASGIReceive = Callable[[], Awaitable[dict]]
+ASGISend = Callable[[dict], Awaitable[None]]
+
+
+class ASGIPathKeyServer(HTTPPathKeyServer):
+    """An instance of this class is an ASGI application serving the
+    same keys under the same URLs as its uwsgi counterpart.
+
+    The software-backed keys are fast and CPU-bound and therefore the
+    ECDH is performed directly in the event loop. All other keys
+    (`GPGAgentKey`, `HTTPKey` chaining, ...) block on I/O and their
+    operations are offloaded to a bounded thread pool. If a limiter is
+    given, the operations are coalesced and admitted in the event loop
+    so that requests queued for a slow key never occupy the threads
+    needed by other keys.
+
+    """
+
+    def __init__(
+        self,
+        mapping: dict[str, Key] | KeyResolver,
+        prefix: str = "",
+        suffix: str = "x25519",
+        limiter: KeyLimiter = None,
+        metrics: KeyServerMetrics = None,
+        metrics_path: str = "metrics",
+        max_workers: int = 16,
+    ) -> None:
+        """Initializes the instance and ensures all keys in the
+        mapping can perform ECDH exchange. The thread pool is created
+        lazily.
+
+        Parameters:
+            mapping: dictionary of name to key pairs or key resolver.
+            prefix: path elements preceeding the key name in URL.
+            suffix: path elements succeeding the key name in URL.
+            limiter: optional concurrency limiter for offloaded key operations.
+            metrics: optional metrics collector.
+            metrics_path: path elements succeeding the prefix for metrics.
+            max_workers: the number of threads for blocking key operations.
+
+        """
+        super().__init__(
+            mapping, prefix, suffix, limiter, metrics, metrics_path
+        )
+        assert max_workers > 0, "At least one worker thread is needed"
+        self._max_workers = max_workers
+        self._executor = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """The thread pool used for blocking key operations."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="c4gh-key",
+            )
+        return self._executor
+
+    def is_inline_key(self, key: ExternalKey) -> bool:
+        """Predicate determining whether the operation with given key
+        can be performed directly in the event loop.
+
+        Parameters:
+            key: the key instance
+
+        Returns:
+            True if the key is software-backed (derived classes may
+            override the operation and are therefore not considered
+            software-backed).
+
+        """
+        return type(key) is ExternalSoftwareKey
+
+    async def compute_ecdh_async(
+        self, key_id: str, key: ExternalKey, public_point: bytes
+    ) -> bytes:
+        """Performs the ECDH finalization either inline or in the
+        thread pool - depending on the key type. The offloaded
+        operations are admitted by the limiter (if any) before they
+        are submitted to the thread pool.
+
+        Parameters:
+            key_id: the name of the key
+            key: the key instance as resolved by `parse_path_request`
+            public_point: the public point to multiply (32 bytes)
+
+        Returns:
+            The resulting point in compressed format (32 bytes).
+
+        Raises:
+            Crypt4GHKeyBusyException: if the limiter rejected the operation
+
+        """
+        if self.is_inline_key(key):
+            return self.compute_ecdh(key_id, key, public_point, False)
+        loop = asyncio.get_running_loop()
+        if self._limiter is None:
+            return await loop.run_in_executor(
+                self.executor, self.compute_ecdh, key_id, key, public_point
+            )
+        if self._metrics is not None:
+            started = self._metrics.start_operation(key_id)
+        try:
+            return await self._limiter.compute_ecdh_async(
+                key_id,
+                public_point,
+                lambda: loop.run_in_executor(
+                    self.executor, key.compute_ecdh, public_point
+                ),
+            )
+        finally:
+            if self._metrics is not None:
+                self._metrics.finish_operation(key_id, started)
+
+    async def handle_asgi_path_request(
+        self, request_path: str
+    ) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+        """Handles the key operation request identified by given
+        path.
+
+        Parameters:
+            request_path: the path element of request URL
+
+        Returns:
+            The HTTP status code, the response headers and the
+            response body.
+
+        """
+        if self.is_metrics_request(request_path):
+            content_type = PROMETHEUS_CONTENT_TYPE.encode("ascii")
+            return (
+                200,
+                [(b"content-type", content_type)],
+                self._metrics.render(),
+            )
+        if self._resolver.may_block:
+            # resolving the key may load it
+            loop = asyncio.get_running_loop()
+            parsed = await loop.run_in_executor(
+                self.executor, self.parse_path_request, request_path
+            )
+        else:
+            parsed = self.parse_path_request(request_path)
+        key_id_str, key, public_point_bytes, reason = parsed
+        if key_id_str is None:
+            self.count_request(404, reason)
+            return 404, [], b""
+        try:
+            result = await self.compute_ecdh_async(
+                key_id_str, key, public_point_bytes
+            )
+        except Crypt4GHKeyBusyException:
+            self.count_request(503)
+            return 503, [(b"retry-after", b"1")], b""
+        self.count_request(200)
+        return 200, [(b"content-type", b"application/octet-stream")], result
+
+    async def handle_lifespan(
+        self, receive: ASGIReceive, send: ASGISend
+    ) -> None:
+        """Handles the ASGI lifespan protocol. The thread pool is shut
+        down when the server shuts down.
+
+        Parameters:
+            receive: ASGI receive callable
+            send: ASGI send callable
+
+        """
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(
+        self, scope: ASGIScope, receive: ASGIReceive, send: ASGISend
+    ) -> None:
+        """The ASGI application entry point.
+
+        Parameters:
+            scope: ASGI connection scope
+            receive: ASGI receive callable
+            send: ASGI send callable
+
+        Raises:
+            ValueError: if the connection type is not supported
+
+        """
+        if scope["type"] == "lifespan":
+            await self.handle_lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']}")
+        status, headers, body = await self.handle_asgi_path_request(
+            scope["path"]
+        )
+        headers.append((b"content-length", str(len(body)).encode("ascii")))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
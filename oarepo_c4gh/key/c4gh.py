@@ -185,6 +185,65 @@ def derive_c4gh_key(
     raise Crypt4GHKeyException(f"Unsupported KDF: {algo}")
 
 
+def parse_c4gh_private_key(
+    sdata: bytes,
+) -> (bytes, int, bytes, bytes, bytes):
+    """Parses the decoded private key envelope contents without
+    performing any expensive operation.
+
+    Parameters:
+        sdata: the decoded contents of the private key envelope
+
+    Returns:
+        kdf_name: the name of the KDF as binary string
+        kdf_rounds: number of hashing rounds for KDF
+        kdf_salt: salt for initializing the hashing
+        cipher_name: the name of the cipher as binary string
+        payload: the private key (if not encrypted) or nonce and encrypted private key
+
+    Raises:
+        Crypt4GHKeyException: if the data is not a supported private key
+
+    """
+    istreamb = BytesIO(sdata)
+    check_c4gh_stream_magic(istreamb)
+    kdf_name, kdf_rounds, kdf_salt = parse_c4gh_kdf_options(istreamb)
+    cipher_name = decode_c4gh_bytes(istreamb)
+    if cipher_name != b"none" and cipher_name != b"chacha20_poly1305":
+        raise Crypt4GHKeyException(f"Unsupported cipher: {cipher_name}")
+    payload = decode_c4gh_bytes(istreamb)
+    return kdf_name, kdf_rounds, kdf_salt, cipher_name, payload
+
+
+def unlock_c4gh_private_key(
+    kdf_name: bytes,
+    kdf_rounds: int,
+    kdf_salt: bytes,
+    passphrase: bytes,
+    nonce_and_encrypted_data: bytes,
+) -> bytes:
+    """Derives the symmetric key from the passphrase and decrypts the
+    private key with it. This is the expensive part of loading an
+    encrypted key and as a module-level function it can be run in a
+    process pool.
+
+    Parameters:
+        kdf_name: the name of the KDF as binary string
+        kdf_rounds: number of hashing rounds for KDF
+        kdf_salt: salt for initializing the hashing
+        passphrase: the passphrase from which to derive the key
+        nonce_and_encrypted_data: nonce followed by the encrypted private key
+
+    Returns:
+        The 32 bytes of the private key.
+
+    """
+    symmetric_key = derive_c4gh_key(kdf_name, passphrase, kdf_salt, kdf_rounds)
+    nonce = nonce_and_encrypted_data[:12]
+    encrypted_data = nonce_and_encrypted_data[12:]
+    return ChaCha20Poly1305(symmetric_key).decrypt(nonce, encrypted_data, None)
+
+
 class C4GHKey(SoftwareKey):
     """This class implements the loader for Crypt4GH key file format."""
 
@@ -258,28 +317,16 @@ class C4GHKey(SoftwareKey):
         if slabel == b"CRYPT4GH PUBLIC KEY":
             return C4GHKey(sdata, True)
         else:
-            istreamb = BytesIO(sdata)
-            check_c4gh_stream_magic(istreamb)
-            kdf_name, kdf_rounds, kdf_salt = parse_c4gh_kdf_options(istreamb)
-            cipher_name = decode_c4gh_bytes(istreamb)
+            kdf_name, kdf_rounds, kdf_salt, cipher_name, payload = (
+                parse_c4gh_private_key(sdata)
+            )
             if cipher_name == b"none":
-                secret_data = decode_c4gh_bytes(istreamb)
-                return C4GHKey(secret_data, False)
-            if cipher_name != b"chacha20_poly1305":
-                raise Crypt4GHKeyException(
-                    f"Unsupported cipher: {cipher_name}"
-                )
+                return C4GHKey(payload, False)
             assert callable(
                 callback
             ), "Invalid passphrase callback (non-callable)"
             passphrase = callback().encode()
-            symmetric_key = derive_c4gh_key(
-                kdf_name, passphrase, kdf_salt, kdf_rounds
-            )
-            nonce_and_encrypted_data = decode_c4gh_bytes(istreamb)
-            nonce = nonce_and_encrypted_data[:12]
-            encrypted_data = nonce_and_encrypted_data[12:]
-            decrypted_data = ChaCha20Poly1305(symmetric_key).decrypt(
-                nonce, encrypted_data, None
+            decrypted_data = unlock_c4gh_private_key(
+                kdf_name, kdf_rounds, kdf_salt, passphrase, payload
             )
             return C4GHKey(decrypted_data, False)
@@ -0,0 +1,37 @@
+"""This module keeps track of key instances holding per-process
+resources (locks, thread pools) which must not be inherited by a
+child process created with `os.fork`. Such instances register
+themselves here and their `after_fork` method is called in the child
+process right after the fork. The resources are then re-established
+lazily when first needed.
+
+"""
+
+import os
+from weakref import WeakSet
+
+_fork_sensitive = WeakSet()
+
+
+def register_after_fork(obj: object) -> None:
+    """Registers the object to have its `after_fork` method called in
+    the child process after fork. Only a weak reference is kept.
+
+    Parameters:
+        obj: an instance with `after_fork` method
+
+    """
+    _fork_sensitive.add(obj)
+
+
+def reset_after_fork() -> None:
+    """Calls `after_fork` of all registered live objects. Called
+    automatically in the child process after `os.fork`.
+
+    """
+    for obj in list(_fork_sensitive):
+        obj.after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
@@ -9,63 +9,288 @@ from urllib.parse import urlparse
 from urllib.request import urlopen
 from .external import ExternalKey
 from .key import key_x25519_generator_point
+from .fork import register_after_fork
 from ..exceptions import Crypt4GHKeyException
 from binascii import hexlify
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import monotonic
 
 
 class HTTPKey(ExternalKey):
     """This class implements the client for the Crypt4GH key network
     protocol.
 
+    Multiple equivalent URLs (replicas of the same key server) can be
+    given. The requests are spread across them in round-robin fashion,
+    failed replicas are ejected for a cooldown period and optionally a
+    hedged duplicate request is sent to another replica if the first
+    one does not respond in time.
+
     """
 
-    def __init__(self, url: str) -> None:
+    def __init__(
+        self,
+        url: str | list[str],
+        hedge_after: float = None,
+        cooldown: float = 30.0,
+        timeout: float = None,
+    ) -> None:
         """Initializes the key instance and performs rudimentary
         validation of arguments given.
 
         Parameters:
-            url: URL for requesting scalar multiplication by the private key.
+            url: URL (or list of equivalent URLs) for requesting scalar multiplication by the private key.
+            hedge_after: seconds to wait before sending the request to another replica (None = no hedging)
+            cooldown: seconds a failed replica is not used if other replicas are available
+            timeout: optional timeout in seconds for each HTTP request
 
         """
-        pu = urlparse(url)
-        assert pu.scheme != "https", f"HTTPS is not supported yet"
-        assert (
-            pu.scheme == "http"
-        ), f"invalid scheme '{pu.scheme}', only HTTP is supported"
-        self._url = url
+        urls = [url] if isinstance(url, str) else list(url)
+        assert len(urls) > 0, "At least one URL must be given"
+        for one_url in urls:
+            pu = urlparse(one_url)
+            assert pu.scheme != "https", f"HTTPS is not supported yet"
+            assert (
+                pu.scheme == "http"
+            ), f"invalid scheme '{pu.scheme}', only HTTP is supported"
+        self._urls = urls
+        self._hedge_after = hedge_after
+        self._cooldown = cooldown
+        self._timeout = timeout
+        self._lock = Lock()
+        self._next = 0
+        self._ejected: dict[str, float] = {}
         self._public_key = None
+        register_after_fork(self)
+
+    def __getstate__(self) -> dict:
+        """Returns the picklable state of the key. The lock and the
+        replica health (which uses process-local clock) are not
+        included.
+
+        """
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_ejected"] = {}
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restores the key from pickled state with fresh lock.
+
+        Parameters:
+            state: the state returned by `__getstate__`
+
+        """
+        self.__dict__.update(state)
+        self._lock = Lock()
+        register_after_fork(self)
+
+    def after_fork(self) -> None:
+        """Replaces the lock inherited from the parent process which
+        might have been held by another thread during the fork.
+
+        """
+        self._lock = Lock()
+
+    def pick_replicas(self) -> list[str]:
+        """Orders the replicas for the next request. Healthy replicas
+        come first starting with the next one in round-robin order,
+        the replicas still in cooldown are used only as last resort.
+
+        Returns:
+            List of URLs in the order they should be tried.
+
+        """
+        now = monotonic()
+        with self._lock:
+            start = self._next
+            self._next = (start + 1) % len(self._urls)
+            for url, until in list(self._ejected.items()):
+                if until <= now:
+                    del self._ejected[url]
+            ordered = self._urls[start:] + self._urls[:start]
+            healthy = [url for url in ordered if url not in self._ejected]
+            ejected = sorted(
+                (url for url in ordered if url in self._ejected),
+                key=lambda url: self._ejected[url],
+            )
+        return healthy + ejected
+
+    def eject_replica(self, url: str) -> None:
+        """Marks the replica as unhealthy for the cooldown period.
+
+        Parameters:
+            url: the URL of the failed replica
+
+        """
+        with self._lock:
+            self._ejected[url] = monotonic() + self._cooldown
+
+    def request_replica(self, url: str, public_point: bytes) -> bytes:
+        """Performs the request against single replica.
+
+        Parameters:
+            url: the URL of the replica
+            public_point: the other party public point (compressed coordinates, 32 bytes)
+
+        Returns:
+            The resulting shared secret point (compressed coordinates, 32 bytes).
+
+        Raises:
+            Crypt4GHKeyException: if the request fails for any reason
+
+        """
+        requrl = url
+        if not requrl.endswith("/"):
+            requrl += "/"
+        encoded_pp = hexlify(public_point).decode("ascii")
+        requrl += encoded_pp
+        try:
+            if self._timeout is None:
+                resp = urlopen(requrl)
+            else:
+                resp = urlopen(requrl, timeout=self._timeout)
+            with resp:
+                status = resp.status
+                result = resp.read() if status == 200 else None
+        except Exception as ex:
+            raise Crypt4GHKeyException(f"urllib exception {ex}")
+        if status != 200:
+            raise Crypt4GHKeyException(f"Invalid response {status}")
+        if len(result) != 32:
+            raise Crypt4GHKeyException(
+                f"Invalid result point size {len(result)} != 32"
+            )
+        return result
 
     def compute_ecdh(self, public_point: bytes) -> bytes:
         """Computes the result of finishing the ECDH key exchange.
 
+        The replicas are tried in the order given by
+        `pick_replicas`. Any failed replica is ejected and the next
+        one is tried.
+
         Parameters:
             public_point: the other party public point (compressed coordinates, 32 bytes)
 
         Returns:
             The resulting shared secret point (compressed coordinates, 32 bytes).
+
+        Raises:
+            Crypt4GHKeyException: if all the replicas fail
         """
         if len(public_point) != 32:
             raise Crypt4GHKeyException(
                 f"Invalid public point coordinate size {len(public_point)} != 32"
             )
-        requrl = self._url
-        if not requrl.endswith("/"):
-            requrl += "/"
-        encoded_pp = hexlify(public_point).decode("ascii")
-        requrl += encoded_pp
+        replicas = self.pick_replicas()
+        if self._hedge_after is not None and len(replicas) > 1:
+            return self.compute_ecdh_hedged(replicas, public_point)
+        errors = []
+        for url in replicas:
+            try:
+                return self.request_replica(url, public_point)
+            except Crypt4GHKeyException as ex:
+                self.eject_replica(url)
+                errors.append(ex)
+        if len(errors) == 1:
+            raise errors[0]
+        raise Crypt4GHKeyException(
+            f"All replicas failed: {'; '.join(str(ex) for ex in errors)}"
+        )
+
+    def hedge_request(
+        self, url: str, public_point: bytes, results: Queue
+    ) -> None:
+        """Performs the request against single replica and puts the
+        outcome into the results queue. Runs in its own thread so that
+        an abandoned slow request never delays other requests.
+
+        An outcome is always put into the queue, even if the thread
+        is interrupted, so that the waiting caller cannot hang.
+
+        Parameters:
+            url: the URL of the replica
+            public_point: the other party public point (compressed coordinates, 32 bytes)
+            results: queue receiving the URL, the result and the exception
+
+        """
+        outcome = (url, None, Crypt4GHKeyException("Request interrupted"))
         try:
-            resp = urlopen(requrl)
+            outcome = (url, self.request_replica(url, public_point), None)
         except Exception as ex:
-            raise Crypt4GHKeyException(f"urllib exception {ex}")
-        if resp.status == 200:
-            result = resp.read()
-            if len(result) != 32:
-                raise Crypt4GHKeyException(
-                    f"Invalid result point size {len(result)} != 32"
+            if not isinstance(ex, Crypt4GHKeyException):
+                ex = Crypt4GHKeyException(f"Request failed {ex}")
+            outcome = (url, None, ex)
+        finally:
+            results.put(outcome)
+
+    def compute_ecdh_hedged(
+        self, replicas: list[str], public_point: bytes
+    ) -> bytes:
+        """Sends the request to the first replica and if it does not
+        respond within the hedging threshold, sends a duplicate
+        request to the next one. The first successful response
+        wins. A failed request is immediately replaced by a request
+        to the next replica.
+
+        Each request runs in its own thread which starts immediately,
+        so the hedging threshold measures only the replica response
+        time. The requests which lost the race are abandoned. Their
+        replicas are ejected as too slow only if they have been pending
+        for longer than the hedging threshold, a hedge which merely
+        lost the race keeps its replica in rotation.
+
+        Parameters:
+            replicas: the URLs in the order they should be tried
+            public_point: the other party public point (compressed coordinates, 32 bytes)
+
+        Returns:
+            The resulting shared secret point (compressed coordinates, 32 bytes).
+
+        Raises:
+            Crypt4GHKeyException: if all the replicas fail
+
+        """
+        remaining = list(replicas)
+        pending = {}
+        results = Queue()
+        errors = []
+
+        def launch():
+            url = remaining.pop(0)
+            pending[url] = monotonic()
+            Thread(
+                target=self.hedge_request,
+                args=(url, public_point, results),
+                name="c4gh-http-key-hedge",
+                daemon=True,
+            ).start()
+
+        launch()
+        while len(pending) > 0:
+            try:
+                url, result, error = results.get(
+                    timeout=self._hedge_after if len(remaining) > 0 else None
                 )
-            return result
-        else:
-            raise Crypt4GHKeyException(f"Invalid response {resp.status}")
+            except Empty:
+                launch()
+                continue
+            pending.pop(url, None)
+            if error is None:
+                now = monotonic()
+                for loser, started in pending.items():
+                    if now - started >= self._hedge_after:
+                        self.eject_replica(loser)
+                return result
+            self.eject_replica(url)
+            errors.append(error)
+            if len(remaining) > 0:
+                launch()
+        raise Crypt4GHKeyException(
+            f"All replicas failed: {'; '.join(str(ex) for ex in errors)}"
+        )
 
     @property
     def public_key(self) -> bytes:
@@ -11,9 +11,11 @@ from typing import Iterable
 from wsgiref.types import StartResponse, WSGIEnvironment
 
 from .external import ExternalKey
-from .external_software import ExternalSoftwareKey
 from .key import Key
-from .software import SoftwareKey
+from .key_limiter import KeyLimiter
+from .key_resolver import KeyResolver, MappingKeyResolver
+from .key_server_metrics import KeyServerMetrics, PROMETHEUS_CONTENT_TYPE
+from ..exceptions import Crypt4GHKeyBusyException, Crypt4GHKeyException
 
 
 def split_and_clean(path: str) -> list[str]:
@@ -49,6 +51,22 @@ def make_not_found(start_response: StartResponse) -> list[bytes]:
     return []
 
 
+def make_service_unavailable(start_response: StartResponse) -> list[bytes]:
+    """Starts a Service Unavailable response and returns empty
+    array. Used when the key is too busy to accept another operation
+    so that the client gets a fast answer instead of waiting.
+
+    Parameters:
+        start_response: a uwsgi application-compatible procedure
+
+    Returns:
+        An empty list.
+
+    """
+    start_response("503 Service Unavailable", [("Retry-After", "1")])
+    return []
+
+
 class HTTPPathKeyServer:
     """An instance of this class behaves like a collection of keys
     where each key is given a unique name. This name is then part of
@@ -58,51 +76,67 @@ class HTTPPathKeyServer:
     """
 
     def __init__(
-        self, mapping: dict[str, Key], prefix: str = "", suffix: str = "x25519"
+        self,
+        mapping: dict[str, Key] | KeyResolver,
+        prefix: str = "",
+        suffix: str = "x25519",
+        limiter: KeyLimiter = None,
+        metrics: KeyServerMetrics = None,
+        metrics_path: str = "metrics",
     ) -> None:
         """Initializes the instance and ensures all keys in the
-        mapping can perform ECDH exchange.
+        mapping can perform ECDH exchange. Instead of the mapping, a
+        key resolver can be given - for example one loading the keys
+        lazily.
 
         Parameters:
-            mapping: dictionary of name to key pairs.
+            mapping: dictionary of name to key pairs or key resolver.
             prefix: path elements preceeding the key name in URL.
             suffix: path elements succeeding the key name in URL.
+            limiter: optional concurrency limiter for key operations.
+            metrics: optional metrics collector.
+            metrics_path: path elements succeeding the prefix for metrics.
 
         """
         self._prefix = split_and_clean(prefix)
         self._suffix = split_and_clean(suffix)
-        remapping: dict[str, ExternalKey] = {}
-        for name, key in mapping.items():
-            if isinstance(key, ExternalKey):
-                remapping[name] = key
-            elif isinstance(key, SoftwareKey):
-                remapping[name] = ExternalSoftwareKey(key)
-            else:
-                raise TypeError(
-                    f"Expected ExternalKey or SoftwareKey instance for key {name}, found {type(key)}"
-                )
-        self._mapping = remapping
+        if isinstance(mapping, dict):
+            self._resolver = MappingKeyResolver(mapping)
+        else:
+            self._resolver = mapping
+        self._limiter = limiter
+        self._metrics = metrics
+        self._metrics_request = self._prefix + split_and_clean(metrics_path)
 
         # request should look like <prefix>/<key_id>/<suffix>/<public_point>
         self._required_request_length = (
             len(self._prefix) + 1 + len(self._suffix) + 1
         )
 
-    def handle_path_request(
-        self, request_path: str, start_response: StartResponse
-    ) -> list[bytes]:
-        """All requests for key operations are uniquely identified by
-        the request path. The key name and public point to be
-        multiplied by private key are both encoded in the path and
-        therefore the actual handling depends only upon the path.
+    def warmup(self) -> None:
+        """Performs the lazy initialization of all the keys known
+        upfront. Should be called before the server forks its worker
+        processes.
+
+        """
+        self._resolver.warmup()
+
+    def parse_path_request(
+        self, request_path: str
+    ) -> tuple[str, ExternalKey, bytes, str]:
+        """Extracts the key name and the public point from the request
+        path and validates them. All requests for key operations are
+        uniquely identified by the request path. The key is resolved
+        only once and the instance returned must be used for the
+        operation.
 
         Parameters:
             request_path: the path element of request URL
-            start_response: uwsgi-compatible argument
 
         Returns:
-            List of single byte string of length 32 or an empty list
-            in case of error.
+            The name and the instance of an existing key, the public
+            point (32 bytes) and None - or three None values and the
+            reason why the request is not valid.
 
         """
         # request path structure: <prefix>/<key_id>/<suffix>/<public_point>
@@ -110,7 +144,7 @@ class HTTPPathKeyServer:
 
         if len(request_list) < self._required_request_length:
             # too short to contain prefix, key id, suffix and public point
-            return make_not_found(start_response)
+            return None, None, None, "short"
 
         key_pos = len(self._prefix)
         public_point_pos = -1
@@ -121,31 +155,140 @@ class HTTPPathKeyServer:
 
         # check for prefix
         if request_list[:key_pos] != self._prefix:
-            return make_not_found(start_response)
+            return None, None, None, "prefix"
 
         # check for suffix
         if request_list[suffix_pos:public_point_pos] != self._suffix:
-            return make_not_found(start_response)
-
-        if key_id_str not in self._mapping:
-            # key does not exist
-            return make_not_found(start_response)
+            return None, None, None, "suffix"
 
         if len(public_point_hex) != 64:
             # incorrect public point length
-            return make_not_found(start_response)
+            return None, None, None, "point_length"
         try:
             public_point_bytes = binascii.unhexlify(public_point_hex)
         except binascii.Error:
+            return None, None, None, "point_encoding"
+
+        # checked last as resolving the key may load it
+        try:
+            key = self._resolver.resolve(key_id_str)
+        except Crypt4GHKeyException:
+            # key file exists but cannot be loaded
+            return None, None, None, "key_load"
+        if key is None:
+            # key does not exist
+            return None, None, None, "key"
+
+        return key_id_str, key, public_point_bytes, None
+
+    def handle_path_request(
+        self, request_path: str, start_response: StartResponse
+    ) -> list[bytes]:
+        """All requests for key operations are uniquely identified by
+        the request path. The key name and public point to be
+        multiplied by private key are both encoded in the path and
+        therefore the actual handling depends only upon the path.
+
+        Parameters:
+            request_path: the path element of request URL
+            start_response: uwsgi-compatible argument
+
+        Returns:
+            List of single byte string of length 32 or an empty list
+            in case of error. The error is either Not Found for
+            invalid requests or Service Unavailable if the key is
+            too busy.
+
+        """
+        if self.is_metrics_request(request_path):
+            start_response(
+                "200 OK", [("Content-Type", PROMETHEUS_CONTENT_TYPE)]
+            )
+            return [self._metrics.render()]
+
+        key_id_str, key, public_point_bytes, reason = self.parse_path_request(
+            request_path
+        )
+        if key_id_str is None:
+            self.count_request(404, reason)
             return make_not_found(start_response)
 
-        key = self._mapping[key_id_str]
-        result = key.compute_ecdh(public_point_bytes)
+        try:
+            result = self.compute_ecdh(key_id_str, key, public_point_bytes)
+        except Crypt4GHKeyBusyException:
+            self.count_request(503)
+            return make_service_unavailable(start_response)
+        self.count_request(200)
         start_response(
             "200 OK", [("Content-Type", "application/octet-stream")]
         )
         return [result]
 
+    def is_metrics_request(self, request_path: str) -> bool:
+        """Predicate for detecting requests for the metrics.
+
+        Parameters:
+            request_path: the path element of request URL
+
+        Returns:
+            True if metrics are enabled and the path requests them.
+
+        """
+        return (
+            self._metrics is not None
+            and split_and_clean(request_path) == self._metrics_request
+        )
+
+    def count_request(self, status: int, reason: str = None) -> None:
+        """Updates the request metrics if enabled.
+
+        Parameters:
+            status: the HTTP status code of the response
+            reason: the reason for Not Found responses
+
+        """
+        if self._metrics is not None:
+            self._metrics.count_request(status)
+            if reason is not None:
+                self._metrics.count_not_found(reason)
+
+    def compute_ecdh(
+        self,
+        key_id: str,
+        key: ExternalKey,
+        public_point: bytes,
+        limited: bool = True,
+    ) -> bytes:
+        """Performs the ECDH finalization using the key with given
+        name and instance. If a limiter is configured, identical concurrent
+        operations are coalesced and the number of concurrent
+        operations per key is limited. If metrics are enabled, the
+        operation latency (including the time spent in the limiter
+        queue) is recorded.
+
+        Parameters:
+            key_id: the name of the key
+            key: the key instance as resolved by `parse_path_request`
+            public_point: the public point to multiply (32 bytes)
+            limited: if False, the limiter is bypassed
+
+        Returns:
+            The resulting point in compressed format (32 bytes).
+
+        Raises:
+            Crypt4GHKeyBusyException: if the limiter rejected the operation
+
+        """
+        if self._metrics is not None:
+            started = self._metrics.start_operation(key_id)
+        try:
+            if self._limiter is None or not limited:
+                return key.compute_ecdh(public_point)
+            return self._limiter.compute_ecdh(key_id, key, public_point)
+        finally:
+            if self._metrics is not None:
+                self._metrics.finish_operation(key_id, started)
+
     def handle_uwsgi_request(
         self, env: WSGIEnvironment, start_response: StartResponse
     ) -> Iterable[bytes]:
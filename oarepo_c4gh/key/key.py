@@ -83,6 +83,16 @@ class Key(Protocol):
         """
         return False
 
+    def warmup(self) -> None:
+        """Performs all the lazy initialization of the key (unlocking,
+        retrieving the public key from external device, ...). It
+        should be called in the master process before forking worker
+        processes so that the workers inherit ready-to-use key. The
+        default implementation retrieves the public key.
+
+        """
+        self.public_key
+
     def __bytes__(self) -> bytes:
         """Default converter to bytes returns the public key bytes."""
         return self.public_key
@@ -45,6 +45,14 @@ class KeyCollection:
         """Returns the number of keys in this collection."""
         return len(self._keys)
 
+    def warmup(self) -> None:
+        """Performs the lazy initialization of all the keys in this
+        collection. See [`Key.warmup`][oarepo_c4gh.key.key.Key.warmup].
+
+        """
+        for key in self._keys:
+            key.warmup()
+
     @property
     def keys(self) -> Generator[Key, None, None]:
         """Multiple-use iterator that yields each key at most
@@ -0,0 +1,369 @@
+"""This module implements a concurrency limiter for external key
+operations. It is intended to be used by the key server in front of
+slow keys (smart cards, tokens, HSMs) which can perform only a limited
+number of operations at once.
+
+Two mechanisms are provided:
+
+- identical concurrent requests (same key identifier and same public
+  point) are coalesced into a single backend operation ("single
+  flight") and all the requesters receive the same result,
+- the number of concurrent backend operations for each key is capped
+  and the requests waiting for an operation slot are kept in a bounded
+  queue with a timeout.
+
+Both mechanisms are available for threaded servers and - with separate
+bookkeeping kept in the event loop - for asyncio servers, where the
+waiting requests do not occupy any thread.
+
+"""
+
+import asyncio
+from collections import deque
+from threading import Condition, Event, Lock
+from time import monotonic
+from typing import Awaitable, Callable
+from .external import ExternalKey
+from ..exceptions import Crypt4GHKeyBusyException
+
+
+class KeyFlight:
+    """A single backend operation in progress. All requesters of the
+    same key identifier and public point wait for the same flight
+    instance to land.
+
+    """
+
+    def __init__(self) -> None:
+        """Initializes the flight with no result yet."""
+        self._landed = Event()
+        self._result = None
+        self._exception = None
+
+    def land(self, result: bytes, exception: Exception) -> None:
+        """Stores the outcome of the operation and wakes up all the
+        waiting requesters.
+
+        Parameters:
+            result: the result of the operation (if successful)
+            exception: the exception raised by the operation (if any)
+
+        """
+        self._result = result
+        self._exception = exception
+        self._landed.set()
+
+    def wait(self, timeout: float = None) -> bytes:
+        """Waits for the operation to finish and returns its result
+        or re-raises the exception the operation raised.
+
+        Parameters:
+            timeout: maximum time in seconds to wait (None = no limit)
+
+        Returns:
+            The result of the coalesced operation.
+
+        Raises:
+            Crypt4GHKeyBusyException: if the operation did not finish in time
+
+        """
+        if not self._landed.wait(timeout):
+            raise Crypt4GHKeyBusyException(
+                "Timeout waiting for coalesced operation"
+            )
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+class KeySlots:
+    """Bookkeeping of running and queued operations of single key."""
+
+    def __init__(self) -> None:
+        """Initializes the slots with no running or queued
+        operations.
+
+        """
+        self.running = 0
+        self.queued = 0
+        self.waiters: deque[asyncio.Future] = deque()
+
+
+class KeyLimiter:
+    """An instance of this class can be shared by all the request
+    handling threads of a key server. It coalesces identical requests
+    and limits the number of concurrent operations per key.
+
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 1,
+        max_queue: int = 16,
+        timeout: float = 5.0,
+        flight_timeout: float = 60.0,
+    ) -> None:
+        """Initializes the limiter with given limits which are
+        applied to each key separately.
+
+        Parameters:
+            max_concurrent: maximum number of concurrent backend operations
+            max_queue: maximum number of operations waiting for a slot
+            timeout: maximum time in seconds an operation may wait for a slot
+            flight_timeout: maximum time in seconds a coalesced request waits for the result
+
+        """
+        assert max_concurrent > 0, "At least one concurrent operation needed"
+        assert max_queue >= 0, "Queue length cannot be negative"
+        self._max_concurrent = max_concurrent
+        self._max_queue = max_queue
+        self._timeout = timeout
+        self._flight_timeout = flight_timeout
+        self._lock = Lock()
+        self._available = Condition(self._lock)
+        self._flights: dict[tuple[str, bytes], KeyFlight] = {}
+        self._slots: dict[str, KeySlots] = {}
+        self._async_flights: dict[tuple[str, bytes], asyncio.Future] = {}
+        self._async_slots: dict[str, KeySlots] = {}
+
+    def compute_ecdh(
+        self, key_id: str, key: ExternalKey, public_point: bytes
+    ) -> bytes:
+        """Performs the ECDH finalization using given key unless the
+        same operation is already in progress - in that case it waits
+        for its result.
+
+        Parameters:
+            key_id: the identifier of the key (as used by the server)
+            key: the key to perform the operation with
+            public_point: the public point to multiply
+
+        Returns:
+            The resulting point in compressed format (32 bytes).
+
+        Raises:
+            Crypt4GHKeyBusyException: if the queue is full or the wait timed out
+
+        """
+        flight_id = (key_id, public_point)
+        with self._lock:
+            flight = self._flights.get(flight_id)
+            if flight is not None:
+                leader = False
+            else:
+                leader = True
+                flight = KeyFlight()
+                self._flights[flight_id] = flight
+        if not leader:
+            return flight.wait(self._flight_timeout)
+        result = None
+        exception = Crypt4GHKeyBusyException(
+            f"Operation with key {key_id} was interrupted"
+        )
+        try:
+            self.acquire(key_id)
+            try:
+                result = key.compute_ecdh(public_point)
+                exception = None
+            finally:
+                self.release(key_id)
+        except Exception as ex:
+            exception = ex
+        finally:
+            # the flight must land even if the leader is interrupted
+            with self._lock:
+                del self._flights[flight_id]
+            flight.land(result, exception)
+        return flight.wait()
+
+    def acquire(self, key_id: str) -> None:
+        """Acquires an operation slot for given key. Waits in the queue
+        if all the slots are taken.
+
+        Parameters:
+            key_id: the identifier of the key
+
+        Raises:
+            Crypt4GHKeyBusyException: if the queue is full or the wait timed out
+
+        """
+        with self._lock:
+            slots = self._slots.get(key_id)
+            if slots is None:
+                slots = KeySlots()
+                self._slots[key_id] = slots
+            if slots.running < self._max_concurrent:
+                slots.running += 1
+                return
+            if slots.queued >= self._max_queue:
+                raise Crypt4GHKeyBusyException(
+                    f"Queue for key {key_id} is full"
+                )
+            slots.queued += 1
+            deadline = monotonic() + self._timeout
+            try:
+                while slots.running >= self._max_concurrent:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        raise Crypt4GHKeyBusyException(
+                            f"Timeout waiting for key {key_id}"
+                        )
+                    self._available.wait(remaining)
+            finally:
+                slots.queued -= 1
+            slots.running += 1
+
+    def release(self, key_id: str) -> None:
+        """Releases the operation slot of given key and wakes up the
+        waiting operations.
+
+        Parameters:
+            key_id: the identifier of the key
+
+        """
+        with self._lock:
+            slots = self._slots[key_id]
+            slots.running -= 1
+            if slots.running == 0 and slots.queued == 0:
+                del self._slots[key_id]
+            self._available.notify_all()
+
+    async def compute_ecdh_async(
+        self,
+        key_id: str,
+        public_point: bytes,
+        run: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        """Asyncio counterpart of `compute_ecdh`. The coalescing and
+        the admission are performed in the event loop and only the
+        admitted operation is started by calling `run` - typically
+        submitting the blocking key operation to a thread pool. The
+        queued requests therefore never hold a thread. Must be always
+        called from the same event loop.
+
+        Parameters:
+            key_id: the identifier of the key (as used by the server)
+            public_point: the public point to multiply
+            run: starts the backend operation and returns its awaitable
+
+        Returns:
+            The resulting point in compressed format (32 bytes).
+
+        Raises:
+            Crypt4GHKeyBusyException: if the queue is full or the wait timed out
+
+        """
+        flight_id = (key_id, public_point)
+        flight = self._async_flights.get(flight_id)
+        if flight is not None:
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(flight), self._flight_timeout
+                )
+            except asyncio.TimeoutError:
+                raise Crypt4GHKeyBusyException(
+                    "Timeout waiting for coalesced operation"
+                )
+        flight = asyncio.get_running_loop().create_future()
+        self._async_flights[flight_id] = flight
+        try:
+            await self.acquire_async(key_id)
+            try:
+                operation = asyncio.ensure_future(run())
+            except BaseException:
+                self.release_async(key_id)
+                raise
+            # the slot is held until the operation really finishes
+            operation.add_done_callback(
+                lambda done: self.finish_async(key_id, done)
+            )
+            result = await asyncio.shield(operation)
+        except BaseException as ex:
+            if not isinstance(ex, Exception):
+                ex = Crypt4GHKeyBusyException(
+                    f"Operation with key {key_id} was interrupted"
+                )
+            flight.set_exception(ex)
+            # the leader reports the exception itself
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+        finally:
+            del self._async_flights[flight_id]
+        return result
+
+    async def acquire_async(self, key_id: str) -> None:
+        """Acquires an operation slot for given key in the event
+        loop. Waits in the queue if all the slots are taken.
+
+        Parameters:
+            key_id: the identifier of the key
+
+        Raises:
+            Crypt4GHKeyBusyException: if the queue is full or the wait timed out
+
+        """
+        slots = self._async_slots.get(key_id)
+        if slots is None:
+            slots = KeySlots()
+            self._async_slots[key_id] = slots
+        if slots.running < self._max_concurrent:
+            slots.running += 1
+            return
+        if slots.queued >= self._max_queue:
+            raise Crypt4GHKeyBusyException(f"Queue for key {key_id} is full")
+        waiter = asyncio.get_running_loop().create_future()
+        slots.waiters.append(waiter)
+        slots.queued += 1
+        try:
+            await asyncio.wait_for(waiter, self._timeout)
+        except asyncio.TimeoutError:
+            raise Crypt4GHKeyBusyException(f"Timeout waiting for key {key_id}")
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over already
+                self.release_async(key_id)
+            raise
+        finally:
+            slots.queued -= 1
+            if not waiter.done():
+                waiter.cancel()
+            if (
+                slots.running == 0
+                and slots.queued == 0
+                and self._async_slots.get(key_id) is slots
+            ):
+                del self._async_slots[key_id]
+
+    def finish_async(self, key_id: str, operation: asyncio.Future) -> None:
+        """Releases the operation slot once the backend operation
+        finishes - even if nobody awaits its result anymore.
+
+        Parameters:
+            key_id: the identifier of the key
+            operation: the finished backend operation
+
+        """
+        if not operation.cancelled():
+            # mark the exception as retrieved
+            operation.exception()
+        self.release_async(key_id)
+
+    def release_async(self, key_id: str) -> None:
+        """Hands the operation slot of given key over to the first
+        operation waiting in the event loop or releases it.
+
+        Parameters:
+            key_id: the identifier of the key
+
+        """
+        slots = self._async_slots[key_id]
+        while len(slots.waiters) > 0:
+            waiter = slots.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        slots.running -= 1
+        if slots.running == 0 and slots.queued == 0:
+            del self._async_slots[key_id]
@@ -0,0 +1,295 @@
+"""This module provides key resolvers for the key server. A key
+resolver translates the key name from the request URL to the actual
+key instance. The resolvers allow the server to work with either a
+fully materialized mapping of names to keys or with keys loaded lazily
+on first use.
+
+"""
+
+import os
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Protocol, abstractmethod
+
+from .c4gh import C4GHKey
+from .external import ExternalKey
+from .external_software import ExternalSoftwareKey
+from .key import Key
+from .software import SoftwareKey
+from ..exceptions import Crypt4GHKeyException
+
+
+def make_external_key(name: str, key: Key) -> ExternalKey:
+    """Ensures given key can perform the ECDH finalization. Software
+    keys are wrapped in `ExternalSoftwareKey`, external keys are used
+    as they are.
+
+    Parameters:
+        name: the name of the key (for error reporting)
+        key: the key to check and wrap
+
+    Returns:
+        The key usable by the key server.
+
+    Raises:
+        TypeError: if the key is neither external nor software key
+
+    """
+    if isinstance(key, ExternalKey):
+        return key
+    if isinstance(key, SoftwareKey):
+        return ExternalSoftwareKey(key)
+    raise TypeError(
+        f"Expected ExternalKey or SoftwareKey instance for key {name}, found {type(key)}"
+    )
+
+
+class KeyResolver(Protocol):
+    """The key server uses the implementations of this protocol to
+    find the key by its name.
+
+    """
+
+    @abstractmethod
+    def resolve(self, key_id: str) -> ExternalKey:
+        """Must return the key with given name or None if there is no
+        such key.
+
+        Parameters:
+            key_id: the name of the key from the request URL
+
+        Returns:
+            The key instance or None.
+
+        """
+        ...
+
+    @property
+    def may_block(self) -> bool:
+        """True if resolving a key may take a long time (for example
+        when the key is loaded from disk and unlocked).
+
+        """
+        return False
+
+    def warmup(self) -> None:
+        """Performs the lazy initialization of the keys that are
+        known upfront. Does nothing by default.
+
+        """
+        pass
+
+
+class MappingKeyResolver(KeyResolver):
+    """Resolves keys from a fully materialized mapping of names to
+    keys.
+
+    """
+
+    def __init__(self, mapping: dict[str, Key]) -> None:
+        """Ensures all keys in the mapping can perform ECDH exchange.
+
+        Parameters:
+            mapping: dictionary of name to key pairs.
+
+        Raises:
+            TypeError: if some key cannot be used by the key server
+
+        """
+        self._mapping: dict[str, ExternalKey] = {
+            name: make_external_key(name, key) for name, key in mapping.items()
+        }
+
+    def resolve(self, key_id: str) -> ExternalKey:
+        """Returns the key from the mapping.
+
+        Parameters:
+            key_id: the name of the key
+
+        Returns:
+            The key instance or None.
+
+        """
+        return self._mapping.get(key_id)
+
+    def warmup(self) -> None:
+        """Performs the lazy initialization of all the keys in the
+        mapping.
+
+        """
+        for key in self._mapping.values():
+            key.warmup()
+
+
+def default_directory_passphrase_callback(key_id: str) -> str:
+    """By default there is no means of obtaining the passphrase of
+    any key and therefore the loading of an encrypted key fails.
+
+    Parameters:
+        key_id: the name of the key
+
+    """
+    raise Crypt4GHKeyException(f"No password callback provided for {key_id}")
+
+
+class DirectoryKeyResolver(KeyResolver):
+    """Resolves keys from a directory of Crypt4GH key files. The key
+    name is the file name without the suffix. The keys are loaded and
+    unlocked on first request and kept in a bounded cache with least
+    recently used eviction policy. A key file which cannot be unlocked
+    is not retried for a short time so that repeated requests cannot
+    keep running its KDF.
+
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        callback: callable = default_directory_passphrase_callback,
+        suffix: str = ".c4gh",
+        max_keys: int = 128,
+        failure_ttl: float = 5.0,
+    ) -> None:
+        """Initializes the resolver without loading any key.
+
+        Parameters:
+            directory: the directory with the key files
+            callback: must return passphrase for the key name given
+            suffix: the key files name suffix
+            max_keys: the maximum number of keys kept in the cache
+            failure_ttl: seconds a failed key load is not retried
+
+        """
+        assert max_keys > 0, "The cache must hold at least one key"
+        self._directory = directory
+        self._callback = callback
+        self._suffix = suffix
+        self._max_keys = max_keys
+        self._failure_ttl = failure_ttl
+        self._cache: OrderedDict[str, ExternalKey] = OrderedDict()
+        self._failures: dict[str, tuple[float, str]] = {}
+        self._lock = Lock()
+        self._loading: dict[str, Lock] = {}
+
+    @property
+    def may_block(self) -> bool:
+        """Loading a key runs its KDF and therefore may block."""
+        return True
+
+    @property
+    def cached_keys(self) -> list[str]:
+        """The names of the keys currently in the cache (the least
+        recently used first).
+
+        """
+        with self._lock:
+            return list(self._cache.keys())
+
+    def key_file_name(self, key_id: str) -> str:
+        """Computes the name of the file containing given key.
+
+        Parameters:
+            key_id: the name of the key
+
+        Returns:
+            The file name or None if the key name is not valid.
+
+        """
+        if (
+            key_id == ""
+            or key_id.startswith(".")
+            or os.sep in key_id
+            or (os.altsep is not None and os.altsep in key_id)
+        ):
+            return None
+        return os.path.join(self._directory, key_id + self._suffix)
+
+    def load_key(self, key_id: str) -> ExternalKey:
+        """Loads and unlocks the key with given name from its file.
+
+        Parameters:
+            key_id: the name of the key
+
+        Returns:
+            The key instance or None if there is no usable key file.
+
+        """
+        file_name = self.key_file_name(key_id)
+        if file_name is None or not os.path.isfile(file_name):
+            return None
+        key = C4GHKey.from_file(file_name, lambda: self._callback(key_id))
+        if not key.can_compute_symmetric_keys:
+            return None
+        return make_external_key(key_id, key)
+
+    def check_failure(self, key_id: str) -> None:
+        """Must be called with the lock held. Raises the recorded
+        failure if the key failed to load recently.
+
+        Parameters:
+            key_id: the name of the key
+
+        Raises:
+            Crypt4GHKeyException: if the key load failed recently
+
+        """
+        failure = self._failures.get(key_id)
+        if failure is None:
+            return
+        expires, message = failure
+        if monotonic() >= expires:
+            del self._failures[key_id]
+            return
+        raise Crypt4GHKeyException(message)
+
+    def resolve(self, key_id: str) -> ExternalKey:
+        """Returns the key from the cache or loads it. Concurrent
+        requests for the same key that is not in the cache yet wait
+        for single load.
+
+        Parameters:
+            key_id: the name of the key
+
+        Returns:
+            The key instance or None.
+
+        Raises:
+            Crypt4GHKeyException: if the key file exists but cannot be
+                loaded (also for `failure_ttl` seconds afterwards)
+
+        """
+        with self._lock:
+            key = self._cache.get(key_id)
+            if key is not None:
+                self._cache.move_to_end(key_id)
+                return key
+            self.check_failure(key_id)
+            loading = self._loading.setdefault(key_id, Lock())
+        with loading:
+            try:
+                with self._lock:
+                    key = self._cache.get(key_id)
+                    if key is None:
+                        self.check_failure(key_id)
+                if key is None:
+                    try:
+                        key = self.load_key(key_id)
+                    except Exception as ex:
+                        message = f"Cannot load key {key_id}: {ex}"
+                        with self._lock:
+                            self._failures[key_id] = (
+                                monotonic() + self._failure_ttl,
+                                message,
+                            )
+                        raise Crypt4GHKeyException(message) from ex
+                with self._lock:
+                    if key is not None:
+                        self._cache[key_id] = key
+                        self._cache.move_to_end(key_id)
+                        while len(self._cache) > self._max_keys:
+                            self._cache.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._loading.pop(key_id, None)
+        return key
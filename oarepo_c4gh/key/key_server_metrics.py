@@ -0,0 +1,297 @@
+"""This module implements cheap performance metrics for the key
+server. The counters are kept separately for each thread so that
+updating them needs no locking at all. The per-thread counters are
+aggregated only when the metrics are scraped and rendered in the
+Prometheus text exposition format. The counters of threads which have
+finished are folded into a retired total so that thread-per-request
+servers do not accumulate shards.
+
+"""
+
+from bisect import bisect_left
+from threading import Lock, local
+from time import perf_counter
+import weakref
+
+# Upper bounds (in seconds) of the ECDH latency histogram buckets
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label_value(value: str) -> str:
+    """Escapes the label value for Prometheus text format.
+
+    Parameters:
+        value: the raw label value
+
+    Returns:
+        The value with backslashes, double quotes and newlines escaped.
+
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsShard:
+    """Counters updated by a single thread only."""
+
+    def __init__(self, buckets_count: int) -> None:
+        """Initializes all the counters as empty.
+
+        Parameters:
+            buckets_count: the number of histogram buckets including +Inf
+
+        """
+        self.buckets_count = buckets_count
+        self.requests: dict[str, int] = {}
+        self.not_found: dict[str, int] = {}
+        self.in_flight: dict[str, int] = {}
+        self.latency_buckets: dict[str, list[int]] = {}
+        self.latency_sum: dict[str, float] = {}
+
+
+class MetricsShardOwner:
+    """Thread-local marker of the shard ownership. The thread-local
+    storage is cleared when the thread finishes and the marker is
+    then garbage-collected.
+
+    """
+
+    def __init__(self, shard: MetricsShard) -> None:
+        """Stores the shard owned by the current thread.
+
+        Parameters:
+            shard: the counters of the thread
+
+        """
+        self.shard = shard
+
+
+def merge_metrics_shard(target: MetricsShard, shard: MetricsShard) -> None:
+    """Adds all the counters of the shard to the target shard.
+
+    Parameters:
+        target: the shard to update
+        shard: the shard to add
+
+    """
+    for name in ("requests", "not_found", "in_flight", "latency_sum"):
+        counters = getattr(target, name)
+        for key, value in list(getattr(shard, name).items()):
+            counters[key] = counters.get(key, 0) + value
+    for key, buckets in list(shard.latency_buckets.items()):
+        counters = target.latency_buckets.setdefault(
+            key, [0] * target.buckets_count
+        )
+        for idx, value in enumerate(list(buckets)):
+            counters[idx] += value
+
+
+def retire_metrics_shard(
+    metrics_ref: weakref.ref, shard: MetricsShard
+) -> None:
+    """Retires the shard of a finished thread if the metrics instance
+    still exists.
+
+    Parameters:
+        metrics_ref: weak reference to the metrics instance
+        shard: the shard to retire
+
+    """
+    metrics = metrics_ref()
+    if metrics is not None:
+        metrics.retire_shard(shard)
+
+
+class KeyServerMetrics:
+    """An instance of this class collects the key server metrics. It
+    can be shared by all the threads of single server process.
+
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_LATENCY_BUCKETS) -> None:
+        """Initializes the metrics with no shards.
+
+        Parameters:
+            buckets: sorted upper bounds of the latency histogram buckets
+
+        """
+        assert list(buckets) == sorted(buckets), "Buckets must be sorted"
+        self._buckets = tuple(buckets)
+        self._local = local()
+        self._shards: list[MetricsShard] = []
+        self._retired = MetricsShard(len(self._buckets) + 1)
+        self._shards_lock = Lock()
+
+    @property
+    def shard(self) -> MetricsShard:
+        """The counters of the current thread. A new shard is
+        registered the first time a thread updates any metric and it
+        is retired when the thread finishes.
+
+        """
+        owner = getattr(self._local, "owner", None)
+        if owner is None:
+            owner = MetricsShardOwner(MetricsShard(len(self._buckets) + 1))
+            with self._shards_lock:
+                self._shards.append(owner.shard)
+            weakref.finalize(
+                owner, retire_metrics_shard, weakref.ref(self), owner.shard
+            )
+            self._local.owner = owner
+        return owner.shard
+
+    def retire_shard(self, shard: MetricsShard) -> None:
+        """Folds the counters of a finished thread into the retired
+        total and forgets its shard.
+
+        Parameters:
+            shard: the shard of the finished thread
+
+        """
+        with self._shards_lock:
+            merge_metrics_shard(self._retired, shard)
+            self._shards.remove(shard)
+
+    def count_request(self, status: int) -> None:
+        """Counts a handled request.
+
+        Parameters:
+            status: the HTTP status code of the response
+
+        """
+        requests = self.shard.requests
+        key = str(status)
+        requests[key] = requests.get(key, 0) + 1
+
+    def count_not_found(self, reason: str) -> None:
+        """Counts a request rejected as Not Found.
+
+        Parameters:
+            reason: short machine-readable reason of the rejection
+
+        """
+        not_found = self.shard.not_found
+        not_found[reason] = not_found.get(reason, 0) + 1
+
+    def start_operation(self, key_id: str) -> float:
+        """Marks the start of a key operation.
+
+        Parameters:
+            key_id: the name of the key
+
+        Returns:
+            The start timestamp to be passed to `finish_operation`.
+
+        """
+        in_flight = self.shard.in_flight
+        in_flight[key_id] = in_flight.get(key_id, 0) + 1
+        return perf_counter()
+
+    def finish_operation(self, key_id: str, started: float) -> None:
+        """Marks the end of a key operation and records its latency.
+        Must be called from the same thread as `start_operation`.
+
+        Parameters:
+            key_id: the name of the key
+            started: the timestamp returned by `start_operation`
+
+        """
+        elapsed = perf_counter() - started
+        shard = self.shard
+        shard.in_flight[key_id] -= 1
+        buckets = shard.latency_buckets.get(key_id)
+        if buckets is None:
+            buckets = [0] * shard.buckets_count
+            shard.latency_buckets[key_id] = buckets
+        buckets[bisect_left(self._buckets, elapsed)] += 1
+        shard.latency_sum[key_id] = (
+            shard.latency_sum.get(key_id, 0.0) + elapsed
+        )
+
+    def aggregate(self) -> MetricsShard:
+        """Sums the counters of all the threads (including the
+        finished ones).
+
+        Returns:
+            New shard with all the counters aggregated.
+
+        """
+        total = MetricsShard(len(self._buckets) + 1)
+        with self._shards_lock:
+            merge_metrics_shard(total, self._retired)
+            for shard in self._shards:
+                merge_metrics_shard(total, shard)
+        return total
+
+    def render(self) -> bytes:
+        """Renders all the metrics in Prometheus text format.
+
+        Returns:
+            The metrics as UTF-8 encoded text.
+
+        """
+        total = self.aggregate()
+        lines = [
+            "# HELP c4gh_key_server_requests_total Handled requests.",
+            "# TYPE c4gh_key_server_requests_total counter",
+        ]
+        for status, value in sorted(total.requests.items()):
+            lines.append(
+                f'c4gh_key_server_requests_total{{status="{status}"}} {value}'
+            )
+        lines.append(
+            "# HELP c4gh_key_server_not_found_total"
+            " Requests rejected as Not Found."
+        )
+        lines.append("# TYPE c4gh_key_server_not_found_total counter")
+        for reason, value in sorted(total.not_found.items()):
+            lines.append(
+                f'c4gh_key_server_not_found_total{{reason="{reason}"}} {value}'
+            )
+        lines.append(
+            "# HELP c4gh_key_server_in_flight Key operations in progress."
+        )
+        lines.append("# TYPE c4gh_key_server_in_flight gauge")
+        for key_id, value in sorted(total.in_flight.items()):
+            label = escape_label_value(key_id)
+            lines.append(f'c4gh_key_server_in_flight{{key="{label}"}} {value}')
+        lines.append(
+            "# HELP c4gh_key_server_ecdh_seconds Key operation latency."
+        )
+        lines.append("# TYPE c4gh_key_server_ecdh_seconds histogram")
+        bounds = [repr(float(bound)) for bound in self._buckets] + ["+Inf"]
+        for key_id, buckets in sorted(total.latency_buckets.items()):
+            label = escape_label_value(key_id)
+            cumulative = 0
+            for bound, value in zip(bounds, buckets):
+                cumulative += value
+                lines.append(
+                    f"c4gh_key_server_ecdh_seconds_bucket"
+                    f'{{key="{label}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'c4gh_key_server_ecdh_seconds_sum{{key="{label}"}}'
+                f" {total.latency_sum[key_id]}"
+            )
+            lines.append(
+                f'c4gh_key_server_ecdh_seconds_count{{key="{label}"}}'
+                f" {cumulative}"
+            )
+        return ("\n".join(lines) + "\n").encode("utf-8")
@@ -0,0 +1,283 @@
+"""This module implements bulk loading of Crypt4GH keys from a
+directory or a list of files. The key files are parsed immediately
+but the expensive part - the key derivation function and private key
+decryption - is either run for all keys in parallel or postponed until
+each key is used for the first time.
+
+Note that the Crypt4GH private key format does not contain the public
+key. The public key of an encrypted private key is therefore only
+available after the key is unlocked.
+
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock
+
+from .c4gh import (
+    C4GHKey,
+    decode_b64_envelope,
+    parse_c4gh_private_key,
+    unlock_c4gh_private_key,
+)
+from .key import Key
+from .fork import register_after_fork
+from .key_collection import KeyCollection
+from .software import SoftwareKey
+from ..exceptions import Crypt4GHKeyException
+
+# Supported keyring unlocking modes
+KEYRING_MODES = ("thread", "process", "deferred")
+
+
+def default_keyring_passphrase_callback(file_name: str) -> str:
+    """By default the keyring loader has no means of obtaining the
+    passphrase and therefore this function unconditionally raises an
+    exception when called.
+
+    Parameters:
+        file_name: the path of the key file being unlocked
+
+    """
+    raise Crypt4GHKeyException(
+        f"No password callback provided for {file_name}"
+    )
+
+
+class DeferredC4GHKey(Key):
+    """Encrypted Crypt4GH private key which is unlocked only when it
+    is used for the first time. After unlocking all the operations are
+    delegated to the software key with the decrypted private key.
+
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        kdf: tuple,
+        payload: bytes,
+        callback: callable = default_keyring_passphrase_callback,
+    ) -> None:
+        """Stores the parsed encrypted key for later unlocking.
+
+        Parameters:
+            file_name: the path of the key file (passed to the callback)
+            kdf: the KDF name, rounds and salt
+            payload: the nonce and encrypted private key
+            callback: must return passphrase for given file name
+
+        """
+        self._file_name = file_name
+        self._kdf = kdf
+        self._payload = payload
+        self._callback = callback
+        self._lock = Lock()
+        self._key = None
+        register_after_fork(self)
+
+    def __getstate__(self) -> dict:
+        """Returns the picklable state of the key. An unlocked key is
+        pickled with its decrypted private key and without the
+        passphrase callback so that it can be shared with worker
+        processes without unlocking it again. A locked key can be
+        pickled only if its callback can.
+
+        """
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        if state["_key"] is not None:
+            state["_callback"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restores the key from pickled state with fresh lock.
+
+        Parameters:
+            state: the state returned by `__getstate__`
+
+        """
+        self.__dict__.update(state)
+        self._lock = Lock()
+        register_after_fork(self)
+
+    def after_fork(self) -> None:
+        """Replaces the lock inherited from the parent process which
+        might have been held by another thread during the fork.
+
+        """
+        self._lock = Lock()
+
+    @property
+    def file_name(self) -> str:
+        """The path of the key file."""
+        return self._file_name
+
+    @property
+    def unlocked(self) -> bool:
+        """True if the private key has already been decrypted."""
+        return self._key is not None
+
+    def unlock(self) -> SoftwareKey:
+        """Obtains the passphrase and decrypts the private key. It is
+        done only once even if called concurrently.
+
+        Returns:
+            The software key with the decrypted private key.
+
+        """
+        key = self._key
+        if key is None:
+            with self._lock:
+                if self._key is None:
+                    kdf_name, kdf_rounds, kdf_salt = self._kdf
+                    passphrase = self._callback(self._file_name).encode()
+                    self._key = C4GHKey(
+                        unlock_c4gh_private_key(
+                            kdf_name,
+                            kdf_rounds,
+                            kdf_salt,
+                            passphrase,
+                            self._payload,
+                        )
+                    )
+                    self._payload = None
+                key = self._key
+        return key
+
+    @property
+    def public_key(self) -> bytes:
+        """Returns the public key (unlocks the private key first)."""
+        return self.unlock().public_key
+
+    def compute_write_key(self, reader_public_key: bytes) -> bytes:
+        """Unlocks the private key and computes the writer key.
+
+        Parameters:
+            reader_public_key: the 32 bytes of the reader public key
+
+        Returns:
+            Writer symmetric key as 32 bytes.
+
+        """
+        return self.unlock().compute_write_key(reader_public_key)
+
+    def compute_read_key(self, writer_public_key: bytes) -> bytes:
+        """Unlocks the private key and computes the reader key.
+
+        Parameters:
+            writer_public_key: the 32 bytes of the writer public key
+
+        Returns:
+            Reader symmetric key as 32 bytes.
+
+        """
+        return self.unlock().compute_read_key(writer_public_key)
+
+    @property
+    def can_compute_symmetric_keys(self) -> bool:
+        """Always true as the key contains the (encrypted) private
+        part.
+
+        """
+        return True
+
+
+def list_keyring_files(path: str | list[str], suffix: str = None) -> list:
+    """Returns the key files to load.
+
+    Parameters:
+        path: a directory or a list of key file paths
+        suffix: if given, only directory entries with this suffix are used
+
+    Returns:
+        List of key file paths.
+
+    """
+    if not isinstance(path, str):
+        return list(path)
+    return [
+        os.path.join(path, name)
+        for name in sorted(os.listdir(path))
+        if not name.startswith(".")
+        and (suffix is None or name.endswith(suffix))
+        and os.path.isfile(os.path.join(path, name))
+    ]
+
+
+def load_keyring(
+    path: str | list[str],
+    callback: callable = default_keyring_passphrase_callback,
+    mode: str = "thread",
+    max_workers: int = None,
+    suffix: str = None,
+) -> KeyCollection:
+    """Loads all the private keys from given directory or list of
+    files. Public keys are skipped. Unencrypted private keys are
+    loaded directly. Encrypted private keys are unlocked depending on
+    the mode:
+
+    - "thread": in parallel in a thread pool (the KDF implementations
+      release the GIL)
+    - "process": in parallel in a process pool
+    - "deferred": each key when it is used for the first time
+
+    In the parallel modes the passphrase callback is called for all
+    encrypted keys before the unlocking starts.
+
+    Parameters:
+        path: a directory or a list of key file paths
+        callback: must return passphrase for given key file path
+        mode: one of the modes described above
+        max_workers: the maximum number of parallel workers
+        suffix: if given, only directory entries with this suffix are used
+
+    Returns:
+        The collection of all the private keys.
+
+    Raises:
+        Crypt4GHKeyException: if no private key was found or some key cannot be loaded
+
+    """
+    assert mode in KEYRING_MODES, f"Unsupported keyring mode {mode}"
+    keys = []
+    encrypted = []
+    for file_name in list_keyring_files(path, suffix):
+        with open(file_name, "rb") as f:
+            slabel, sdata = decode_b64_envelope(f)
+        if slabel == b"CRYPT4GH PUBLIC KEY":
+            continue
+        kdf_name, kdf_rounds, kdf_salt, cipher_name, payload = (
+            parse_c4gh_private_key(sdata)
+        )
+        if cipher_name == b"none":
+            keys.append(C4GHKey(payload, False))
+        elif mode == "deferred":
+            keys.append(
+                DeferredC4GHKey(
+                    file_name,
+                    (kdf_name, kdf_rounds, kdf_salt),
+                    payload,
+                    callback,
+                )
+            )
+        else:
+            idx = len(keys)
+            keys.append(None)
+            passphrase = callback(file_name).encode()
+            encrypted.append(
+                (idx, (kdf_name, kdf_rounds, kdf_salt, passphrase, payload))
+            )
+    if len(encrypted) > 0:
+        executor_class = (
+            ThreadPoolExecutor if mode == "thread" else ProcessPoolExecutor
+        )
+        with executor_class(max_workers=max_workers) as executor:
+            futures = [
+                (idx, executor.submit(unlock_c4gh_private_key, *args))
+                for idx, args in encrypted
+            ]
+            for idx, future in futures:
+                keys[idx] = C4GHKey(future.result(), False)
+    if len(keys) == 0:
+        raise Crypt4GHKeyException("No private keys found")
+    return KeyCollection(*keys)
@@ -15,9 +15,22 @@ from nacl.bindings import (
     crypto_kx_client_session_keys,
 )
 from ..exceptions import Crypt4GHKeyException
+from .fork import register_after_fork
+from collections import OrderedDict
+from threading import Lock
 import secrets
 
 
+def zeroize(buf: bytearray) -> None:
+    """Overwrites the buffer contents with zeros.
+
+    Parameters:
+        buf: the buffer to clear
+
+    """
+    buf[:] = bytes(len(buf))
+
+
 class SoftwareKey(Key):
     """This class implements the actual Diffie-Hellman key exchange
     with locally stored private key in the class instance.
@@ -47,6 +60,126 @@ class SoftwareKey(Key):
             self._private_key = bytes(private_key_obj)
             public_key_obj = private_key_obj.public_key
             self._public_key = bytes(public_key_obj)
+        self._cache_max = 0
+        self._cache = None
+        self._cache_lock = None
+
+    def __getstate__(self) -> dict:
+        """Returns the picklable state of the key. The session keys
+        cache contents are not included (only its size limit).
+
+        """
+        state = self.__dict__.copy()
+        state["_cache"] = None
+        state["_cache_lock"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restores the key from pickled state with empty session keys
+        cache (if the cache was enabled).
+
+        Parameters:
+            state: the state returned by `__getstate__`
+
+        """
+        self.__dict__.update(state)
+        if self._cache_max > 0:
+            self.enable_cache(self._cache_max)
+
+    def enable_cache(self, max_peers: int = 256) -> None:
+        """Enables memoization of the derived symmetric keys. The
+        keys are memoized for up to given number of peer public keys
+        (and direction) with least recently used eviction policy.
+
+        Parameters:
+            max_peers: the maximum number of memoized keys
+
+        """
+        assert max_peers > 0, "The cache must hold at least one key"
+        self.clear_cache()
+        self._cache_max = max_peers
+        self._cache = OrderedDict()
+        self._cache_lock = Lock()
+        register_after_fork(self)
+
+    def clear_cache(self) -> None:
+        """Removes all the memoized keys from the cache and overwrites
+        their memory with zeros.
+
+        """
+        if self._cache is not None:
+            with self._cache_lock:
+                for shared_key in self._cache.values():
+                    zeroize(shared_key)
+                self._cache.clear()
+
+    def disable_cache(self) -> None:
+        """Clears the cache and disables the memoization."""
+        self.clear_cache()
+        self._cache_max = 0
+        self._cache = None
+        self._cache_lock = None
+
+    def after_fork(self) -> None:
+        """Replaces the cache lock inherited from the parent process
+        which might have been held by another thread during the fork.
+
+        """
+        if self._cache is not None:
+            self._cache_lock = Lock()
+
+    def cached_session_key(self, write: bool, peer_public_key: bytes) -> bytes:
+        """Computes the read or write symmetric key, using the cache
+        if it is enabled.
+
+        Parameters:
+            write: True for the write key, False for the read key
+            peer_public_key: the 32 bytes of the other party public key
+
+        Returns:
+            The symmetric key as 32 bytes.
+
+        """
+        if self._cache is None:
+            return self.compute_session_key(write, peer_public_key)
+        cache_key = (write, bytes(peer_public_key))
+        with self._cache_lock:
+            shared_key = self._cache.get(cache_key)
+            if shared_key is not None:
+                self._cache.move_to_end(cache_key)
+                return bytes(shared_key)
+        result = self.compute_session_key(write, peer_public_key)
+        with self._cache_lock:
+            self._cache[cache_key] = bytearray(result)
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self._cache_max:
+                _, evicted = self._cache.popitem(last=False)
+                zeroize(evicted)
+        return result
+
+    def compute_session_key(
+        self, write: bool, peer_public_key: bytes
+    ) -> bytes:
+        """Performs the actual key exchange and session keys
+        derivation. See `compute_write_key` for details.
+
+        Parameters:
+            write: True for the write key, False for the read key
+            peer_public_key: the 32 bytes of the other party public key
+
+        Returns:
+            The symmetric key as 32 bytes.
+
+        """
+        if write:
+            _, shared_key = crypto_kx_server_session_keys(
+                self._public_key, self._private_key, peer_public_key
+            )
+        else:
+            shared_key, _ = crypto_kx_client_session_keys(
+                self._public_key, self._private_key, peer_public_key
+            )
+        return shared_key
 
     @property
     def public_key(self) -> bytes:
@@ -97,10 +230,7 @@ class SoftwareKey(Key):
                 "Only keys with private part can be used"
                 " for computing shared key"
             )
-        _, shared_key = crypto_kx_server_session_keys(
-            self._public_key, self._private_key, reader_public_key
-        )
-        return shared_key
+        return self.cached_session_key(True, reader_public_key)
 
     def compute_read_key(self, writer_public_key: bytes) -> bytes:
         """Computes secret symmetric key used for reading Crypt4GH
@@ -127,10 +257,7 @@ class SoftwareKey(Key):
                 "Only keys with private part can be used"
                 " for computing shared key"
             )
-        shared_key, _ = crypto_kx_client_session_keys(
-            self._public_key, self._private_key, writer_public_key
-        )
-        return shared_key
+        return self.cached_session_key(False, writer_public_key)
 
     @property
     def can_compute_symmetric_keys(self) -> bool:
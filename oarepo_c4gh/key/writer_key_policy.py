@@ -0,0 +1,116 @@
+"""This module implements a policy for reusing ephemeral writer keys
+when encrypting header packets for recipients. Without a policy, a new
+ephemeral key is generated for each header and the symmetric key is
+derived for each recipient again. With a shared policy instance, the
+ephemeral key is reused and the derived symmetric keys are cached per
+recipient until the key is rotated.
+
+Rotation limits:
+
+- each header packet is encrypted with a random 96-bit nonce, the
+  number of packets encrypted with a single symmetric key should be
+  kept well below 2^32 to keep the probability of nonce collision
+  negligible - `max_uses` bounds the number of packets encrypted with
+  single ephemeral key (for all recipients together)
+- `max_age` bounds the time single ephemeral key is used which limits
+  the exposure if the process memory is compromised
+- all containers written with the same ephemeral key share the same
+  writer public key in their headers and can therefore be linked
+  together by anyone who can see them
+
+"""
+
+from threading import Lock
+from time import monotonic
+
+from .fork import register_after_fork
+from .software import SoftwareKey
+
+
+class WriterKeyPolicy:
+    """Provides ephemeral writer keys and derived symmetric keys for
+    recipients. The instance can be shared by all the threads of the
+    process.
+
+    """
+
+    def __init__(
+        self,
+        max_uses: int = 65536,
+        max_age: float = 3600.0,
+        max_recipients: int = 256,
+    ) -> None:
+        """Initializes the policy without any key.
+
+        Parameters:
+            max_uses: the number of packets after which the key is rotated
+            max_age: the number of seconds after which the key is rotated
+            max_recipients: the maximum number of cached recipient keys
+
+        """
+        assert max_uses > 0, "The key must be usable at least once"
+        assert max_age > 0, "The key maximum age must be positive"
+        self._max_uses = max_uses
+        self._max_age = max_age
+        self._max_recipients = max_recipients
+        self._lock = Lock()
+        self._key = None
+        self._created = 0.0
+        self._uses = 0
+        register_after_fork(self)
+
+    def rotate(self) -> None:
+        """Discards the current ephemeral key and its cached symmetric
+        keys. A new key is generated when needed.
+
+        """
+        with self._lock:
+            self.discard_key()
+
+    def discard_key(self) -> None:
+        """Zeroizes the cached symmetric keys and forgets the current
+        key. Must be called with the lock held.
+
+        """
+        if self._key is not None:
+            self._key.disable_cache()
+            self._key = None
+
+    def after_fork(self) -> None:
+        """Replaces the lock inherited from the parent process and
+        makes sure the child process uses its own ephemeral key.
+
+        """
+        self._lock = Lock()
+        self._key = None
+
+    def write_key(self, recipient_public_key: bytes) -> (bytes, bytes):
+        """Returns the ephemeral writer public key and the symmetric
+        key for encrypting single header packet for given
+        recipient. Rotates the ephemeral key if any of the limits has
+        been reached.
+
+        Parameters:
+            recipient_public_key: the 32 bytes of the recipient public key
+
+        Returns:
+            The writer public key and the symmetric key (32 bytes each).
+
+        """
+        with self._lock:
+            now = monotonic()
+            if (
+                self._key is None
+                or self._uses >= self._max_uses
+                or now - self._created >= self._max_age
+            ):
+                self.discard_key()
+                self._key = SoftwareKey.generate()
+                self._key.enable_cache(self._max_recipients)
+                self._created = now
+                self._uses = 0
+            self._uses += 1
+            return (
+                self._key.public_key,
+                self._key.compute_write_key(recipient_public_key),
+            )
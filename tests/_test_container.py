@@ -0,0 +1,38 @@
+import secrets
+
+from nacl.bindings import crypto_aead_chacha20poly1305_ietf_encrypt
+
+from oarepo_c4gh.key import SoftwareKey
+
+
+def make_test_container(
+    reader_public_key: bytes, cleartext: bytes, dek: bytes = None
+) -> bytes:
+    """Builds a Crypt4GH container with single data encryption
+    parameters packet for given reader and the cleartext split into
+    64 KiB blocks.
+
+    """
+    if dek is None:
+        dek = secrets.token_bytes(32)
+    ekey = SoftwareKey.generate()
+    content = (0).to_bytes(4, "little") + (0).to_bytes(4, "little") + dek
+    nonce = secrets.token_bytes(12)
+    encrypted = crypto_aead_chacha20poly1305_ietf_encrypt(
+        content, None, nonce, ekey.compute_write_key(reader_public_key)
+    )
+    packet_body = (
+        (0).to_bytes(4, "little") + ekey.public_key + nonce + encrypted
+    )
+    packet = (len(packet_body) + 4).to_bytes(4, "little") + packet_body
+    out = [b"crypt4gh", (1).to_bytes(4, "little"), (1).to_bytes(4, "little")]
+    out.append(packet)
+    for offset in range(0, len(cleartext), 65536):
+        nonce = secrets.token_bytes(12)
+        out.append(nonce)
+        out.append(
+            crypto_aead_chacha20poly1305_ietf_encrypt(
+                cleartext[offset : offset + 65536], None, nonce, dek
+            )
+        )
+    return b"".join(out)
@@ -0,0 +1,97 @@
+import io
+import os
+import secrets
+import unittest
+from unittest import mock
+
+from _test_container import make_test_container
+from _test_data import alice_sec_bstr, alice_sec_password
+
+from oarepo_c4gh.crypt4gh import aead
+from oarepo_c4gh.crypt4gh.aead import (
+    AEAD_BACKENDS,
+    AEADBackend,
+    get_aead_backend,
+    select_aead_backend,
+    set_aead_backend,
+)
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.crypt4gh.filter.add_recipient import AddRecipientFilter
+from oarepo_c4gh.crypt4gh.writer import Crypt4GHWriter
+from oarepo_c4gh.key import C4GHKey, SoftwareKey
+
+
+class TestAEAD(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = aead._backend
+
+    def tearDown(self):
+        aead._backend = self.saved
+
+    def test_backends_interoperable(self):
+        key = secrets.token_bytes(32)
+        nonce = secrets.token_bytes(12)
+        data = os.urandom(1000)
+        backends = [backend() for backend in AEAD_BACKENDS.values()]
+        for encryptor in backends:
+            ciphertext = encryptor.encrypt(encryptor.context(key), nonce, data)
+            damaged = bytearray(ciphertext)
+            damaged[0] ^= 1
+            for decryptor in backends:
+                context = decryptor.context(key)
+                view = memoryview(ciphertext)
+                assert decryptor.decrypt(context, nonce, view) == data
+                assert decryptor.decrypt(context, nonce, damaged) is None
+                buf = bytearray(len(data))
+                assert decryptor.decrypt_into(context, nonce, view, buf)
+                assert buf == data
+                assert not decryptor.decrypt_into(context, nonce, damaged, buf)
+
+    def test_protocol(self):
+        with self.assertRaises(TypeError):
+            AEADBackend()
+
+        class EncryptOnly(AEADBackend):
+            def context(self, key):
+                return key
+
+            def encrypt(self, context, nonce, data):
+                return data
+
+        with self.assertRaises(TypeError):
+            EncryptOnly()
+
+    def test_selection(self):
+        with self.assertRaises(ValueError):
+            select_aead_backend("rot13")
+        assert select_aead_backend("auto").name in AEAD_BACKENDS
+        aead._backend = None
+        with mock.patch.dict(os.environ, {"C4GH_AEAD_BACKEND": "nacl"}):
+            assert get_aead_backend().name == "nacl"
+        assert set_aead_backend("cryptography").name == "cryptography"
+        assert get_aead_backend().name == "cryptography"
+
+    def test_container_with_all_backends(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        bkey = SoftwareKey.generate()
+        cleartext = os.urandom(70000)
+        container = make_test_container(akey.public_key, cleartext)
+        for name in AEAD_BACKENDS:
+            set_aead_backend(name)
+            ostream = io.BytesIO()
+            Crypt4GHWriter(
+                AddRecipientFilter(
+                    Crypt4GH(io.BytesIO(container), akey), bkey.public_key
+                ),
+                ostream,
+            ).write()
+            crypt4gh = Crypt4GH(io.BytesIO(ostream.getvalue()), bkey)
+            assert (
+                b"".join(block.cleartext for block in crypt4gh.data_blocks)
+                == cleartext
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
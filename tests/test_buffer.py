@@ -0,0 +1,151 @@
+import io
+import mmap
+import os
+import tempfile
+import unittest
+
+from _test_container import make_test_container
+from _test_data import alice_sec_bstr, alice_sec_password
+
+from oarepo_c4gh.crypt4gh.buffer import Buffer4GH, BufferHeader, Mmap4GH
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.crypt4gh.writer import Crypt4GHWriter
+from oarepo_c4gh.exceptions import (
+    Crypt4GHHeaderException,
+    Crypt4GHHeaderPacketException,
+)
+from oarepo_c4gh.key import C4GHKey
+
+
+class TestBufferHeader(unittest.TestCase):
+
+    def setUp(self):
+        self.akey = C4GHKey.from_bytes(
+            alice_sec_bstr, lambda: alice_sec_password
+        )
+        self.container = make_test_container(self.akey.public_key, b"x" * 10)
+
+    def test_zero_copy_packets(self):
+        header = BufferHeader(self.akey, self.container)
+        assert len(header.packets) == 1
+        packet = header.packets[0]
+        assert packet.is_data_encryption_parameters
+        assert isinstance(packet.packet_data, memoryview), "copied packet"
+        assert packet.packet_data.obj is self.container
+        assert header.header_length == 16 + packet.length
+        assert header.serialized == self.container[: header.header_length]
+        assert header.deks.count == 1
+        assert header.reader_keys_used == [self.akey.public_key]
+
+    def test_mmap(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(self.container)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                header = BufferHeader(self.akey, mm)
+                assert len(header.packets) == 1
+                assert header.packets[0].is_readable
+                del header
+
+    def test_invalid(self):
+        with self.assertRaises(Crypt4GHHeaderException):
+            BufferHeader(self.akey, b"crypt4gx" + self.container[8:])
+        truncated = self.container[:40]
+        header = BufferHeader(self.akey, truncated)
+        with self.assertRaises(Crypt4GHHeaderPacketException):
+            header.packets
+
+
+class TestBuffer4GH(unittest.TestCase):
+
+    def setUp(self):
+        self.akey = C4GHKey.from_bytes(
+            alice_sec_bstr, lambda: alice_sec_password
+        )
+        self.cleartext = os.urandom(3 * 65536 + 1000)
+        self.container = make_test_container(
+            self.akey.public_key, self.cleartext
+        )
+
+    def test_blocks(self):
+        crypt4gh = Buffer4GH(self.container, self.akey, analyze=True)
+        assert crypt4gh.block_count == 4
+        assert crypt4gh.data_length == len(self.container) - (
+            crypt4gh.header.header_length
+        )
+        blocks = list(crypt4gh.data_blocks)
+        assert isinstance(blocks[0].ciphertext, memoryview)
+        assert b"".join(block.cleartext for block in blocks) == self.cleartext
+        assert crypt4gh.analyzer.to_dict()["blocks"] == [0, 0, 0, 0]
+        assert [
+            block.offset for block in crypt4gh.read_blocks(2, 1)
+        ] == [blocks[2].offset]
+        assert b"".join(
+            block.cleartext for block in crypt4gh.read_blocks(1)
+        ) == self.cleartext[65536:]
+
+    def test_same_as_stream(self):
+        crypt4gh = Buffer4GH(self.container, self.akey)
+        ostream = io.BytesIO()
+        Crypt4GHWriter(crypt4gh, ostream).write()
+        assert ostream.getvalue() == self.container
+        stream = Crypt4GH(io.BytesIO(self.container), self.akey)
+        assert [block.offset for block in stream.data_blocks] == [
+            block.offset for block in crypt4gh.read_blocks()
+        ]
+
+    def test_mmap_file(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(self.container)
+            f.flush()
+            with Mmap4GH(f.name, self.akey) as crypt4gh:
+                cleartext = b"".join(
+                    bytes(block.cleartext) for block in crypt4gh.clear_blocks
+                )
+                assert cleartext == self.cleartext
+                assert next(crypt4gh.read_blocks(3)).cleartext == (
+                    self.cleartext[3 * 65536 :]
+                )
+
+    def test_mmap_close_retry(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(self.container)
+            f.flush()
+            crypt4gh = Mmap4GH(f.name, self.akey)
+            blocks = list(crypt4gh.data_blocks)
+            with self.assertRaises(BufferError):
+                crypt4gh.close()
+            assert (
+                crypt4gh.header.serialized
+                == self.container[: crypt4gh.header.header_length]
+            )
+            block = next(crypt4gh.read_blocks(1))
+            assert block.cleartext == self.cleartext[65536 : 2 * 65536]
+            del block
+            header = crypt4gh.header
+            with self.assertRaises(BufferError):
+                crypt4gh.close()
+            assert crypt4gh.header is header, "header must be kept"
+            del header
+            blocks = None
+            crypt4gh.close()
+            crypt4gh.close()
+
+    def test_trailing_bytes(self):
+        container = make_test_container(
+            self.akey.public_key, bytes(2 * 65536)
+        ) + bytes(10)
+        blocks = list(
+            Buffer4GH(container, self.akey, decrypt=False).data_blocks
+        )
+        assert len(blocks) == 3
+        assert blocks[-1].ciphertext == bytes(10)
+        ostream = io.BytesIO()
+        Crypt4GHWriter(
+            Buffer4GH(container, self.akey, decrypt=False), ostream
+        ).write()
+        assert ostream.getvalue() == container
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import array
+import io
+import mmap
+import os
+import unittest
+from unittest import mock
+
+from _test_container import make_test_container
+from _test_data import (
+    alice_sec_bstr,
+    alice_sec_password,
+    bob_sec_bstr,
+    bob_sec_password,
+)
+
+from oarepo_c4gh.crypt4gh.aead import NaClAEADBackend
+from oarepo_c4gh.crypt4gh.buffer import Buffer4GH
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.exceptions import (
+    Crypt4GHDEKException,
+    Crypt4GHProcessedException,
+)
+from oarepo_c4gh.key import C4GHKey
+
+
+class TestDecryptInto(unittest.TestCase):
+
+    def setUp(self):
+        self.akey = C4GHKey.from_bytes(
+            alice_sec_bstr, lambda: alice_sec_password
+        )
+        self.cleartext = os.urandom(4 * 65536 + 123)
+        self.container = make_test_container(
+            self.akey.public_key, self.cleartext
+        )
+
+    def test_buffer(self):
+        crypt4gh = Buffer4GH(self.container, self.akey)
+        buf = bytearray(len(self.cleartext))
+        assert crypt4gh.decrypt_into(buf) == len(self.cleartext)
+        assert buf == self.cleartext
+        out = array.array("B", bytes(2 * 65536))
+        assert crypt4gh.decrypt_into(out, 1, 2) == 2 * 65536
+        assert out.tobytes() == self.cleartext[65536 : 3 * 65536]
+        with mmap.mmap(-1, 65536 + 123) as mm:
+            assert crypt4gh.decrypt_into(mm, 3) == 65536 + 123
+            assert mm[:] == self.cleartext[3 * 65536 :]
+
+    def test_fallback(self):
+        with mock.patch(
+            "oarepo_c4gh.crypt4gh.dek_collection.get_aead_backend",
+            return_value=NaClAEADBackend(),
+        ):
+            buf = bytearray(len(self.cleartext))
+            Buffer4GH(self.container, self.akey).decrypt_into(buf)
+            assert buf == self.cleartext
+
+    def test_stream(self):
+        for read_ahead in (0, 2):
+            crypt4gh = Crypt4GH(
+                io.BytesIO(self.container), self.akey, read_ahead=read_ahead
+            )
+            buf = bytearray(65536)
+            assert crypt4gh.decrypt_into(buf, 2, 1) == 65536
+            assert buf == self.cleartext[2 * 65536 : 3 * 65536]
+            with self.assertRaises(Crypt4GHProcessedException):
+                list(crypt4gh.data_blocks)
+
+    def test_errors(self):
+        crypt4gh = Buffer4GH(self.container, self.akey)
+        with self.assertRaises(ValueError):
+            crypt4gh.decrypt_into(bytearray(65536), 0, 2)
+        damaged = bytearray(self.container)
+        damaged[-1] ^= 1
+        with self.assertRaises(Crypt4GHDEKException):
+            Buffer4GH(damaged, self.akey).decrypt_into(
+                bytearray(len(self.cleartext))
+            )
+
+    def test_no_dek(self):
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        buf = bytearray(len(self.cleartext))
+        with self.assertRaises(Crypt4GHDEKException):
+            Buffer4GH(self.container, bkey).decrypt_into(buf)
+        for read_ahead in (0, 2):
+            crypt4gh = Crypt4GH(
+                io.BytesIO(self.container), bkey, read_ahead=read_ahead
+            )
+            with self.assertRaises(Crypt4GHDEKException):
+                crypt4gh.decrypt_into(buf)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,8 @@
+import pickle
+import secrets
 import unittest
+from unittest import mock
+from oarepo_c4gh.crypt4gh.aead import AEAD_BACKENDS
 from oarepo_c4gh.crypt4gh.dek_collection import DEKCollection
 from oarepo_c4gh.exceptions import Crypt4GHDEKException
 from oarepo_c4gh.crypt4gh.dek import DEK
@@ -12,6 +16,26 @@ class TestCrypt4GHDEKCollection(unittest.TestCase):
     def test_invalid_dek(self):
         self.assertRaises(Crypt4GHDEKException, lambda: DEK(b"1234", None))
 
+    def test_context_reused(self):
+        key = secrets.token_bytes(32)
+        nonce = secrets.token_bytes(12)
+        for backend_class in AEAD_BACKENDS.values():
+            backend = backend_class()
+            block = nonce + backend.encrypt(backend.context(key), nonce, b"x")
+            deks = DEKCollection()
+            deks.add_dek(DEK(secrets.token_bytes(32), None))
+            deks.add_dek(DEK(key, None))
+            with mock.patch(
+                "oarepo_c4gh.crypt4gh.dek_collection.get_aead_backend",
+                return_value=backend,
+            ), mock.patch.object(
+                backend, "context", wraps=backend.context
+            ) as context:
+                for idx in range(10):
+                    assert deks.decrypt_block(block)[1:] == (b"x", 1)
+                assert context.call_count == 2, "contexts not reused"
+            assert pickle.loads(pickle.dumps(deks[1])).dek == key
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,84 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from _test_container import make_test_container
+from _test_data import alice_sec_bstr, alice_sec_password
+
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.crypt4gh.stream.fadvise import FileAdvisor
+from oarepo_c4gh.key import C4GHKey
+
+
+@unittest.skipUnless(hasattr(os, "posix_fadvise"), "posix_fadvise required")
+class TestFileAdvisor(unittest.TestCase):
+
+    def setUp(self):
+        self.akey = C4GHKey.from_bytes(
+            alice_sec_bstr, lambda: alice_sec_password
+        )
+        self.cleartext = os.urandom(8 * 65536)
+        self.container = make_test_container(
+            self.akey.public_key, self.cleartext
+        )
+
+    def scan(self, istream, **kwargs):
+        calls = []
+        with mock.patch(
+            "os.posix_fadvise",
+            side_effect=lambda fd, offset, length, advice: calls.append(
+                (offset, length, advice)
+            ),
+        ):
+            crypt4gh = Crypt4GH(istream, self.akey, **kwargs)
+            cleartext = b"".join(
+                block.cleartext for block in crypt4gh.data_blocks
+            )
+        assert cleartext == self.cleartext
+        return calls
+
+    def test_file_hints(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(self.container)
+            f.flush()
+            with open(f.name, "rb") as istream:
+                calls = self.scan(istream, fadvise=4 * 65536)
+        advices = [advice for _, _, advice in calls]
+        assert advices[0] == os.POSIX_FADV_SEQUENTIAL
+        assert advices.count(os.POSIX_FADV_WILLNEED) > 1
+        assert advices[-1] == os.POSIX_FADV_DONTNEED
+        dropped = [
+            (offset, length)
+            for offset, length, advice in calls
+            if advice == os.POSIX_FADV_DONTNEED
+        ]
+        for (offset, length), (next_offset, _) in zip(dropped, dropped[1:]):
+            assert (
+                offset + length == next_offset
+            ), "dropped ranges not contiguous"
+        assert dropped[-1][0] + dropped[-1][1] == len(self.container)
+
+    def test_read_ahead_hints(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(self.container)
+            f.flush()
+            with open(f.name, "rb", buffering=0) as istream:
+                calls = self.scan(istream, fadvise=65536, read_ahead=2)
+        assert calls[0][2] == os.POSIX_FADV_SEQUENTIAL
+
+    def test_non_file(self):
+        assert self.scan(io.BytesIO(self.container), fadvise=65536) == []
+        assert not FileAdvisor(io.BytesIO(), 65536).active
+
+    def test_disabled(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(self.container)
+            f.flush()
+            with open(f.name, "rb") as istream:
+                assert self.scan(istream) == []
+
+
+if __name__ == "__main__":
+    unittest.main()
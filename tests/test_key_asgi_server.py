@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import unittest
+
+from _test_data import alice_pub_bstr, alice_sec_bstr, alice_sec_password
+
+from oarepo_c4gh.key import C4GHKey, ExternalSoftwareKey
+from oarepo_c4gh.key.asgi_path_key_server import ASGIPathKeyServer
+from oarepo_c4gh.key.key_limiter import KeyLimiter
+
+generator_path = "/alice/x25519/" + "09" + "00" * 31
+
+
+class ThreadedSoftwareKey(ExternalSoftwareKey):
+    """Software-backed key which is not recognized as inline key."""
+
+    pass
+
+
+class SlowKey(ThreadedSoftwareKey):
+    """Offloaded key which blocks every operation until released."""
+
+    def __init__(self, softkey):
+        super().__init__(softkey)
+        self.release = threading.Event()
+        self.calls = 0
+
+    def compute_ecdh(self, public_point):
+        self.calls += 1
+        self.release.wait(5)
+        return super().compute_ecdh(public_point)
+
+
+def run_asgi_request(app, path, scope_type="http"):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app({"type": scope_type, "path": path}, receive, send))
+    return sent
+
+
+def make_alice_server(wrapper=None, **kwargs):
+    akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+    if wrapper is not None:
+        akey = wrapper(akey)
+    return ASGIPathKeyServer({"alice": akey}, **kwargs)
+
+
+class TestASGIPathKeyServer(unittest.TestCase):
+
+    def test_inline_request(self):
+        app = make_alice_server()
+        assert app.is_inline_key(
+            app._resolver.resolve("alice")
+        ), "software key must run inline"
+        sent = run_asgi_request(app, generator_path)
+        assert sent[0]["status"] == 200, "request must succeed"
+        assert (
+            sent[1]["body"] == C4GHKey.from_bytes(alice_pub_bstr).public_key
+        ), "does not compute public key"
+        assert app._executor is None, "no thread pool for inline keys"
+
+    def test_offloaded_request(self):
+        app = make_alice_server(ThreadedSoftwareKey, max_workers=2)
+        assert not app.is_inline_key(
+            app._resolver.resolve("alice")
+        ), "external key must offload"
+        sent = run_asgi_request(app, generator_path)
+        assert sent[0]["status"] == 200, "request must succeed"
+        assert len(sent[1]["body"]) == 32, "invalid result size"
+        assert app._executor is not None, "thread pool must be used"
+
+    def test_not_found(self):
+        app = make_alice_server()
+        sent = run_asgi_request(app, "/bob/x25519/" + "09" + "00" * 31)
+        assert sent[0]["status"] == 404 and sent[1]["body"] == b""
+        assert (b"content-length", b"0") in sent[0]["headers"]
+
+    def test_busy(self):
+        app = make_alice_server(SlowKey, limiter=KeyLimiter(1, 0))
+
+        async def run():
+            slow = asyncio.ensure_future(
+                app.handle_asgi_path_request("/alice/x25519/" + "01" * 32)
+            )
+            await asyncio.sleep(0.1)
+            status, _, _ = await app.handle_asgi_path_request(generator_path)
+            app._resolver.resolve("alice").release.set()
+            await slow
+            return status
+
+        assert asyncio.run(run()) == 503, "busy key must return 503"
+
+    def test_slow_key_admission(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        slow_key = SlowKey(akey)
+        app = ASGIPathKeyServer(
+            {"slow": slow_key, "fast": ThreadedSoftwareKey(akey)},
+            limiter=KeyLimiter(1, 16, 5.0),
+            max_workers=2,
+        )
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            queued = [
+                asyncio.ensure_future(
+                    app.handle_asgi_path_request(
+                        "/slow/x25519/" + ("%02x" % idx) * 32
+                    )
+                )
+                for idx in range(1, 11)
+            ]
+            await asyncio.sleep(0.1)
+            assert slow_key.calls == 1, "only admitted operations may start"
+            started = loop.time()
+            status, _, body = await app.handle_asgi_path_request(
+                "/fast/x25519/" + "09" + "00" * 31
+            )
+            elapsed = loop.time() - started
+            coalesced = asyncio.ensure_future(
+                app.handle_asgi_path_request("/slow/x25519/" + "01" * 32)
+            )
+            await asyncio.sleep(0.05)
+            slow_key.release.set()
+            results = await asyncio.gather(*queued, coalesced)
+            return status, body, elapsed, results
+
+        status, body, elapsed, results = asyncio.run(run())
+        assert status == 200 and len(body) == 32
+        assert elapsed < 1.0, "healthy key starved by queued slow key"
+        assert all(result[0] == 200 for result in results)
+        assert results[0][2] == results[-1][2], "coalesced result differs"
+        assert slow_key.calls == 10, "identical requests must be coalesced"
+        assert app._limiter._async_slots == {}, "slots must be released"
+        assert app._limiter._async_flights == {}, "flights must land"
+
+    def test_lifespan(self):
+        app = make_alice_server(ThreadedSoftwareKey)
+        run_asgi_request(app, generator_path)
+        messages = [
+            {"type": "lifespan.startup"},
+            {"type": "lifespan.shutdown"},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(app({"type": "lifespan"}, receive, send))
+        assert sent == [
+            {"type": "lifespan.startup.complete"},
+            {"type": "lifespan.shutdown.complete"},
+        ], "incorrect lifespan protocol handling"
+        assert app._executor is None, "thread pool must be shut down"
+
+    def test_unsupported_scope(self):
+        app = make_alice_server()
+        self.assertRaises(
+            ValueError, lambda: run_asgi_request(app, "/", "websocket")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
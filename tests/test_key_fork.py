@@ -0,0 +1,106 @@
+import os
+import pickle
+import unittest
+
+from _test_data import (
+    alice_pub_bstr,
+    alice_sec_bstr,
+    alice_sec_password,
+    bob_sec_bstr,
+    bob_sec_password,
+)
+
+from oarepo_c4gh.key import (
+    C4GHKey,
+    ExternalSoftwareKey,
+    HTTPKey,
+    KeyCollection,
+)
+from oarepo_c4gh.key.http_path_key_server import HTTPPathKeyServer
+from oarepo_c4gh.key.keyring import DeferredC4GHKey
+from oarepo_c4gh.key.c4gh import parse_c4gh_private_key, decode_b64_envelope
+from io import BytesIO
+
+alice_pub = C4GHKey.from_bytes(alice_pub_bstr).public_key
+
+
+def make_deferred_alice(callback):
+    _, sdata = decode_b64_envelope(BytesIO(alice_sec_bstr))
+    kdf_name, kdf_rounds, kdf_salt, _, payload = parse_c4gh_private_key(sdata)
+    return DeferredC4GHKey(
+        "alice.c4gh", (kdf_name, kdf_rounds, kdf_salt), payload, callback
+    )
+
+
+class TestKeyFork(unittest.TestCase):
+
+    def test_pickle_software_keys(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        collection = pickle.loads(
+            pickle.dumps(KeyCollection(akey, ExternalSoftwareKey(bkey)))
+        )
+        keys = list(collection.keys)
+        assert keys[0].public_key == alice_pub
+        assert keys[0].compute_read_key(
+            bkey.public_key
+        ) == akey.compute_read_key(bkey.public_key)
+        assert keys[1].public_key == bkey.public_key
+
+    def test_pickle_http_key(self):
+        hkey = HTTPKey(
+            ["http://127.0.0.1:1/a", "http://127.0.0.1:1/b"], hedge_after=0.1
+        )
+        hkey.eject_replica("http://127.0.0.1:1/a")
+        hkey2 = pickle.loads(pickle.dumps(hkey))
+        assert hkey2._ejected == {}, "replica health must not be pickled"
+        assert hkey2.pick_replicas()[0] == "http://127.0.0.1:1/a"
+
+    def test_pickle_unlocked_deferred_key(self):
+        dkey = make_deferred_alice(lambda file_name: alice_sec_password)
+        dkey.warmup()
+        dkey2 = pickle.loads(pickle.dumps(dkey))
+        assert dkey2.unlocked, "unlocked key must stay unlocked"
+        assert dkey2.public_key == alice_pub
+
+    def test_collection_warmup(self):
+        dkey = make_deferred_alice(lambda file_name: alice_sec_password)
+        KeyCollection(dkey).warmup()
+        assert dkey.unlocked, "warmup must unlock the key"
+
+    def test_server_warmup(self):
+        warmed = []
+
+        class WarmupKey(ExternalSoftwareKey):
+            def warmup(self):
+                warmed.append(self)
+
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        hpks = HTTPPathKeyServer({"bob": WarmupKey(bkey)})
+        hpks.warmup()
+        assert len(warmed) == 1, "server warmup must warm up its keys"
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires fork")
+    def test_fork_resets_resources(self):
+        hkey = HTTPKey(
+            ["http://127.0.0.1:1/a", "http://127.0.0.1:1/b"], hedge_after=0.1
+        )
+        dkey = make_deferred_alice(lambda file_name: alice_sec_password)
+        dkey.warmup()
+        rfd, wfd = os.pipe()
+        hkey._lock.acquire()
+        pid = os.fork()
+        if pid == 0:
+            ok = not hkey._lock.locked() and dkey.public_key == alice_pub
+            os.write(wfd, b"1" if ok else b"0")
+            os._exit(0)
+        hkey._lock.release()
+        os.close(wfd)
+        result = os.read(rfd, 1)
+        os.close(rfd)
+        os.waitpid(pid, 0)
+        assert result == b"1", "resources not reset in child process"
+
+
+if __name__ == "__main__":
+    unittest.main()
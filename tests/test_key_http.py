@@ -2,7 +2,11 @@ import unittest
 
 from oarepo_c4gh.exceptions import Crypt4GHKeyException
 from oarepo_c4gh.key.http import HTTPKey
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import (
+    HTTPServer,
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
 from oarepo_c4gh.key.key import key_x25519_generator_point
 from threading import Thread
 from _test_data import alice_sec_bstr, alice_pub_bstr, alice_sec_password
@@ -10,6 +14,28 @@ from oarepo_c4gh.key.c4gh import C4GHKey
 from binascii import unhexlify
 from oarepo_c4gh.key.external_software import ExternalSoftwareKey
 from socketserver import TCPServer
+from time import sleep, monotonic
+
+
+def start_replica(delay=0.0, status=200, truncate=None):
+    class TestHTTPKeyReplicaHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            sleep(delay)
+            self.close_connection = True
+            self.send_response(status)
+            self.send_header("Content-Length", "32")
+            self.end_headers()
+            self.wfile.write(key_x25519_generator_point[:truncate])
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), TestHTTPKeyReplicaHandler)
+    httpd.daemon_threads = True
+    server_thread = Thread(target=httpd.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
 
 
 class TestHTTPKey(unittest.TestCase):
@@ -128,6 +154,116 @@ class TestHTTPKey(unittest.TestCase):
         self.assertRaises(Crypt4GHKeyException, lambda: hkey.public_key)
         httpd.shutdown()
 
+    def test_round_robin(self):
+        hkey = HTTPKey(["http://127.0.0.1:1/a", "http://127.0.0.1:1/b"])
+        assert hkey.pick_replicas()[0].endswith("/a")
+        assert hkey.pick_replicas()[0].endswith("/b")
+        hkey.eject_replica("http://127.0.0.1:1/a")
+        assert hkey.pick_replicas() == [
+            "http://127.0.0.1:1/b",
+            "http://127.0.0.1:1/a",
+        ], "ejected replica must be tried last"
+
+    def test_failover(self):
+        bad, bad_url = start_replica(status=404)
+        good, good_url = start_replica()
+        hkey = HTTPKey([bad_url, good_url])
+        assert (
+            hkey.public_key == key_x25519_generator_point
+        ), "failover to healthy replica failed"
+        assert bad_url in hkey._ejected, "failed replica not ejected"
+        assert hkey.pick_replicas()[0] == good_url
+        bad.shutdown()
+        good.shutdown()
+
+    def test_all_replicas_fail(self):
+        bad1, bad1_url = start_replica(status=404)
+        bad2, bad2_url = start_replica(status=201)
+        hkey = HTTPKey([bad1_url, bad2_url], hedge_after=0.01)
+        self.assertRaises(Crypt4GHKeyException, lambda: hkey.public_key)
+        bad1.shutdown()
+        bad2.shutdown()
+
+    def test_truncated_response(self):
+        bad1, bad1_url = start_replica(truncate=10)
+        bad2, bad2_url = start_replica(truncate=10)
+        good, good_url = start_replica()
+        for hedge_after in (None, 0.05):
+            hkey = HTTPKey([bad1_url, bad2_url], hedge_after=hedge_after)
+            outcome = []
+
+            def call():
+                try:
+                    hkey.compute_ecdh(key_x25519_generator_point)
+                except Crypt4GHKeyException as ex:
+                    outcome.append(ex)
+
+            caller = Thread(target=call, daemon=True)
+            caller.start()
+            caller.join(5.0)
+            assert not caller.is_alive(), "truncated responses hang"
+            assert len(outcome) == 1, "truncated response not reported"
+            hkey = HTTPKey(
+                [bad1_url, bad2_url, good_url], hedge_after=hedge_after
+            )
+            assert (
+                hkey.compute_ecdh(key_x25519_generator_point)
+                == key_x25519_generator_point
+            ), "no failover from truncated response"
+        bad1.shutdown()
+        bad2.shutdown()
+        good.shutdown()
+
+    def test_hedged_request(self):
+        slow, slow_url = start_replica(delay=1.0)
+        fast, fast_url = start_replica()
+        hkey = HTTPKey([slow_url, fast_url], hedge_after=0.05)
+        started = monotonic()
+        assert hkey.public_key == key_x25519_generator_point
+        assert monotonic() - started < 0.5, "hedged request not sent"
+        slow.shutdown()
+        fast.shutdown()
+
+    def test_hedge_losing_race_not_ejected(self):
+        first, first_url = start_replica(delay=0.3)
+        hedge, hedge_url = start_replica(delay=2.0)
+        hkey = HTTPKey([first_url, hedge_url], hedge_after=0.2)
+        assert (
+            hkey.compute_ecdh(key_x25519_generator_point)
+            == key_x25519_generator_point
+        )
+        assert hedge_url not in hkey._ejected, "hedge ejected for losing"
+        assert first_url not in hkey._ejected, "winner ejected"
+        first.shutdown()
+        hedge.shutdown()
+
+    def test_hedged_concurrent_slow_replica(self):
+        slow, slow_url = start_replica(delay=3.0)
+        fast, fast_url = start_replica()
+        hkey = HTTPKey([slow_url, fast_url], hedge_after=0.05)
+        for idx in range(4):
+            started = monotonic()
+            assert hkey.compute_ecdh(key_x25519_generator_point)
+            assert monotonic() - started < 1.0, "sequential call delayed"
+        assert slow_url in hkey._ejected, "slow replica not ejected"
+        hkey._ejected.clear()
+        latencies = []
+
+        def call():
+            started = monotonic()
+            hkey.compute_ecdh(key_x25519_generator_point)
+            latencies.append(monotonic() - started)
+
+        callers = [Thread(target=call) for idx in range(6)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        assert len(latencies) == 6
+        assert max(latencies) < 1.0, "concurrent calls delayed by slow replica"
+        slow.shutdown()
+        fast.shutdown()
+
 
 if __name__ == "__main__":
     TCPServer.allow_reuse_address = True
@@ -62,7 +62,7 @@ class TestHTTPPathKeyServer(unittest.TestCase):
         akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
         hpks = HTTPPathKeyServer({"my-key": akey})
         assert isinstance(
-            hpks._mapping["my-key"], ExternalSoftwareKey
+            hpks._resolver.resolve("my-key"), ExternalSoftwareKey
         ), "internal keys must be wrapped"
 
     def test_external_key(self):
@@ -70,7 +70,7 @@ class TestHTTPPathKeyServer(unittest.TestCase):
         akey = ExternalSoftwareKey(akey0)
         hpks = HTTPPathKeyServer({"my-key": akey})
         assert (
-            hpks._mapping["my-key"] == akey
+            hpks._resolver.resolve("my-key") == akey
         ), "external keys must be kept intact"
 
     def test_invalid_url_path(self):
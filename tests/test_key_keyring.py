@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+from _test_data import (
+    alice_pub_bstr,
+    alice_sec_bstr,
+    alice_sec_password,
+    bob_sec_bstr,
+    bob_sec_password,
+    hello_world_encrypted,
+)
+from io import BytesIO
+
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.exceptions import Crypt4GHKeyException
+from oarepo_c4gh.key import C4GHKey
+from oarepo_c4gh.key.keyring import DeferredC4GHKey, load_keyring
+
+passwords = {"alice.c4gh": alice_sec_password, "bob.c4gh": bob_sec_password}
+
+
+def password_callback(file_name):
+    return passwords[os.path.basename(file_name)]
+
+
+class TestKeyring(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        for name, data in (
+            ("alice.c4gh", alice_sec_bstr),
+            ("bob.c4gh", bob_sec_bstr),
+            ("alice.pub", alice_pub_bstr),
+        ):
+            with open(os.path.join(self.tmpdir.name, name), "wb") as f:
+                f.write(data)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def check_keyring(self, keyring):
+        assert keyring.count == 2, "public key must be skipped"
+        alice_pub = C4GHKey.from_bytes(alice_pub_bstr).public_key
+        assert alice_pub in [key.public_key for key in keyring.keys]
+        crypt4gh = Crypt4GH(BytesIO(hello_world_encrypted), keyring)
+        assert (
+            b"".join(block.cleartext for block in crypt4gh.data_blocks)
+            == b"Hello World!\n"
+        )
+
+    def test_thread_mode(self):
+        self.check_keyring(load_keyring(self.tmpdir.name, password_callback))
+
+    def test_process_mode(self):
+        self.check_keyring(
+            load_keyring(self.tmpdir.name, password_callback, mode="process")
+        )
+
+    def test_deferred_mode(self):
+        calls = []
+
+        def callback(file_name):
+            calls.append(file_name)
+            return password_callback(file_name)
+
+        keyring = load_keyring(self.tmpdir.name, callback, mode="deferred")
+        assert calls == [], "no key must be unlocked upfront"
+        key = next(keyring.keys)
+        assert isinstance(key, DeferredC4GHKey)
+        assert not key.unlocked
+        key.public_key
+        key.public_key
+        assert calls == [key.file_name], "key must be unlocked once"
+        self.check_keyring(keyring)
+
+    def test_file_list_and_suffix(self):
+        files = [os.path.join(self.tmpdir.name, "bob.c4gh")]
+        assert load_keyring(files, password_callback).count == 1
+        keyring = load_keyring(
+            self.tmpdir.name, password_callback, suffix=".c4gh"
+        )
+        assert keyring.count == 2
+
+    def test_no_keys(self):
+        files = [os.path.join(self.tmpdir.name, "alice.pub")]
+        self.assertRaises(Crypt4GHKeyException, lambda: load_keyring(files))
+
+    def test_missing_callback(self):
+        self.assertRaises(
+            Crypt4GHKeyException, lambda: load_keyring(self.tmpdir.name)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,256 @@
+import asyncio
+import unittest
+
+from threading import Event, Thread
+from time import sleep
+from _test_data import alice_sec_bstr, alice_sec_password
+
+from oarepo_c4gh.exceptions import Crypt4GHKeyBusyException
+from oarepo_c4gh.key import C4GHKey, ExternalSoftwareKey
+from oarepo_c4gh.key.http_path_key_server import HTTPPathKeyServer
+from oarepo_c4gh.key.key_limiter import KeyLimiter
+
+
+class BlockingKey(ExternalSoftwareKey):
+    """Software-backed external key which blocks every operation until
+    released and counts the operations performed."""
+
+    def __init__(self, softkey):
+        super().__init__(softkey)
+        self.started = Event()
+        self.release = Event()
+        self.calls = 0
+
+    def compute_ecdh(self, public_point):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return super().compute_ecdh(public_point)
+
+
+def make_blocking_key():
+    return BlockingKey(
+        C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+    )
+
+
+def run_in_thread(results, limiter, key_id, key, point):
+    def _run():
+        try:
+            results.append(limiter.compute_ecdh(key_id, key, point))
+        except Exception as ex:
+            results.append(ex)
+
+    thread = Thread(target=_run)
+    thread.start()
+    return thread
+
+
+class TestKeyLimiter(unittest.TestCase):
+
+    def test_coalescing(self):
+        key = make_blocking_key()
+        limiter = KeyLimiter()
+        results = []
+        point = b"\x09" + b"\x00" * 31
+        t1 = run_in_thread(results, limiter, "alice", key, point)
+        key.started.wait(5)
+        t2 = run_in_thread(results, limiter, "alice", key, point)
+        sleep(0.1)
+        key.release.set()
+        t1.join()
+        t2.join()
+        assert key.calls == 1, "identical requests must be coalesced"
+        assert len(results) == 2 and results[0] == results[1]
+        assert results[0] == key.public_key, "wrong coalesced result"
+
+    def test_queue_full(self):
+        key = make_blocking_key()
+        limiter = KeyLimiter(1, 0)
+        results = []
+        t1 = run_in_thread(
+            results, limiter, "alice", key, b"\x09" + b"\x00" * 31
+        )
+        key.started.wait(5)
+        self.assertRaises(
+            Crypt4GHKeyBusyException,
+            lambda: limiter.compute_ecdh("alice", key, b"\x01" * 32),
+        )
+        key.release.set()
+        t1.join()
+
+    def test_queue_timeout(self):
+        key = make_blocking_key()
+        limiter = KeyLimiter(1, 1, 0.01)
+        results = []
+        t1 = run_in_thread(
+            results, limiter, "alice", key, b"\x09" + b"\x00" * 31
+        )
+        key.started.wait(5)
+        try:
+            limiter.compute_ecdh("alice", key, b"\x01" * 32)
+            assert False, "must time out"
+        except Crypt4GHKeyBusyException as ex:
+            assert ex.code == "KEYBUSY", "incorrect exception code"
+        key.release.set()
+        t1.join()
+        assert limiter._slots == {}, "slots must be released"
+
+    def test_queued_operation(self):
+        key = make_blocking_key()
+        limiter = KeyLimiter(1, 1)
+        results = []
+        t1 = run_in_thread(
+            results, limiter, "alice", key, b"\x09" + b"\x00" * 31
+        )
+        key.started.wait(5)
+        t2 = run_in_thread(results, limiter, "alice", key, b"\x01" * 32)
+        key.release.set()
+        t1.join()
+        t2.join()
+        assert key.calls == 2, "different points must not be coalesced"
+        assert all(isinstance(r, bytes) for r in results)
+
+    def test_exception_propagation(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+
+        class FailingKey(ExternalSoftwareKey):
+            def compute_ecdh(self, public_point):
+                raise RuntimeError("backend failure")
+
+        limiter = KeyLimiter()
+        self.assertRaises(
+            RuntimeError,
+            lambda: limiter.compute_ecdh(
+                "alice", FailingKey(akey), b"\x09" * 32
+            ),
+        )
+        assert limiter._flights == {}, "flight must land on failure"
+
+    def test_leader_interrupted(self):
+        key = make_blocking_key()
+        limiter = KeyLimiter()
+        point = b"\x09" + b"\x00" * 31
+
+        class Interrupted(BaseException):
+            pass
+
+        class InterruptedKey(ExternalSoftwareKey):
+            def compute_ecdh(self, public_point):
+                key.started.set()
+                key.release.wait(5)
+                raise Interrupted()
+
+        leader_key = InterruptedKey(
+            C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        )
+        outcome = []
+
+        def _lead():
+            try:
+                limiter.compute_ecdh("alice", leader_key, point)
+            except Interrupted as ex:
+                outcome.append(ex)
+
+        leader = Thread(target=_lead)
+        leader.start()
+        key.started.wait(5)
+        results = []
+        follower = run_in_thread(results, limiter, "alice", key, point)
+        sleep(0.1)
+        key.release.set()
+        leader.join()
+        follower.join(5)
+        assert not follower.is_alive(), "follower must not hang"
+        assert isinstance(outcome[0], Interrupted)
+        assert isinstance(results[0], Crypt4GHKeyBusyException)
+        assert limiter._flights == {}, "flight must land when interrupted"
+        assert limiter._slots == {}, "slot must be released"
+        assert limiter.compute_ecdh("alice", key, point) == key.public_key
+
+    def test_follower_timeout(self):
+        key = make_blocking_key()
+        limiter = KeyLimiter(flight_timeout=0.1)
+        results = []
+        point = b"\x09" + b"\x00" * 31
+        leader = run_in_thread(results, limiter, "alice", key, point)
+        key.started.wait(5)
+        self.assertRaises(
+            Crypt4GHKeyBusyException,
+            lambda: limiter.compute_ecdh("alice", key, point),
+        )
+        key.release.set()
+        leader.join()
+        assert results == [key.public_key], "leader must finish"
+
+    def test_async_admission(self):
+        limiter = KeyLimiter(1, 1, 0.1)
+        started = []
+
+        async def run():
+            release = asyncio.Event()
+
+            async def operation(value):
+                started.append(value)
+                await release.wait()
+                return value
+
+            def submit(value):
+                return asyncio.ensure_future(
+                    limiter.compute_ecdh_async(
+                        "alice", value, lambda: operation(value)
+                    )
+                )
+
+            first = submit(b"\x01")
+            follower = submit(b"\x01")
+            queued = submit(b"\x02")
+            await asyncio.sleep(0.01)
+            with self.assertRaises(Crypt4GHKeyBusyException):
+                await limiter.compute_ecdh_async(
+                    "alice", b"\x03", lambda: operation(b"\x03")
+                )
+            with self.assertRaises(Crypt4GHKeyBusyException):
+                await queued
+            release.set()
+            assert await first == b"\x01" and await follower == b"\x01"
+            assert await submit(b"\x04") == b"\x04"
+
+        asyncio.run(run())
+        assert started == [b"\x01", b"\x04"], "only admitted operations run"
+        assert limiter._async_slots == {}, "slots must be released"
+        assert limiter._async_flights == {}, "flights must land"
+
+    def test_server_busy(self):
+        key = make_blocking_key()
+        hpks = HTTPPathKeyServer({"alice": key}, limiter=KeyLimiter(1, 0))
+        started_response = None
+
+        def rec_start_response(c, l):
+            nonlocal started_response
+            started_response = [c, l]
+
+        thread = Thread(
+            target=lambda: hpks.handle_path_request(
+                "/alice/x25519/" + "09" + "00" * 31, lambda c, l: None
+            )
+        )
+        thread.start()
+        key.started.wait(5)
+        res = hpks.handle_path_request(
+            "/alice/x25519/" + "01" * 32, rec_start_response
+        )
+        key.release.set()
+        thread.join()
+        assert (
+            started_response
+            == [
+                "503 Service Unavailable",
+                [("Retry-After", "1")],
+            ]
+            and res == []
+        ), "busy key must return 503"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from time import sleep
+
+from _test_data import (
+    alice_pub_bstr,
+    alice_sec_bstr,
+    alice_sec_password,
+    bob_sec_bstr,
+    bob_sec_password,
+)
+
+from oarepo_c4gh.exceptions import Crypt4GHKeyException
+from oarepo_c4gh.key import C4GHKey, ExternalSoftwareKey
+from oarepo_c4gh.key.asgi_path_key_server import ASGIPathKeyServer
+from oarepo_c4gh.key.http_path_key_server import HTTPPathKeyServer
+from oarepo_c4gh.key.key_resolver import (
+    DirectoryKeyResolver,
+    KeyResolver,
+    MappingKeyResolver,
+)
+from oarepo_c4gh.key.key_server_metrics import KeyServerMetrics
+
+passwords = {"alice": alice_sec_password, "bob": bob_sec_password}
+
+
+def make_key_directory():
+    tmpdir = tempfile.TemporaryDirectory()
+    for name, data in (
+        ("alice.c4gh", alice_sec_bstr),
+        ("bob.c4gh", bob_sec_bstr),
+        ("alice-pub.c4gh", alice_pub_bstr),
+    ):
+        with open(os.path.join(tmpdir.name, name), "wb") as f:
+            f.write(data)
+    return tmpdir
+
+
+class CountingResolver(KeyResolver):
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self.calls = []
+
+    def resolve(self, key_id):
+        self.calls.append(key_id)
+        return self.resolver.resolve(key_id)
+
+    @property
+    def may_block(self):
+        return True
+
+
+class TestKeyResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = make_key_directory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_mapping_resolver(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        resolver = MappingKeyResolver({"alice": akey})
+        assert isinstance(resolver.resolve("alice"), ExternalSoftwareKey)
+        assert resolver.resolve("bob") is None, "nonexistent key"
+        assert not resolver.may_block, "mapping resolver must not block"
+
+    def test_lazy_loading(self):
+        calls = []
+
+        def callback(key_id):
+            calls.append(key_id)
+            return passwords[key_id]
+
+        resolver = DirectoryKeyResolver(self.tmpdir.name, callback)
+        assert resolver.cached_keys == [], "no key must be loaded upfront"
+        key = resolver.resolve("alice")
+        assert (
+            key.public_key == C4GHKey.from_bytes(alice_pub_bstr).public_key
+        ), "incorrect key loaded"
+        assert resolver.resolve("alice") is key, "key must be cached"
+        assert calls == ["alice"], "key must be unlocked only once"
+
+    def test_eviction(self):
+        resolver = DirectoryKeyResolver(
+            self.tmpdir.name, lambda key_id: passwords[key_id], max_keys=1
+        )
+        resolver.resolve("alice")
+        resolver.resolve("bob")
+        assert resolver.cached_keys == ["bob"], "LRU key must be evicted"
+
+    def test_invalid_names(self):
+        resolver = DirectoryKeyResolver(self.tmpdir.name)
+        assert resolver.resolve("..") is None
+        assert resolver.resolve(".hidden") is None
+        assert resolver.resolve("") is None
+        assert resolver.resolve("../alice") is None
+        assert resolver.resolve("cecilia") is None, "nonexistent key file"
+        assert resolver.resolve("alice-pub") is None, "public key only"
+
+    def test_missing_callback(self):
+        resolver = DirectoryKeyResolver(self.tmpdir.name)
+        self.assertRaises(
+            Crypt4GHKeyException, lambda: resolver.resolve("alice")
+        )
+        assert resolver._loading == {}, "failed load must be cleaned up"
+
+    def test_failure_cached(self):
+        calls = []
+
+        def callback(key_id):
+            calls.append(key_id)
+            return "wrong"
+
+        resolver = DirectoryKeyResolver(
+            self.tmpdir.name, callback, failure_ttl=0.2
+        )
+        for i in range(3):
+            self.assertRaises(
+                Crypt4GHKeyException, lambda: resolver.resolve("alice")
+            )
+        assert calls == ["alice"], "failed key must not be retried"
+        assert resolver._loading == {}, "failed load must be cleaned up"
+        sleep(0.3)
+        self.assertRaises(
+            Crypt4GHKeyException, lambda: resolver.resolve("alice")
+        )
+        assert calls == ["alice", "alice"], "failure must expire"
+
+    def test_server_load_failure(self):
+        metrics = KeyServerMetrics()
+        hpks = HTTPPathKeyServer(
+            DirectoryKeyResolver(self.tmpdir.name), metrics=metrics
+        )
+        statuses = []
+        for i in range(2):
+            hpks.handle_path_request(
+                "/alice/x25519/09" + "00" * 31,
+                lambda c, l: statuses.append(c),
+            )
+        assert statuses == ["404 Not Found"] * 2
+        assert metrics.aggregate().not_found == {"key_load": 2}
+
+    def test_single_resolution(self):
+        resolver = CountingResolver(
+            DirectoryKeyResolver(
+                self.tmpdir.name, lambda key_id: passwords[key_id]
+            )
+        )
+        hpks = HTTPPathKeyServer(resolver)
+        hpks.handle_path_request(
+            "/bob/x25519/09" + "00" * 31, lambda c, l: None
+        )
+        assert resolver.calls == ["bob"], "key resolved more than once"
+        resolver.calls.clear()
+        app = ASGIPathKeyServer(resolver)
+
+        async def receive():
+            return {"type": "http.request"}
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "path": "/alice/x25519/09" + "00" * 31}
+        asyncio.run(app(scope, receive, send))
+        assert resolver.calls == ["alice"], "key resolved more than once"
+
+    def test_server_with_resolver(self):
+        resolver = DirectoryKeyResolver(
+            self.tmpdir.name, lambda key_id: passwords[key_id]
+        )
+        hpks = HTTPPathKeyServer(resolver)
+        started_response = None
+
+        def rec_start_response(c, l):
+            nonlocal started_response
+            started_response = [c, l]
+
+        res = hpks.handle_path_request(
+            "/bob/x25519/09" + "00" * 31, rec_start_response
+        )
+        assert started_response[0] == "200 OK" and len(res[0]) == 32
+        res = hpks.handle_path_request(
+            "/alice/x25519/" + "00" * 31, rec_start_response
+        )
+        assert started_response[0] == "404 Not Found"
+        assert resolver.cached_keys == ["bob"], "invalid request loaded key"
+
+    def test_asgi_server_with_resolver(self):
+        resolver = DirectoryKeyResolver(
+            self.tmpdir.name, lambda key_id: passwords[key_id]
+        )
+        app = ASGIPathKeyServer(resolver)
+        sent = []
+
+        async def receive():
+            return {"type": "http.request"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "path": "/alice/x25519/09" + "00" * 31}
+        asyncio.run(app(scope, receive, send))
+        assert sent[0]["status"] == 200, "request must succeed"
+        assert app._executor is not None, "key must be loaded in a thread"
+
+
+if __name__ == "__main__":
+    unittest.main()
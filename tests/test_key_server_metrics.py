@@ -0,0 +1,132 @@
+import unittest
+
+from threading import Barrier, Event, Thread
+from _test_data import alice_sec_bstr, alice_sec_password
+
+from oarepo_c4gh.key import C4GHKey
+from oarepo_c4gh.key.http_path_key_server import HTTPPathKeyServer
+from oarepo_c4gh.key.key_server_metrics import (
+    KeyServerMetrics,
+    PROMETHEUS_CONTENT_TYPE,
+    escape_label_value,
+)
+
+generator_hex = "09" + "00" * 31
+
+
+def make_metrics_server(metrics):
+    akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+    return HTTPPathKeyServer({"alice": akey}, "keys", metrics=metrics)
+
+
+def do_request(hpks, path):
+    started_response = None
+
+    def rec_start_response(c, l):
+        nonlocal started_response
+        started_response = [c, l]
+
+    res = hpks.handle_path_request(path, rec_start_response)
+    return started_response, res
+
+
+class TestKeyServerMetrics(unittest.TestCase):
+
+    def test_escape_label_value(self):
+        assert (
+            escape_label_value('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+        ), "incorrect label escaping"
+
+    def test_thread_shards(self):
+        metrics = KeyServerMetrics()
+        started = Barrier(5)
+        finish = Event()
+
+        def _count():
+            for i in range(100):
+                metrics.count_request(200)
+            started.wait()
+            finish.wait()
+
+        threads = [Thread(target=_count) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        started.wait()
+        assert len(metrics._shards) == 4, "each thread needs its own shard"
+        assert (
+            metrics.aggregate().requests["200"] == 400
+        ), "incorrect aggregation"
+        finish.set()
+        for thread in threads:
+            thread.join()
+        assert len(metrics._shards) == 0, "finished shards not retired"
+        assert (
+            metrics.aggregate().requests["200"] == 400
+        ), "retired counters lost"
+
+    def test_short_lived_threads(self):
+        metrics = KeyServerMetrics()
+
+        def _count():
+            metrics.count_request(200)
+            metrics.finish_operation("alice", metrics.start_operation("alice"))
+
+        for i in range(50):
+            threads = [Thread(target=_count) for i in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert len(metrics._shards) <= 20, "shards accumulate"
+        total = metrics.aggregate()
+        assert total.requests["200"] == 1000, "incorrect request count"
+        assert total.in_flight["alice"] == 0, "incorrect in-flight count"
+        assert (
+            sum(total.latency_buckets["alice"]) == 1000
+        ), "incorrect histogram count"
+
+    def test_histogram(self):
+        metrics = KeyServerMetrics((1.0, 2.0))
+        started = metrics.start_operation("alice")
+        assert metrics.aggregate().in_flight["alice"] == 1
+        metrics.finish_operation("alice", started)
+        total = metrics.aggregate()
+        assert total.in_flight["alice"] == 0, "operation not finished"
+        assert total.latency_buckets["alice"] == [1, 0, 0]
+        text = metrics.render().decode("utf-8")
+        assert (
+            'c4gh_key_server_ecdh_seconds_bucket{key="alice",le="+Inf"} 1'
+            in text
+        ), "missing +Inf bucket"
+        assert 'c4gh_key_server_ecdh_seconds_count{key="alice"} 1' in text
+
+    def test_metrics_disabled(self):
+        hpks = make_metrics_server(None)
+        response, res = do_request(hpks, "/keys/metrics")
+        assert response == ["404 Not Found", []], "metrics must be disabled"
+
+    def test_server_metrics(self):
+        hpks = make_metrics_server(KeyServerMetrics())
+        do_request(hpks, f"/keys/alice/x25519/{generator_hex}")
+        do_request(hpks, f"/keys/bob/x25519/{generator_hex}")
+        do_request(hpks, "/keys/alice/x25519/09")
+        do_request(hpks, "/other/alice/x25519/09")
+        response, res = do_request(hpks, "/keys/metrics")
+        assert response == [
+            "200 OK",
+            [("Content-Type", PROMETHEUS_CONTENT_TYPE)],
+        ], "metrics must be available"
+        text = res[0].decode("utf-8")
+        assert 'c4gh_key_server_requests_total{status="200"} 1' in text
+        assert 'c4gh_key_server_requests_total{status="404"} 3' in text
+        assert 'c4gh_key_server_not_found_total{reason="key"} 1' in text
+        assert 'c4gh_key_server_not_found_total{reason="prefix"} 1' in text
+        assert (
+            'c4gh_key_server_not_found_total{reason="point_length"} 1' in text
+        )
+        assert 'c4gh_key_server_in_flight{key="alice"} 0' in text
+        assert 'c4gh_key_server_ecdh_seconds_count{key="alice"} 1' in text
+
+
+if __name__ == "__main__":
+    unittest.main()
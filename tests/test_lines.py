@@ -0,0 +1,98 @@
+import io
+import os
+import random
+import unittest
+
+from _test_container import make_test_container
+from _test_data import (
+    alice_sec_bstr,
+    alice_sec_password,
+    bob_sec_bstr,
+    bob_sec_password,
+)
+
+from oarepo_c4gh.crypt4gh.common.data_block import DataBlock
+from oarepo_c4gh.crypt4gh.common.lines import iter_crypt4gh_lines
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.exceptions import Crypt4GHDEKException
+from oarepo_c4gh.key import C4GHKey
+
+
+def make_blocks(chunks):
+    return [DataBlock(bytes(16) + chunk, chunk, 0, 0) for chunk in chunks]
+
+
+class TestLines(unittest.TestCase):
+
+    def test_block_boundaries(self):
+        blocks = make_blocks([b"ab\ncd", b"ef", b"\ngh\n", b"\nij"])
+        assert list(iter_crypt4gh_lines(blocks)) == [
+            b"ab",
+            b"cdef",
+            b"gh",
+            b"",
+            b"ij",
+        ]
+        assert list(iter_crypt4gh_lines(blocks, keepends=True)) == [
+            b"ab\n",
+            b"cdef\n",
+            b"gh\n",
+            b"\n",
+            b"ij",
+        ]
+
+    def test_multibyte_delimiter(self):
+        rng = random.Random(4)
+        text = b"".join(
+            rng.choice([b"a", b"b", b"\r", b"\n", b"\r\n"])
+            for idx in range(2000)
+        )
+        for keepends in (False, True):
+            expected = text.split(b"\r\n")
+            if keepends:
+                expected = [line + b"\r\n" for line in expected[:-1]] + [
+                    expected[-1]
+                ]
+            if expected[-1] == b"":
+                expected.pop()
+            for size in (1, 2, 3, 7, 64):
+                blocks = make_blocks(
+                    [text[i : i + size] for i in range(0, len(text), size)]
+                )
+                lines = list(
+                    iter_crypt4gh_lines(
+                        blocks, b"\r\n", keepends=keepends, views=True
+                    )
+                )
+                assert [bytes(line) for line in lines] == expected
+
+    def test_container(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        text = b"".join(
+            b"line %d %s\n" % (idx, os.urandom(idx % 50).hex().encode())
+            for idx in range(5000)
+        )
+        container = make_test_container(akey.public_key, text)
+        crypt4gh = Crypt4GH(io.BytesIO(container), akey)
+        batches = list(crypt4gh.lines(batch_size=1000))
+        assert len(batches) == 5
+        assert [line for batch in batches for line in batch] == (
+            text.splitlines()
+        )
+
+    def test_undecryptable(self):
+        blocks = make_blocks([b"ab\n"]) + [DataBlock(bytes(20), None, None, 3)]
+        with self.assertRaises(Crypt4GHDEKException):
+            list(iter_crypt4gh_lines(blocks))
+
+    def test_no_dek(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        container = make_test_container(akey.public_key, b"ab\ncd\n")
+        crypt4gh = Crypt4GH(io.BytesIO(container), bkey)
+        with self.assertRaises(Crypt4GHDEKException):
+            list(crypt4gh.lines())
+
+
+if __name__ == "__main__":
+    unittest.main()
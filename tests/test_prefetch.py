@@ -0,0 +1,71 @@
+import io
+import os
+import unittest
+
+from _test_container import make_test_container
+from _test_data import alice_sec_bstr, alice_sec_password
+
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.crypt4gh.stream.prefetch import PrefetchStream
+from oarepo_c4gh.key import C4GHKey
+
+
+class CountingRawStream(io.RawIOBase):
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+        self.reads = []
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.data.read(len(b))
+        self.reads.append(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+
+class TestPrefetchStream(unittest.TestCase):
+
+    def test_buffered_reads(self):
+        raw = CountingRawStream(bytes(range(100)))
+        stream = PrefetchStream(raw, 16)
+        assert stream.read(4) == bytes(range(4))
+        assert bytes(stream.read_view(8)) == bytes(range(4, 12))
+        assert bytes(stream.peek_view(2)) == bytes([12, 13])
+        stream.end_prefetch()
+        assert stream.read(10) == bytes(range(12, 22)), "leftover lost"
+        assert len(raw.reads) == 2, "reads must be coalesced"
+        assert stream.read() == bytes(range(22, 100))
+
+    def test_tell_and_seek(self):
+        stream = PrefetchStream(io.BytesIO(bytes(range(100))), 16)
+        stream.read(4)
+        assert stream.tell() == 4, "incorrect logical position"
+        assert stream.seek(2, io.SEEK_CUR) == 6
+        assert stream.read(2) == bytes([6, 7])
+
+    def test_header_single_read(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        cleartext = os.urandom(150000)
+        raw = CountingRawStream(
+            make_test_container(akey.public_key, cleartext)
+        )
+        crypt4gh = Crypt4GH(raw, akey)
+        assert len(crypt4gh.header.packets) == 1
+        assert len(raw.reads) == 1, "header must be parsed from one read"
+        assert (
+            b"".join(block.cleartext for block in crypt4gh.data_blocks)
+            == cleartext
+        ), "over-read bytes must be passed to data blocks"
+
+    def test_prefetch_disabled(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        raw = CountingRawStream(make_test_container(akey.public_key, b"x"))
+        crypt4gh = Crypt4GH(raw, akey, prefetch=0)
+        assert len(crypt4gh.header.packets) == 1
+        assert len(raw.reads) > 1
+
+
+if __name__ == "__main__":
+    unittest.main()
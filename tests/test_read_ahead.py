@@ -0,0 +1,117 @@
+import io
+import os
+import threading
+import unittest
+
+from _test_container import make_test_container
+from _test_data import alice_sec_bstr, alice_sec_password
+
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.crypt4gh.writer import Crypt4GHWriter
+from oarepo_c4gh.crypt4gh.stream.read_ahead import (
+    ReadAheadReader,
+    read_crypt4gh_block,
+)
+from oarepo_c4gh.key import C4GHKey
+
+
+class ShortReadStream(io.RawIOBase):
+    def __init__(self, data, chunk, fail_after=None):
+        self.data = io.BytesIO(data)
+        self.chunk = chunk
+        self.fail_after = fail_after
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self.fail_after is not None and self.data.tell() >= self.fail_after:
+            raise OSError("read failed")
+        data = self.data.read(min(len(b), self.chunk))
+        b[: len(data)] = data
+        return len(data)
+
+
+class TestReadAhead(unittest.TestCase):
+
+    def setUp(self):
+        self.akey = C4GHKey.from_bytes(
+            alice_sec_bstr, lambda: alice_sec_password
+        )
+        self.cleartext = os.urandom(5 * 65536 + 17)
+        self.container = make_test_container(
+            self.akey.public_key, self.cleartext
+        )
+
+    def test_short_reads(self):
+        stream = ShortReadStream(bytes(100), 7)
+        assert len(read_crypt4gh_block(stream, 30)) == 30
+        assert len(read_crypt4gh_block(stream, 80)) == 70
+        assert read_crypt4gh_block(stream, 80) == b""
+
+    def test_same_blocks(self):
+        expected = [
+            (block.ciphertext, block.cleartext, block.offset)
+            for block in Crypt4GH(
+                io.BytesIO(self.container), self.akey
+            ).data_blocks
+        ]
+        crypt4gh = Crypt4GH(
+            ShortReadStream(self.container, 10000),
+            self.akey,
+            read_ahead=2,
+        )
+        assert [
+            (block.ciphertext, block.cleartext, block.offset)
+            for block in crypt4gh.data_blocks
+        ] == expected
+        assert b"".join(c for _, c, _ in expected) == self.cleartext
+
+    def test_no_decrypt(self):
+        crypt4gh = Crypt4GH(
+            io.BytesIO(self.container), self.akey, decrypt=False, read_ahead=1
+        )
+        blocks = list(crypt4gh.data_blocks)
+        assert len(blocks) == 6
+        assert all(not block.is_deciphered for block in blocks)
+
+    def test_trailing_bytes(self):
+        container = make_test_container(
+            self.akey.public_key, os.urandom(2 * 65536)
+        ) + os.urandom(10)
+        outputs = []
+        for read_ahead in (0, 2):
+            crypt4gh = Crypt4GH(
+                io.BytesIO(container),
+                self.akey,
+                decrypt=False,
+                read_ahead=read_ahead,
+            )
+            ostream = io.BytesIO()
+            Crypt4GHWriter(crypt4gh, ostream).write()
+            outputs.append(ostream.getvalue())
+        assert outputs[0] == outputs[1], "read-ahead changed the output"
+        assert outputs[1].endswith(container[-65536:]), "data lost"
+
+    def test_early_stop(self):
+        crypt4gh = Crypt4GH(
+            io.BytesIO(self.container), self.akey, read_ahead=1
+        )
+        blocks = crypt4gh.data_blocks
+        next(blocks)
+        blocks.close()
+        assert not any(
+            thread.name == "c4gh-read-ahead"
+            for thread in threading.enumerate()
+        ), "reader thread must be stopped"
+
+    def test_error(self):
+        reader = ReadAheadReader(
+            ShortReadStream(bytes(1000), 100, fail_after=300), 2, 100
+        )
+        with self.assertRaises(OSError):
+            list(reader)
+
+
+if __name__ == "__main__":
+    unittest.main()
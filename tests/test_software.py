@@ -94,6 +94,28 @@ class TestSoftwareKeyImplementation(unittest.TestCase):
     def test_ephemeral_generate(self):
         key = SoftwareKey.generate()
 
+    def test_session_key_cache(self):
+        alice_sk = SoftwareKey(alice_priv_str)
+        bob_sk = SoftwareKey(bob_priv_str)
+        expected_write = alice_sk.compute_write_key(bob_pub_str)
+        expected_read = alice_sk.compute_read_key(bob_pub_str)
+        alice_sk.enable_cache(1)
+        assert alice_sk.compute_write_key(bob_pub_str) == expected_write
+        assert alice_sk.compute_write_key(bob_pub_str) == expected_write
+        cached = alice_sk._cache[(True, bob_pub_str)]
+        assert alice_sk.compute_read_key(bob_pub_str) == expected_read
+        assert len(alice_sk._cache) == 1, "cache must be bounded"
+        assert cached == bytes(32), "evicted key must be zeroized"
+        assert bob_sk.compute_read_key(
+            alice_pub_str
+        ) == alice_sk.compute_write_key(bob_pub_str), "cached key mismatch"
+        cached = alice_sk._cache[(True, bob_pub_str)]
+        alice_sk.clear_cache()
+        assert len(alice_sk._cache) == 0
+        assert cached == bytes(32), "cleared key must be zeroized"
+        alice_sk.disable_cache()
+        assert alice_sk.compute_read_key(bob_pub_str) == expected_read
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,98 @@
+import io
+import os
+import socket
+import tempfile
+import unittest
+from threading import Thread
+
+from _test_container import make_test_container
+from _test_data import alice_sec_bstr, alice_sec_password
+
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.crypt4gh.util import (
+    write_crypt4gh_buffers,
+    write_crypt4gh_stream_all,
+    write_crypt4gh_vectored,
+)
+from oarepo_c4gh.crypt4gh.writer import Crypt4GHWriter
+from oarepo_c4gh.key import C4GHKey
+
+
+class ShortRawWriter(io.RawIOBase):
+    def __init__(self, chunk):
+        self.chunk = chunk
+        self.data = bytearray()
+        self.calls = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.calls += 1
+        n = min(len(b), self.chunk)
+        self.data += bytes(b[:n])
+        return n
+
+
+class TestVectoredWrite(unittest.TestCase):
+
+    def test_short_writes(self):
+        ostream = ShortRawWriter(7)
+        write_crypt4gh_stream_all(ostream, b"x" * 100)
+        assert ostream.data == b"x" * 100, "short writes not handled"
+        assert ostream.calls == 15
+
+    def test_short_vectored_writes(self):
+        out = bytearray()
+
+        def send(views):
+            # writes at most 5 bytes, possibly across buffer boundary
+            data = b"".join(bytes(view) for view in views)[:5]
+            out.extend(data)
+            return len(data)
+
+        write_crypt4gh_vectored(send, [b"abc", b"", b"defgh", b"ijklmnop"])
+        assert out == b"abcdefghijklmnop", "short writev not handled"
+
+    def test_writev_file(self):
+        with tempfile.TemporaryFile(buffering=0) as f:
+            write_crypt4gh_buffers(f, [b"abc", b"def"])
+            f.seek(0)
+            assert f.read() == b"abcdef"
+
+    def test_sendmsg(self):
+        left, right = socket.socketpair()
+        received = bytearray()
+
+        def receive():
+            while True:
+                data = right.recv(65536)
+                if len(data) == 0:
+                    break
+                received.extend(data)
+
+        thread = Thread(target=receive)
+        thread.start()
+        buffers = [os.urandom(100000), os.urandom(50000)]
+        write_crypt4gh_buffers(left, buffers)
+        left.close()
+        thread.join()
+        right.close()
+        assert received == b"".join(buffers), "sendmsg output mismatch"
+
+    def test_batched_writer(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        container = make_test_container(akey.public_key, os.urandom(300000))
+        for ostream in (io.BytesIO(), ShortRawWriter(1000)):
+            crypt4gh = Crypt4GH(io.BytesIO(container), akey, False)
+            Crypt4GHWriter(crypt4gh, ostream, batch_size=150000).write()
+            output = (
+                ostream.getvalue()
+                if isinstance(ostream, io.BytesIO)
+                else bytes(ostream.data)
+            )
+            assert output == container, "batched output mismatch"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import os
+import unittest
+
+from _test_container import make_test_container
+from _test_data import alice_sec_bstr, alice_sec_password
+
+from oarepo_c4gh.crypt4gh.buffer import Buffer4GH
+from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
+from oarepo_c4gh.exceptions import Crypt4GHProcessedException
+from oarepo_c4gh.key import C4GHKey, SoftwareKey
+
+BLOCK_SIZE = 12 + 65536 + 16
+
+
+class TestVerify(unittest.TestCase):
+
+    def setUp(self):
+        self.akey = C4GHKey.from_bytes(
+            alice_sec_bstr, lambda: alice_sec_password
+        )
+        self.container = make_test_container(
+            self.akey.public_key, os.urandom(4 * 65536 + 10)
+        )
+        header_length = Buffer4GH(
+            self.container, self.akey
+        ).header.header_length
+        damaged = bytearray(self.container)
+        for idx in (1, 3):
+            damaged[header_length + idx * BLOCK_SIZE + 100] ^= 1
+        self.damaged = bytes(damaged)
+
+    def containers(self, data):
+        yield Buffer4GH(data, self.akey)
+        for read_ahead in (0, 2):
+            yield Crypt4GH(io.BytesIO(data), self.akey, read_ahead=read_ahead)
+
+    def test_intact(self):
+        for crypt4gh in self.containers(self.container):
+            report = crypt4gh.verify()
+            assert report.ok
+            assert report.blocks_checked == 5
+            assert not report.stopped
+
+    def test_damaged(self):
+        for crypt4gh in self.containers(self.damaged):
+            assert crypt4gh.verify().bad_blocks == [1, 3]
+        for crypt4gh in self.containers(self.damaged):
+            report = crypt4gh.verify(stop_on_failure=True)
+            assert report.to_dict() == {
+                "ok": False,
+                "blocks_checked": 2,
+                "bad_blocks": [1],
+                "stopped": True,
+            }
+
+    def test_truncated(self):
+        for crypt4gh in self.containers(self.container[:-20]):
+            assert crypt4gh.verify().bad_blocks == [4]
+
+    def test_unreadable(self):
+        crypt4gh = Crypt4GH(io.BytesIO(self.container), SoftwareKey.generate())
+        assert crypt4gh.verify().bad_blocks == [0, 1, 2, 3, 4]
+        with self.assertRaises(Crypt4GHProcessedException):
+            crypt4gh.verify()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,11 +12,27 @@ from _test_data import (
 )
 from oarepo_c4gh.crypt4gh.crypt4gh import Crypt4GH
 import io
+import tempfile
 from oarepo_c4gh.crypt4gh.writer import Crypt4GHWriter
+from oarepo_c4gh.crypt4gh.fanout_writer import Crypt4GHFanOutWriter
 from oarepo_c4gh.crypt4gh.filter.add_recipient import AddRecipientFilter
 from oarepo_c4gh.crypt4gh.filter.filter import Filter
 from oarepo_c4gh.crypt4gh.filter.only_readable import OnlyReadableFilter
+from oarepo_c4gh.crypt4gh.filter.only_readable_header import (
+    OnlyReadableHeader,
+)
+from oarepo_c4gh.crypt4gh.filter.header import FilterHeader
+from oarepo_c4gh.crypt4gh.filter.pipeline import HeaderPipeline
 from oarepo_c4gh.key.external_software import ExternalSoftwareKey
+from oarepo_c4gh.key.writer_key_policy import WriterKeyPolicy
+
+
+class DropAllHeader(FilterHeader):
+    """Filter header using the original extension point."""
+
+    @property
+    def packets(self):
+        return []
 
 
 class TestACrypt4GHHeader(unittest.TestCase):
@@ -97,6 +113,184 @@ class TestCrypt4GHFilter(unittest.TestCase):
         writer2 = Crypt4GHWriter(onlyread, ostream2)
         writer2.write()
 
+    def test_memoized_header(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey)
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        filter4gh = AddRecipientFilter(crypt4gh, bkey.public_key)
+        packets = filter4gh.header.packets
+        assert filter4gh.header.packets is packets, "packets not cached"
+        assert [packet.packet_data for packet in packets] == [
+            packet.packet_data for packet in filter4gh.header.iter_packets()
+        ], "packets must not be encrypted again"
+
+    def test_stacked_single_pass(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey)
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        added = AddRecipientFilter(crypt4gh, bkey.public_key)
+        onlyread = OnlyReadableFilter(added)
+        accessed = 0
+        original_header = crypt4gh.header
+
+        class CountingHeader:
+            magic_bytes = original_header.magic_bytes
+            version = original_header.version
+
+            @property
+            def packets(self):
+                nonlocal accessed
+                accessed += 1
+                return original_header.packets
+
+        added.header._original = CountingHeader()
+        packets = onlyread.header.packets
+        assert len(packets) == 1, "only the original packet is readable"
+        assert accessed == 1, "original packets must be walked once"
+        assert len(added.header.packets) == 2
+        assert accessed == 1, "inner filter must cache the streamed packets"
+
+    def test_stacked_packets_override(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey)
+        dropall = DropAllHeader(crypt4gh.header)
+        onlyread = OnlyReadableHeader(dropall)
+        assert onlyread.packets == [], "overridden packets must be used"
+
+    def test_pipeline_packets_override(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey)
+        header = OnlyReadableHeader(DropAllHeader(crypt4gh.header))
+        pipeline = HeaderPipeline(header)
+        assert len(pipeline.stages) == 1, "overriding header is the source"
+        assert pipeline.serialize() == header.serialized
+        header = DropAllHeader(crypt4gh.header)
+        assert HeaderPipeline(header).serialize() == header.serialized
+
+    def test_pipeline_identity(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey)
+        onlyread = OnlyReadableFilter(OnlyReadableFilter(crypt4gh))
+        pipeline = HeaderPipeline(onlyread.header)
+        assert len(pipeline.stages) == 2, "both filters must be fused"
+        ostream = io.BytesIO()
+        Crypt4GHWriter(onlyread, ostream, fuse_filters=True).write()
+        assert (
+            ostream.getvalue() == hello_world_encrypted
+        ), "fused filters must produce the same output"
+        assert onlyread.header._packets is None, "fused pass must not cache"
+
+    def test_pipeline_add_recipient(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey)
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        added = AddRecipientFilter(
+            OnlyReadableFilter(crypt4gh), bkey.public_key
+        )
+        ostream = io.BytesIO()
+        Crypt4GHWriter(added, ostream, fuse_filters=True).write()
+        crypt4ghb = Crypt4GH(io.BytesIO(ostream.getvalue()), bkey)
+        assert len(crypt4ghb.header.packets) == 2
+        assert (
+            b"".join(block.cleartext for block in crypt4ghb.data_blocks)
+            == b"Hello World!\n"
+        ), "cannot read with added recipient"
+
+    def test_fanout_writer(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey, False)
+        ostreams = [io.BytesIO(), io.BytesIO(), io.BytesIO()]
+        writer = Crypt4GHFanOutWriter.for_recipients(
+            crypt4gh,
+            [
+                (bkey.public_key, ostreams[0]),
+                (akey.public_key, ostreams[1]),
+            ],
+        )
+        writer._outputs.append((Filter(crypt4gh).header, ostreams[2]))
+        writer.write()
+        assert (
+            ostreams[2].getvalue() == hello_world_encrypted
+        ), "identity header variant must produce original container"
+        for key, ostream in zip((bkey, akey), ostreams):
+            crypt4ghr = Crypt4GH(io.BytesIO(ostream.getvalue()), key)
+            assert len(crypt4ghr.header.packets) == 1, "one packet expected"
+            assert crypt4ghr.header.reader_keys_used == [key.public_key]
+            assert (
+                b"".join(block.cleartext for block in crypt4ghr.data_blocks)
+                == b"Hello World!\n"
+            ), "cannot read recipient-specific output"
+
+    def test_fanout_writer_packets_override(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey)
+        ostream = io.BytesIO()
+        Crypt4GHFanOutWriter(
+            crypt4gh, [(DropAllHeader(crypt4gh.header), ostream)]
+        ).write()
+        crypt4ghr = Crypt4GH(io.BytesIO(ostream.getvalue()), akey)
+        assert crypt4ghr.header.packets == [], "dropped packets written"
+
+    def test_serialized_header(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey)
+        serialized = crypt4gh.header.serialized
+        assert crypt4gh.header.serialized is serialized, "not cached"
+        assert hello_world_encrypted.startswith(serialized)
+        assert crypt4gh.data_length == len(hello_world_encrypted) - len(
+            serialized
+        ), "incorrect data section length"
+        onlyread = OnlyReadableFilter(crypt4gh)
+        assert onlyread.header.serialized == serialized
+        assert onlyread.header.serialized_length == len(serialized)
+
+    def test_output_length(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey)
+        filter4gh = AddRecipientFilter(crypt4gh, bkey.public_key)
+        with tempfile.TemporaryFile() as f:
+            writer = Crypt4GHWriter(filter4gh, f, preallocate=True)
+            output_length = writer.output_length
+            writer.write()
+            assert f.tell() == output_length, "incorrect output length"
+
+    def test_output_length_unknown(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        istream = io.BufferedReader(io.BytesIO(hello_world_encrypted))
+        istream.seekable = lambda: False
+        crypt4gh = Crypt4GH(istream, akey)
+        writer = Crypt4GHWriter(crypt4gh, io.BytesIO(), preallocate=True)
+        assert writer.output_length is None
+        writer.write()
+
+    def test_writer_key_policy(self):
+        akey = C4GHKey.from_bytes(alice_sec_bstr, lambda: alice_sec_password)
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        policy = WriterKeyPolicy(max_uses=2)
+        for i in range(3):
+            crypt4gh = Crypt4GH(io.BytesIO(hello_world_encrypted), akey)
+            filter4gh = AddRecipientFilter(
+                crypt4gh, bkey.public_key, writer_key_policy=policy
+            )
+            ostream = io.BytesIO()
+            Crypt4GHWriter(filter4gh, ostream).write()
+            crypt4ghb = Crypt4GH(io.BytesIO(ostream.getvalue()), bkey)
+            assert (
+                b"".join(block.cleartext for block in crypt4ghb.data_blocks)
+                == b"Hello World!\n"
+            ), "cannot read with added recipient"
+        policy.rotate()
+        assert policy._key is None, "rotation must discard the key"
+
+    def test_writer_key_policy_rotation(self):
+        bkey = C4GHKey.from_bytes(bob_sec_bstr, lambda: bob_sec_password)
+        policy = WriterKeyPolicy(max_uses=2)
+        first = policy.write_key(bkey.public_key)
+        assert policy.write_key(bkey.public_key) == first, "key not reused"
+        assert policy.write_key(bkey.public_key)[0] != first[0], "no rotation"
+
 
 if __name__ == "__main__":
     unittest.main()